@@ -8,13 +8,21 @@ Client entrypoint.
 import argparse
 import copy
 import json
+import os
+import socketserver
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
 
-import requests
+from client_cli import DAEMON_SOCKET, forward_command
 
-from stroll import Client
+# requests and stroll (with petrelic) are imported by the commands that use
+# them, such that forwarding a command to the daemon does not import them
+if TYPE_CHECKING:
+    import requests
+
+    from stroll import Client, RequestType
 
 #
 # Network communications
@@ -25,6 +33,9 @@ SERVER_HOSTNAME = "cs523-server"
 TOR_PROXY = "socks5h://localhost:9050"
 TOR_HOSTNAME_FILENAME = Path("/client/tor/hidden_service/hostname")
 
+# Number of PoI details fetched concurrently, over as many kept-alive connections
+POI_FETCH_WORKERS = 4
+
 
 class ClientHTTPError(Exception):
     """An unexpected HTTP status was received."""
@@ -143,6 +154,13 @@ def main(args: List[str]) -> None:
         help="Use Tor to connect to the server.",
         action="store_true"
     )
+    parser_loc.add_argument(
+        "-d",
+        "--daemon",
+        help="Forward the command to the client daemon listening on this socket.",
+        type=str,
+        default=None
+    )
 
     parser_loc.set_defaults(callback=client_loc)
 
@@ -182,8 +200,72 @@ def main(args: List[str]) -> None:
         help="Use Tor to connect to the server.",
         action="store_true"
     )
+    parser_grid.add_argument(
+        "-d",
+        "--daemon",
+        help="Forward the command to the client daemon listening on this socket.",
+        type=str,
+        default=None
+    )
     parser_grid.set_defaults(callback=client_grid)
 
+    # Parser for the PoIs of several cells, in a single request
+    parser_cells = subparsers.add_parser(
+        "cells", help="Retrieve the PoIs of several cells with a single signed request.")
+    parser_cells.add_argument(
+        "cell_ids",
+        help="Cell identifiers.",
+        type=int,
+        nargs="+"
+    )
+    parser_cells.add_argument(
+        "-p",
+        "--pub",
+        help="Name of the file from which to read the public key.",
+        type=argparse.FileType("rb"),
+        default="key-client.pub"
+    )
+    parser_cells.add_argument(
+        "-c",
+        "--credential",
+        help="Name of the file from which to read the attribute-based credential.",
+        type=argparse.FileType("rb"),
+        default="anon.cred"
+    )
+    parser_cells.add_argument(
+        "-T",
+        "--types",
+        help="Types of services to request.",
+        type=str,
+        default=list(),
+        action="append"
+    )
+    parser_cells.add_argument(
+        "-t",
+        "--tor",
+        help="Use Tor to connect to the server.",
+        action="store_true"
+    )
+    parser_cells.set_defaults(callback=client_cells)
+
+    # Parser for the client daemon
+    parser_daemon = subparsers.add_parser(
+        "daemon", help="Run a client daemon, which keeps its keys and connections to the server across commands.")
+    parser_daemon.add_argument(
+        "-s",
+        "--socket",
+        help="Name of the socket on which to listen for commands.",
+        type=str,
+        default=DAEMON_SOCKET
+    )
+    parser_daemon.add_argument(
+        "-t",
+        "--tor",
+        help="Use Tor to connect to the server.",
+        action="store_true"
+    )
+    parser_daemon.set_defaults(callback=client_daemon)
+
     namespace = parser.parse_args(args)
 
     if "callback" in namespace:
@@ -214,17 +296,100 @@ def get_conn_params(use_tor: bool) -> Tuple[str, Optional[str]]:
     return host, proxy
 
 
-def create_session(proxy: str) -> requests.Session:
-    """Create a Requests session."""
+def create_session(proxy: str, pool_size: int = POI_FETCH_WORKERS) -> "requests.Session":
+    """Create a Requests session, keeping up to `pool_size` connections alive."""
+
+    # pylint: disable=import-outside-toplevel
+    import requests
+    from requests.adapters import HTTPAdapter
 
     session = requests.session()
 
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
     if proxy:
         session.proxies = {"http": proxy, "https": proxy}
 
     return session
 
 
+def fetch_pois(session: "requests.Session", host: str, poi_ids: List[int],
+               workers: int = POI_FETCH_WORKERS) -> List[Dict[str, Any]]:
+    """Fetch the details of PoIs concurrently, in the order of their IDs."""
+
+    def fetch(poi_id: int) -> Dict[str, Any]:
+        url = f"http://{host}/poi"
+        params = {"poi_id": poi_id}
+        res = session.get(url=url, params=params)
+        if res.status_code != 200:
+            raise ClientHTTPError(f"Invalid return code {res.status_code}!")
+        return res.json()
+
+    if len(poi_ids) <= 1:
+        return [fetch(poi_id) for poi_id in poi_ids]
+
+    with ThreadPoolExecutor(min(workers, len(poi_ids))) as executor:
+        return list(executor.map(fetch, poi_ids))
+
+
+def request_pois(session: "requests.Session", host: str, route: str, files: Dict[str, Any]) -> List[str]:
+    """Send a signed request for the PoIs of a location or cell, and describe the PoIs found."""
+
+    # Done in a proper way, we would use HTTPS instead of HTTP.
+    url = f"http://{host}/{route}"
+    res = session.post(url=url, files=files)
+
+    if res.status_code != 200:
+        raise ClientHTTPError(f"Invalid return code {res.status_code}!")
+
+    res_json = res.json()
+
+    poi_ids = res_json["poi_list"]
+
+    lines = []
+    if not poi_ids:
+        lines.append("Sigh... nothing interesting nearby.")
+
+    # No signature, etc... for retrieving the info about the PoIs themselves.
+    for poi in fetch_pois(session, host, poi_ids):
+        lines.append(f'You are near "{poi["poi_name"]}".')
+
+    return lines
+
+
+def loc_request(client: "Client", public_key: bytes, credential: bytes, lat: float, lon: float,
+                types: List[str]) -> Tuple[str, Dict[str, Any]]:
+    """Sign a request for the PoIs near a location, returns its route and files."""
+
+    message = (f"{lat},{lon}").encode("utf-8")
+    signature = client.sign_request(public_key, credential, message, types)
+
+    files = {
+        "lat": str(lat),
+        "lon": str(lon),
+        "types": json.dumps(types),
+        "signature": signature,
+    }
+    return "poi-loc", files
+
+
+def grid_request(client: "Client", public_key: bytes, credential: bytes, cell_id: int,
+                 types: List[str]) -> Tuple[str, Dict[str, Any]]:
+    """Sign a request for the PoIs of a cell, returns its route and files."""
+
+    message = (f"{cell_id}").encode("utf-8")
+    signature = client.sign_request(public_key, credential, message, types)
+
+    files = {
+        "cell_id": str(cell_id),
+        "types": json.dumps(types),
+        "signature": signature,
+    }
+    return "poi-grid", files
+
+
 def client_get_pk(args: argparse.Namespace) -> None:
     """Handle `get-pk` subcommand."""
 
@@ -271,6 +436,8 @@ def client_register(args: argparse.Namespace) -> None:
         # Copy to prepare registration
         subscriptions_client = copy.deepcopy(subscriptions)
 
+        from stroll import Client  # pylint: disable=import-outside-toplevel
+
         client = Client()
         issuance_req, state = client.prepare_registration(
             public_key, username, subscriptions_client
@@ -309,6 +476,15 @@ def client_register(args: argparse.Namespace) -> None:
 def client_loc(args: argparse.Namespace) -> None:
     """Handle `loc` subcommand."""
 
+    if args.daemon:
+        args.pub.close()
+        args.credential.close()
+        command = {"command": "loc", "lat": args.lat, "lon": args.lon, "types": args.types,
+                   "pub": args.pub.name, "credential": args.credential.name}
+        for line in forward_command(args.daemon, command):
+            print(line)
+        return
+
     try:
         lat = args.lat
         lon = args.lon
@@ -320,51 +496,57 @@ def client_loc(args: argparse.Namespace) -> None:
         args.pub.close()
         args.credential.close()
 
+    from stroll import Client  # pylint: disable=import-outside-toplevel
+
     client = Client()
-    message = (f"{lat},{lon}").encode("utf-8")
-    signature = client.sign_request(public_key, credential, message, types)
+    route, files = loc_request(client, public_key, credential, lat, lon, types)
 
     host, proxy = get_conn_params(args.tor)
+    session = create_session(proxy)  # type:ignore
 
-    url = f"http://{host}/poi-loc"
-    files = {
-        "lat": str(lat),
-        "lon": str(lon),
-        "types": json.dumps(types),
-        "signature": signature,
-    }
+    for line in request_pois(session, host, route, files):
+        print(line)
 
-    # Done in a proper way, we would use HTTPS instead of HTTP.
-    session = create_session(proxy)  # type:ignore
-    res = session.post(url=url, files=files)
 
-    if res.status_code != 200:
-        raise ClientHTTPError(f"Invalid return code {res.status_code}!")
+def client_grid(args: argparse.Namespace) -> None:
+    """Handle `grid` subcommand."""
 
-    res_json = res.json()
+    if args.daemon:
+        args.pub.close()
+        args.credential.close()
+        command = {"command": "grid", "cell_id": args.cell_id, "types": args.types,
+                   "pub": args.pub.name, "credential": args.credential.name}
+        for line in forward_command(args.daemon, command):
+            print(line)
+        return
 
-    poi_ids = res_json["poi_list"]
+    try:
+        cell_id = args.cell_id
+        types = args.types
+        public_key = args.pub.read()
+        credential = args.credential.read()
 
-    if not poi_ids:
-        print("Sigh... nothing interesting nearby.")
+    finally:
+        args.pub.close()
+        args.credential.close()
 
-    # No signature, etc... for retrieving the info about the PoIs themselves.
-    for poi_id in poi_ids:
-        url = f"http://{host}/poi"
-        params = {"poi_id": poi_id}
-        res = session.get(url=url, params=params)
-        if res.status_code != 200:
-            raise ClientHTTPError(f"Invalid return code {res.status_code}!")
+    from stroll import Client  # pylint: disable=import-outside-toplevel
+
+    client = Client()
+    route, files = grid_request(client, public_key, credential, cell_id, types)
 
-        poi = res.json()
-        print(f'You are near "{poi["poi_name"]}".')
+    host, proxy = get_conn_params(args.tor)
+    session = create_session(proxy)  # type:ignore
 
+    for line in request_pois(session, host, route, files):
+        print(line)
 
-def client_grid(args: argparse.Namespace) -> None:
-    """Handle `grid` subcommand."""
+
+def client_cells(args: argparse.Namespace) -> None:
+    """Handle `cells` subcommand."""
 
     try:
-        cell_id = args.cell_id
+        cell_ids = args.cell_ids
         types = args.types
         public_key = args.pub.read()
         credential = args.credential.read()
@@ -373,15 +555,19 @@ def client_grid(args: argparse.Namespace) -> None:
         args.pub.close()
         args.credential.close()
 
+    # pylint: disable=import-outside-toplevel
+    from stroll import Client, cells_message
+
+    # A single signature covers all cells
     client = Client()
-    message = (f"{cell_id}").encode("utf-8")
+    message = cells_message(cell_ids)
     signature = client.sign_request(public_key, credential, message, types)
 
     host, proxy = get_conn_params(args.tor)
 
-    url = f"http://{host}/poi-grid"
+    url = f"http://{host}/poi-cells"
     files = {
-        "cell_id": str(cell_id),
+        "cell_ids": json.dumps(cell_ids),
         "types": json.dumps(types),
         "signature": signature,
     }
@@ -393,23 +579,110 @@ def client_grid(args: argparse.Namespace) -> None:
     if res.status_code != 200:
         raise ClientHTTPError(f"Invalid return code {res.status_code}!")
 
-    res_json = res.json()
+    # The response already contains the PoIs, no further requests are needed
+    for cell in res.json()["cells"]:
+        if not cell["pois"]:
+            print(f"Sigh... nothing interesting in cell {cell['cell_id']}.")
 
-    poi_ids = res_json["poi_list"]
+        for poi in cell["pois"]:
+            print(f'Cell {cell["cell_id"]}: you are near "{poi["poi_name"]}".')
 
-    if not poi_ids:
-        print("Sigh... nothing interesting nearby.")
 
-    # No signature, etc... for retrieving the info about the PoIs themselves.
-    for poi_id in poi_ids:
-        url = f"http://{host}/poi"
-        params = {"poi_id": poi_id}
-        res = session.get(url=url, params=params)
-        if res.status_code != 200:
-            raise ClientHTTPError(f"Invalid return code {res.status_code}!")
+#
+# Daemon
+#
+
+
+class ClientDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Runs loc and grid commands forwarded by `client_cli.forward_command`.
+    The daemon keeps its decoded keys and credentials, disclosure proofs
+    precomputed in the background for every request type it has seen, and its
+    connections to the server, such that a command neither starts a new
+    process, decodes anything nor builds a new (Tor) connection, and its
+    signature only needs to be completed with the message."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, host: str, proxy: Optional[str]):
+        """
+        Args:
+            path: path of the socket on which to listen
+            host: the server
+            proxy: the proxy through which to connect to the server, if any
+        """
+        from stroll import Client  # pylint: disable=import-outside-toplevel
+
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, ClientDaemonHandler)
+        self.path = path
+        self.host = host
+
+        # Keys in precomputation mode pay off for a long-lived client
+        self.client = Client(precompute=True)
+        self.session = create_session(proxy)  # type:ignore
+        self.request_types: Set[RequestType] = set()
+
+    def run_command(self, command: Dict[str, Any]) -> List[str]:
+        """Run a command, returns the lines it outputs."""
+
+        with open(command["pub"], "rb") as public_key_fd:
+            public_key = public_key_fd.read()
+        with open(command["credential"], "rb") as credential_fd:
+            credential = credential_fd.read()
+
+        self.precompute(public_key, credential, command["types"])
+
+        if command["command"] == "loc":
+            route, files = loc_request(
+                self.client, public_key, credential, command["lat"], command["lon"], command["types"])
+        elif command["command"] == "grid":
+            route, files = grid_request(
+                self.client, public_key, credential, command["cell_id"], command["types"])
+        else:
+            raise ValueError(f"Unknown command {command['command']}")
+
+        return request_pois(self.session, self.host, route, files)
+
+    def precompute(self, public_key: bytes, credential: bytes, types: List[str]):
+        """Keep disclosure proofs precomputed for the requests of this type from now on."""
+        from stroll import DisclosurePool  # pylint: disable=import-outside-toplevel
+
+        request_type = DisclosurePool.request_type(public_key, credential, types)
+        if request_type not in self.request_types:
+            self.client.precompute_requests(public_key, credential, types)
+            self.request_types.add(request_type)
+
+    def server_close(self):
+        super().server_close()
+        self.client.stop()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ClientDaemonHandler(socketserver.StreamRequestHandler):
+    """Handles a connection to the client daemon: one JSON encoded command,
+    answered with the JSON encoded output or error."""
+
+    def handle(self):
+        command = json.loads(self.rfile.readline())
+        try:
+            response = {"output": self.server.run_command(command)}  # type:ignore
+        except Exception as e:  # pylint: disable=broad-except
+            response = {"error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+def client_daemon(args: argparse.Namespace) -> None:
+    """Handle `daemon` subcommand."""
+
+    host, proxy = get_conn_params(args.tor)
 
-        poi = res.json()
-        print(f'You are near "{poi["poi_name"]}".')
+    with ClientDaemon(args.socket, host, proxy) as daemon:
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+"""
+Thin front end of the client daemon.
+
+Forwards `loc` and `grid` commands to a daemon started with
+`client.py daemon`, which keeps the decoded public key and credential, the
+precomputed disclosure proofs and the connections to the server in memory.
+Only the standard library is imported, such that starting this front end costs
+less than the query itself. The options are the ones of `client.py`.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, List
+
+
+# Socket of the client daemon
+DAEMON_SOCKET = "client.sock"
+
+
+class ClientDaemonError(Exception):
+    """The client daemon failed to run a command."""
+
+
+def forward_command(path: str, command: Dict[str, Any]) -> List[str]:
+    """Forward a command to the client daemon, returns the lines it outputs.
+
+    Args:
+        path: path of the socket of the daemon
+        command: the command, with the paths of the public key ("pub") and
+            credential ("credential") files, which the daemon reads itself
+
+    Returns:
+        the lines output by the command
+    """
+
+    command = dict(command, pub=os.path.abspath(command["pub"]), credential=os.path.abspath(command["credential"]))
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        with sock.makefile("rwb") as sock_fd:
+            sock_fd.write(json.dumps(command).encode("utf-8") + b"\n")
+            sock_fd.flush()
+            response = json.loads(sock_fd.readline())
+
+    if "error" in response:
+        raise ClientDaemonError(response["error"])
+    return response["output"]
+
+
+#
+# Parser
+#
+
+
+def main(args: List[str]) -> None:
+    """Parse the arguments given to the front end, and forward the command to the daemon."""
+
+    parser = argparse.ArgumentParser(
+        description="Front end of the client daemon for CS-523 project 2.")
+    parser.add_argument(
+        "-s",
+        "--socket",
+        help="Name of the socket of the client daemon.",
+        type=str,
+        default=DAEMON_SOCKET
+    )
+    subparsers = parser.add_subparsers(help="Command")
+
+    parser_loc = subparsers.add_parser("loc", help="Part 1 of the project 2.")
+    parser_loc.add_argument(
+        "lat",
+        help="Latitude.",
+        type=float
+    )
+    parser_loc.add_argument(
+        "lon",
+        help="Longitude.",
+        type=float
+    )
+    parser_loc.add_argument(
+        "-T",
+        "--types",
+        help="Types of services to request.",
+        type=str,
+        required=True,
+        action="append"
+    )
+    parser_loc.set_defaults(command="loc")
+
+    parser_grid = subparsers.add_parser(
+        "grid", help="Part 3 of the project 2.")
+    parser_grid.add_argument(
+        "cell_id",
+        help="Cell identifier.",
+        type=int
+    )
+    parser_grid.add_argument(
+        "-T",
+        "--types",
+        help="Types of services to request.",
+        type=str,
+        default=list(),
+        action="append"
+    )
+    parser_grid.set_defaults(command="grid")
+
+    for subparser in (parser_loc, parser_grid):
+        subparser.add_argument(
+            "-p",
+            "--pub",
+            help="Name of the file from which to read the public key.",
+            type=str,
+            default="key-client.pub"
+        )
+        subparser.add_argument(
+            "-c",
+            "--credential",
+            help="Name of the file from which to read the attribute-based credential.",
+            type=str,
+            default="anon.cred"
+        )
+        subparser.add_argument(
+            "-t",
+            "--tor",
+            help="Ignored, the daemon connects with its own settings.",
+            action="store_true"
+        )
+
+    namespace = parser.parse_args(args)
+
+    if "command" not in namespace:
+        parser.print_help()
+        return
+
+    command = {"command": namespace.command, "types": namespace.types,
+               "pub": namespace.pub, "credential": namespace.credential}
+    if namespace.command == "loc":
+        command.update(lat=namespace.lat, lon=namespace.lon)
+    else:
+        command.update(cell_id=namespace.cell_id)
+
+    for line in forward_command(namespace.socket, command):
+        print(line)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
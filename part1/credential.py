@@ -12,11 +12,14 @@ resembles the original scheme definition. However, you are free to restructure
 the functions provided to resemble a more object-oriented interface.
 """
 
-from typing import Dict, List, Tuple, Union
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
 from petrelic.multiplicative.pairing import G1, G2, GT, G1Element, G2Element, GTElement
 from petrelic.bn import Bn
-from serialization import jsonpickle
+import serialization  # registers the petrelic handlers of jsonpickle
+from exponentiation import DEFAULT_WINDOW, FixedBaseTable, multi_exponentiate
 import hashlib
+import os
+import threading
 
 
 # Attributes
@@ -24,12 +27,50 @@ AttributeValue = bytes
 AttributeName = str
 # Maps from attribute to Bn
 AttributeMap = Dict[AttributeName, AttributeValue]
+# Random exponent u and g1 ** u, which the issuer blinds a signature with
+BlindingNonce = Tuple[Bn, G1Element]
+
+# Size of the random exponents combining the equations in batch verification
+BATCH_EXPONENT_BYTES = 8
+
+# Number of disclosure sets a PublicKey keeps the hidden attributes of
+HIDDEN_CACHE_SIZE = 64
+
+# Key of the generator term in the combined equations of batch verification, which no attribute name equals
+_GENERATOR = object()
+
+# Exponents of frequent attribute values, see intern_attribute
+_INTERNED_EXPONENTS: Dict[AttributeValue, Bn] = dict()
+
+
+def intern_attribute(value: AttributeValue) -> Bn:
+    """Keep the exponent of a frequent attribute value, such that it is never converted again
+
+    Args:
+        value (AttributeValue): The attribute value
+
+    Returns:
+        Bn: Its exponent, which must not be modified
+    """
+    exponent = _INTERNED_EXPONENTS.get(value)
+    if exponent is None:
+        exponent = _INTERNED_EXPONENTS[value] = Bn.from_binary(value)
+    return exponent
+
+
+def attribute_exponent(value: AttributeValue) -> Bn:
+    """The exponent an attribute value is signed as, interned values are not converted again"""
+    exponent = _INTERNED_EXPONENTS.get(value)
+    return Bn.from_binary(value) if exponent is None else exponent
 
 
 ######################
 ## SIGNATURE SCHEME ##
 ######################
 class SecretKey:
+    # Also the default of keys serialized before tables existed, which jsonpickle restores without __setstate__
+    _g1_table: Optional[FixedBaseTable] = None
+
     def __init__(self, x: Bn, X1: G1Element, y: Dict[str, Bn]):
         """Secret Key of a Pointcheval-Sanders scheme
 
@@ -41,12 +82,76 @@ class SecretKey:
         self.x = x
         self.X1 = X1
         self.y = y
+        self._g1_table = None
+
+    def precompute(self, window: int = DEFAULT_WINDOW):
+        """Precompute a fixed-base table for the generator of G1 used by `PSScheme.sign`
+
+        Args:
+            window (int, optional): Window size of the table. Defaults to DEFAULT_WINDOW.
+        """
+        self._g1_table = FixedBaseTable(G1.generator(), window)
+
+    def g1_pow(self, exponent: Bn) -> G1Element:
+        """Raise the generator of G1 to the given exponent, using the table if precomputed"""
+        if self._g1_table is None:
+            return G1.generator() ** exponent
+        return self._g1_table ** exponent
+
+    def __getstate__(self):
+        # Precomputed tables are never serialized
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._g1_table = None
 
     def __repr__(self):
         return f"{self.__class__.__name__}({repr(self.x)}, {repr(self.X1)}, {repr(self.y)})"
 
 
+def _length_prefixed(data: bytes) -> bytes:
+    return len(data).to_bytes(8, "big") + data
+
+
+def _element_encodings(elements: Dict[AttributeName, Union[G1Element, G2Element]], attributes: List[AttributeName]):
+    # Lazily decoded elements provide their encoding without being decoded, see wire.LazyElements
+    encoding = getattr(elements, "encoding", None)
+    if encoding is not None:
+        return (encoding(a) for a in attributes)
+    return (elements[a].to_binary() for a in attributes)
+
+
+class Transcript:
+    def __init__(self, label: bytes):
+        """Incremental hash of the messages of a Fiat-Shamir proof.
+        Every message is length-prefixed, such that the transcript is canonical.
+
+        Args:
+            label (bytes): Domain separation label
+        """
+        self.hash = hashlib.sha256()
+        self.absorb(label)
+
+    def absorb(self, data: bytes):
+        """Absorb a message into the transcript"""
+        self.hash.update(_length_prefixed(data))
+
+    def copy(self) -> "Transcript":
+        """Copy the transcript, e.g. to continue it in different ways"""
+        transcript = Transcript.__new__(Transcript)
+        transcript.hash = self.hash.copy()
+        return transcript
+
+    def challenge(self) -> Bn:
+        """Derive the challenge from all messages absorbed so far"""
+        return Bn.from_binary(self.hash.digest())
+
+
 class PublicKey:
+    __slots__ = ("attributes", "g1", "Y1", "g2", "X2", "Y2", "index", "_window", "_tables", "_transcript", "_hidden",
+                 "_disclosed", "_attribute_tables", "_lock")
+
     def __init__(self, attributes: List[AttributeName], g1: G1Element, Y1: Dict[str, G1Element], g2: G2Element, X2: G2Element, Y2: Dict[AttributeName, G2Element]):
         """Public Key of a Pointcheval-Sanders scheme
 
@@ -64,6 +169,203 @@ class PublicKey:
         self.g2 = g2
         self.X2 = X2
         self.Y2 = Y2
+        # Position of every attribute, sets of attributes are bitmasks of these positions
+        self.index: Dict[AttributeName, int] = {a: i for i, a in enumerate(attributes)}
+        self._window = None
+        self._attribute_tables = False
+        self._tables: Dict[object, FixedBaseTable] = dict()
+        self._transcript = None
+        self._hidden: Dict[int, List[AttributeName]] = dict()
+        self._disclosed: Dict[FrozenSet[Tuple[AttributeName, AttributeValue]], G2Element] = dict()
+        # Guards the eviction of the caches, the key is shared by the threads of clients and servers
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Only called for unset attributes. Keys serialized before the derived fields existed are
+        # restored by jsonpickle without __setstate__, the derived fields are then rebuilt on first use.
+        if name not in PublicKey.__slots__ or name in ("attributes", "g1", "Y1", "g2", "X2", "Y2"):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        PublicKey.__init__(self, self.attributes, self.g1, self.Y1, self.g2, self.X2, self.Y2)
+        return getattr(self, name)
+
+    def mask(self, attributes: Iterable[AttributeName]) -> int:
+        """Bitmask of a set of attributes, bit i is set iff attributes[i] of the key is in the set
+
+        Args:
+            attributes (Iterable[AttributeName]): Attributes of the key
+
+        Raises:
+            KeyError: If an attribute is not an attribute of the key
+
+        Returns:
+            int: The bitmask
+        """
+        mask = 0
+        for a in attributes:
+            mask |= 1 << self.index[a]
+        return mask
+
+    def hidden(self, mask: int) -> List[AttributeName]:
+        """Attributes of the key which are not in a set, in the order of the key.
+        The result is cached for the most recently used sets, it must not be modified.
+
+        Args:
+            mask (int): Bitmask of the set, see mask
+
+        Returns:
+            List[AttributeName]: The attributes not in the set
+        """
+        hidden = self._hidden.get(mask)
+        if hidden is None:
+            bits = format(mask, "b").zfill(len(self.attributes))[::-1]
+            hidden = [a for a, bit in zip(self.attributes, bits) if bit == "0"]
+            with self._lock:
+                if len(self._hidden) >= HIDDEN_CACHE_SIZE:
+                    self._hidden.pop(next(iter(self._hidden)))
+                self._hidden[mask] = hidden
+        return hidden
+
+    def selected(self, mask: int) -> List[AttributeName]:
+        """Attributes of the key which are in a set, in the order of the key
+
+        Args:
+            mask (int): Bitmask of the set, see mask
+
+        Returns:
+            List[AttributeName]: The attributes in the set
+        """
+        return self.hidden(((1 << len(self.attributes)) - 1) ^ mask)
+
+    def disclosed_base(self, disclosed_attributes: AttributeMap) -> G2Element:
+        """G2 argument the generator of a disclosed signature is paired with, X2^-1 * prod(Y2[i] ** -a_i).
+        It only depends on the key and the disclosed attributes, it is cached for the most recently used
+        disclosures whose values are all interned (see intern_attribute), such as subscriptions.
+
+        Args:
+            disclosed_attributes (AttributeMap): The disclosed attributes and their values
+
+        Returns:
+            G2Element: The G2 argument
+        """
+        cacheable = all(v in _INTERNED_EXPONENTS for v in disclosed_attributes.values())
+        if cacheable:
+            key = frozenset(disclosed_attributes.items())
+            base = self._disclosed.get(key)
+            if base is not None:
+                return base
+
+        base = self.X2.inverse() * multi_exponentiate(
+            G2,  # type:ignore
+            [self.Y2_base(i) for i in disclosed_attributes.keys()],
+            [-attribute_exponent(a) for a in disclosed_attributes.values()])
+
+        if cacheable:
+            with self._lock:
+                if len(self._disclosed) >= HIDDEN_CACHE_SIZE:
+                    self._disclosed.pop(next(iter(self._disclosed)))
+                self._disclosed[key] = base
+        return base  # type:ignore
+
+    def precompute(self, window: int = DEFAULT_WINDOW, attribute_tables: bool = False):
+        """Switch the key to precomputation mode.
+        From now on, exponentiations of g1, g2 and of the generator of GT use fixed-base tables,
+        which are built lazily the first time a base is used.
+
+        A table takes about 0.7 MB in G1 and 1.2 MB in G2 and makes exponentiations only 10-25% faster,
+        so tables for Y1 and Y2, two per attribute, are only worth it for keys with few attributes.
+
+        Args:
+            window (int, optional): Window size of the tables. Defaults to DEFAULT_WINDOW.
+            attribute_tables (bool, optional): Whether Y1 and Y2 use tables as well. Defaults to False.
+        """
+        if self._window != window:
+            self._window = window
+            self._tables = dict()
+        elif not attribute_tables:
+            # Tables of Y1 and Y2 are keyed by (name, attribute)
+            self._tables = {k: v for k, v in self._tables.items() if not isinstance(k, tuple)}
+        self._attribute_tables = attribute_tables
+
+    def _base(self, key, element: Union[G1Element, G2Element, GTElement]) -> Union[G1Element, G2Element, GTElement, FixedBaseTable]:
+        if self._window is None:
+            return element
+
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = FixedBaseTable(element, self._window)
+        return table
+
+    def g1_base(self) -> Union[G1Element, FixedBaseTable]:
+        """Base to exponentiate g1 with: its table in precomputation mode, g1 otherwise"""
+        return self._base("g1", self.g1)  # type:ignore
+
+    def Y1_base(self, attribute: AttributeName) -> Union[G1Element, FixedBaseTable]:
+        """Base to exponentiate Y1[attribute] with: its table if attribute tables are precomputed, Y1[attribute] otherwise"""
+        if not self._attribute_tables:
+            return self.Y1[attribute]
+        return self._base(("Y1", attribute), self.Y1[attribute])  # type:ignore
+
+    def g2_base(self) -> Union[G2Element, FixedBaseTable]:
+        """Base to exponentiate g2 with: its table in precomputation mode, g2 otherwise"""
+        return self._base("g2", self.g2)  # type:ignore
+
+    def Y2_base(self, attribute: AttributeName) -> Union[G2Element, FixedBaseTable]:
+        """Base to exponentiate Y2[attribute] with: its table if attribute tables are precomputed, Y2[attribute] otherwise"""
+        if not self._attribute_tables:
+            return self.Y2[attribute]
+        return self._base(("Y2", attribute), self.Y2[attribute])  # type:ignore
+
+    def gt_base(self) -> Union[GTElement, FixedBaseTable]:
+        """Base to exponentiate the generator of GT with: its table in precomputation mode, the generator otherwise"""
+        return self._base("gt", GT.generator())  # type:ignore
+
+    def g1_pow(self, exponent: Bn) -> G1Element:
+        """Compute g1 ** exponent"""
+        return self.g1_base() ** exponent  # type:ignore
+
+    def Y1_pow(self, attribute: AttributeName, exponent: Bn) -> G1Element:
+        """Compute Y1[attribute] ** exponent"""
+        return self.Y1_base(attribute) ** exponent  # type:ignore
+
+    def g2_pow(self, exponent: Bn) -> G2Element:
+        """Compute g2 ** exponent"""
+        return self.g2_base() ** exponent  # type:ignore
+
+    def Y2_pow(self, attribute: AttributeName, exponent: Bn) -> G2Element:
+        """Compute Y2[attribute] ** exponent"""
+        return self.Y2_base(attribute) ** exponent  # type:ignore
+
+    def __getstate__(self):
+        # Precomputed tables and the index are never serialized, the key hashes and encodes the same in both modes
+        # Y1 and Y2 may be lazily decoded mappings, see wire.decode_public_key
+        return dict(attributes=self.attributes, g1=self.g1, Y1=dict(self.Y1),
+                    g2=self.g2, X2=self.X2, Y2=dict(self.Y2))
+
+    def __setstate__(self, state):
+        self.__init__(**state)  # type:ignore
+
+    def transcript(self) -> "Transcript":
+        """Start a Fiat-Shamir transcript, which has already absorbed the digest of the key.
+        The key is only hashed the first time, later transcripts start from a copy of the same state.
+
+        Returns:
+            Transcript: A new transcript bound to this key
+        """
+        if self._transcript is None:
+            digest = hashlib.sha256(b"PS public key")
+            for attribute in self.attributes:
+                digest.update(_length_prefixed(attribute.encode()))
+            digest.update(_length_prefixed(self.g1.to_binary()))
+            for encoding in _element_encodings(self.Y1, self.attributes):
+                digest.update(_length_prefixed(encoding))
+            digest.update(_length_prefixed(self.g2.to_binary()))
+            digest.update(_length_prefixed(self.X2.to_binary()))
+            for encoding in _element_encodings(self.Y2, self.attributes):
+                digest.update(_length_prefixed(encoding))
+
+            self._transcript = Transcript(b"PS Fiat-Shamir")
+            self._transcript.absorb(digest.digest())
+        return self._transcript.copy()
 
     def __repr__(self):
         return f"{self.__class__.__name__}({repr(self.g1)}, {repr(self.Y1)}, {repr(self.g2)}, {repr(self.X2)}, {repr(self.Y2)})"
@@ -85,6 +387,9 @@ class Signature:
 
 
 class AnonymousCredential:
+    # Also the default of credentials serialized before it existed
+    _exponents: Optional[Dict[AttributeName, Bn]] = None
+
     def __init__(self, signature: Signature, attributes: AttributeMap):
         """Anonymous Credential
 
@@ -94,6 +399,22 @@ class AnonymousCredential:
         """
         self.signature = signature
         self.attributes = attributes
+        self._exponents = None
+
+    def exponents(self) -> Dict[AttributeName, Bn]:
+        """Exponents of all attribute values, converted the first time they are needed.
+        The attributes must not be changed afterwards."""
+        if self._exponents is None:
+            self._exponents = {a: attribute_exponent(v) for a, v in self.attributes.items()}
+        return self._exponents
+
+    def __getstate__(self):
+        # The exponents are never serialized
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._exponents = None
 
 
 class BlindSignature:
@@ -108,8 +429,46 @@ class BlindSignature:
         self.issuer_attributes = issuer_attributes
 
 
+class PairedBases:
+    def __init__(self, gen: G1Element, G2_bases: List[Union[G2Element, FixedBaseTable]], GT_bases: List[GTElement]):
+        """Bases e(gen, G2_bases[0]), ..., e(gen, G2_bases[n]), GT_bases[0], ..., GT_bases[m] of GT
+
+        By bilinearity, prod(e(gen, B_i) ** e_i) = e(gen, prod(B_i ** e_i)). Products of powers
+        of these bases thus cost a single pairing and a multi-exponentiation in G2, instead of
+        one pairing and one exponentiation in GT per base.
+
+        Args:
+            gen (G1Element): The G1 element all G2 bases are paired with
+            G2_bases (List[Union[G2Element, FixedBaseTable]]): Bases of G2, or their tables
+            GT_bases (List[GTElement]): Bases of GT
+        """
+        self.gen = gen
+        self.G2_bases = G2_bases
+        self.GT_bases = GT_bases
+
+    def __len__(self):
+        return len(self.G2_bases) + len(self.GT_bases)
+
+    def multi_exponentiate(self, exponents: List[Bn]) -> GTElement:
+        """Calculate the product of the bases raised to the exponents
+
+        Args:
+            exponents (List[Bn]): Exponents of the G2 bases, followed by the exponents of the GT bases
+
+        Returns:
+            GTElement: The product of all powers
+        """
+        n = len(self.G2_bases)
+        accum = multi_exponentiate(G2, self.G2_bases, exponents[:n])  # type:ignore
+        return self.gen.pair(accum) * multi_exponentiate(GT, self.GT_bases, exponents[n:])  # type:ignore
+
+
+# Bases of a FiatShamirProof
+Bases = Union[List[Union[G1Element, G2Element, GTElement]], PairedBases]
+
+
 class FiatShamirProof:
-    def __init__(self, G: Union[G1, G2, GT], C: Union[G1Element, G2Element, GTElement], pk: PublicKey, bases: List[Union[G1Element, G2Element, GTElement]], exponents: List[Bn]):
+    def __init__(self, G: Union[G1, G2, GT], C: Union[G1Element, G2Element, GTElement], pk: PublicKey, bases: Bases, exponents: List[Bn]):
         """Fiat shamir non-interactive to show, that we calculated 
         C = bases[0]**exponents[0] * ... * bases[n]**exponents[n] correctly
 
@@ -117,38 +476,75 @@ class FiatShamirProof:
             G (Union[G1, G2, GT]): The group this proof works on
             C (Union[G1Element, G2Element, GTElement]): Element of group G, The result we want to proof correctness of
             pk (PublicKey): Public Key of the PS Scheme
-            bases (List[Union[G1Element, G2Element, GTElement]]): Elements of group G, Bases used to caclulate C
+            bases (Bases): Elements of group G, Bases used to caclulate C
             exponents (List[Bn]): Exponents used to calculate C
         """
-        self.bases = bases
-        noise = [G.order().random() for _ in bases]
+        noise = [G.order().random() for _ in range(len(bases))]
+        self.respond(G, C, pk, self.product(G, bases, noise), noise, exponents)
 
-        self.commitment = G.unity()
-        for b, n in zip(bases, noise):
-            self.commitment *= b**n
+    @staticmethod
+    def from_commitment(
+        G: Union[G1, G2, GT],
+        C: Union[G1Element, G2Element, GTElement],
+        pk: PublicKey,
+        commitment: Union[G1Element, G2Element, GTElement],
+        noise: List[Bn],
+        exponents: List[Bn]
+    ) -> "FiatShamirProof":
+        """Create the proof from a commitment computed in advance, commitment = bases[0]**noise[0] * ... * bases[n]**noise[n]
 
+        Returns:
+            FiatShamirProof: The proof that C was calculated correctly
+        """
+        proof = FiatShamirProof.__new__(FiatShamirProof)
+        proof.respond(G, C, pk, commitment, noise, exponents)
+        return proof
+
+    def respond(
+        self,
+        G: Union[G1, G2, GT],
+        C: Union[G1Element, G2Element, GTElement],
+        pk: PublicKey,
+        commitment: Union[G1Element, G2Element, GTElement],
+        noise: List[Bn],
+        exponents: List[Bn]
+    ):
+        """Derive the challenge for a commitment and respond to it"""
+        self.commitment = commitment
         self.challenge = self.create_hash(C, pk, self.commitment)
         self.response = [n.mod_sub(self.challenge * e, G.order())
                          for n, e in zip(noise, exponents)]
 
     @staticmethod
-    def create_hash(*args):
-        """Creates a hash from the passed arguments
+    def product(G: Union[G1, G2, GT], bases: Bases, exponents: List[Bn]) -> Union[G1Element, G2Element, GTElement]:
+        """Calculates bases[0]**exponents[0] * ... * bases[n]**exponents[n]
+
+        Returns:
+            Union[G1Element, G2Element, GTElement]: The product of all powers
+        """
+        if isinstance(bases, PairedBases):
+            return bases.multi_exponentiate(exponents)
+        return multi_exponentiate(G, bases, exponents)  # type:ignore
+
+    @staticmethod
+    def create_hash(C: Union[G1Element, G2Element, GTElement], pk: PublicKey, commitment: Union[G1Element, G2Element, GTElement]) -> Bn:
+        """Creates the challenge of a proof, from the digest of pk and the binary encodings of C and commitment
 
         Returns:
             Bn: A Bn representing the hashed value of the passed arguments
         """
-        challenge_str = jsonpickle.encode(args)
-        challenge_hash = hashlib.sha256(challenge_str.encode())
-        return Bn.from_binary(challenge_hash.digest())
+        transcript = pk.transcript()
+        transcript.absorb(C.to_binary())
+        transcript.absorb(commitment.to_binary())
+        return transcript.challenge()
 
-    def verify(self, C: Union[G1Element, G2Element, GTElement], pk: PublicKey, bases: List[Union[G1Element, G2Element, GTElement]]):
+    def verify(self, C: Union[G1Element, G2Element, GTElement], pk: PublicKey, bases: Bases):
         """Verifies the proof with any C and pk
 
         Args:
             C (Union[G1Element, G2Element, GTElement]): The C we want to verify
             pk (PublicKey): Public Key of ABC Scheme
-            bases (List[Union[G1Element, G2Element, GTElement]]): The bases used to calculate C
+            bases (Bases): The bases used to calculate C
 
         Returns:
             bool: True iff the prove could be verified, False otherwises
@@ -159,9 +555,8 @@ class FiatShamirProof:
             return False
 
         # Check if commitment matches
-        commitment = C ** challenge
-        for b, r in zip(bases, self.response):
-            commitment *= b**r
+        commitment = C ** challenge * \
+            self.product(C.group, bases, self.response)  # type:ignore
 
         return commitment == self.commitment
 
@@ -192,15 +587,46 @@ class DisclosureProof:
         self.proof = proof
 
 
+class PrecomputedDisclosure:
+    def __init__(
+        self,
+        signature: Signature,
+        disclosed_attributes: AttributeMap,
+        exponents: List[Bn],
+        noise: List[Bn],
+        C: GTElement,
+        commitment: GTElement
+    ):
+        """All message independent parts of a disclosure proof, see ABCVerify.precompute_disclosure_proof.
+        Holds the secrets of the proof, it must only be completed once and never be sent.
+
+        Args:
+            signature (Signature): randomized signature over all attributes
+            disclosed_attributes (AttributeMap): All attributes that should be disclosed to the verifier
+            exponents (List[Bn]): Exponents t and the hidden attributes, without the message
+            noise (List[Bn]): Noise of the proof, for the exponents and the message
+            C (GTElement): C over the hidden attributes, without the message
+            commitment (GTElement): Commitment of the proof
+        """
+        self.signature = signature
+        self.disclosed_attributes = disclosed_attributes
+        self.exponents = exponents
+        self.noise = noise
+        self.C = C
+        self.commitment = commitment
+
+
 class PSScheme:
     """This class contains basic operations in a Pointcheval-Sanders scheme"""
 
     @staticmethod
-    def generate_keys(attributes: List[AttributeName]) -> Tuple[SecretKey, PublicKey]:
+    def generate_keys(attributes: List[AttributeName], precompute: bool = False) -> Tuple[SecretKey, PublicKey]:
         """Generate signer key pair
 
         Args:
             attributes (List[Attribute]): The attributes for which the key pair should be generated
+            precompute (bool, optional): Whether to use and keep fixed-base tables for the generators,
+                                         which pays off for keys with many attributes. Defaults to False.
 
         Returns:
             Tuple[SecretKey, PublicKey]: Secret and Public keys for given attributes
@@ -213,36 +639,54 @@ class PSScheme:
         g1 = G1.generator()
         g2 = G2.generator()
 
+        if precompute:
+            g1_table, g2_table = FixedBaseTable(g1), FixedBaseTable(g2)
+            g1_pow, g2_pow = g1_table.__pow__, g2_table.__pow__
+        else:
+            g1_pow, g2_pow = g1.__pow__, g2.__pow__
+
         # Compute Xs and Ys
-        X1 = g1 ** x
-        X2 = g2 ** x
-        Y1 = {a: g1 ** y_i for a, y_i in y.items()}
-        Y2 = {a: g2 ** y_i for a, y_i in y.items()}
+        X1 = g1_pow(x)
+        X2 = g2_pow(x)
+        Y1 = {a: g1_pow(y_i) for a, y_i in y.items()}
+        Y2 = {a: g2_pow(y_i) for a, y_i in y.items()}
 
         # Output public and secret keys
         pk = PublicKey(attributes, g1, Y1, g2, X2, Y2)  # type:ignore
-        sk = SecretKey(x, X1, y)
+        sk = SecretKey(x, X1, y)  # type:ignore
+
+        # Keep the tables of the generators in the keys
+        if precompute:
+            sk._g1_table = g1_table
+            pk.precompute()
+            pk._tables["g1"] = g1_table
+            pk._tables["g2"] = g2_table
         return sk, pk
 
     @staticmethod
-    def sign(sk: SecretKey, msgs: List[bytes]) -> Signature:
+    def sign(sk: SecretKey, msgs: List[bytes], attributes: Optional[List[AttributeName]] = None) -> Signature:
         """Sign the vector of messages `msgs`
 
         Args:
             sk (SecretKey): Secret Key of PSScheme
             msgs (List[bytes]): Vector of messages that are to be signed
+            attributes (Optional[List[AttributeName]], optional): The attribute of each message, like the
+                                                                  attributes of the public key. Defaults to
+                                                                  the order of the attributes of `sk.y`.
 
         Returns:
             Signature: Signature of these messages
         """
-        assert(len(msgs) == len(sk.y))
+        if attributes is None:
+            attributes = list(sk.y)
+        assert(len(msgs) == len(attributes) == len(sk.y))
 
         # pick generator
         h = G1.generator()
-        exponent = sk.x + sum([y_i * Bn.from_binary(m_i)
-                               for (y_i, m_i) in zip(sk.y.values(), msgs)])
+        exponent = sk.x + sum([sk.y[a] * attribute_exponent(m_i)
+                               for (a, m_i) in zip(attributes, msgs)])
 
-        return Signature(h, h**exponent)  # type:ignore
+        return Signature(h, sk.g1_pow(exponent))  # type:ignore
 
     @staticmethod
     def verify(pk: PublicKey, signature: Signature, msgs: List[bytes]) -> bool:
@@ -262,9 +706,10 @@ class PSScheme:
         else:
             assert(len(msgs) == len(pk.Y2)
                    ), f"Message length: {len(msgs)}, pk.Y2 length: {len(pk.Y2)}"
-            accum = pk.X2
-            for Y2_i, m_i in zip(pk.Y2.values(), msgs):
-                accum = accum * Y2_i**Bn.from_binary(m_i)
+            accum = pk.X2 * multi_exponentiate(
+                G2,  # type:ignore
+                [pk.Y2_base(a) for a in pk.attributes],
+                [attribute_exponent(m_i) for m_i in msgs])
             return signature.gen.pair(accum) == signature.sig.pair(pk.g2)
 
 
@@ -293,19 +738,19 @@ class ABCIssue:
             Tuple[IssueRequest, Bn]: Request specifying which Attributs belong to the user,
                                      as well as the random t which the user needs again later.
         """
-        attributes = [Bn.from_binary(a_i) for a_i in user_attributes.values()]
-        Y1s = [pk.Y1[a] for a in user_attributes.keys()]
+        # In the order of the key, like the issuer expects them, whatever the order of user_attributes
+        names = pk.selected(pk.mask(user_attributes))
+        attributes = [attribute_exponent(user_attributes[a]) for a in names]
+        bases = [pk.g1_base()] + [pk.Y1_base(a) for a in names]
 
         # Calculate C
         t = G1.order().random()
-        C = pk.g1 ** t
-        for Y1_i, a_i in zip(Y1s, attributes):
-            C *= Y1_i ** a_i
+        C = multi_exponentiate(G1, bases, [t] + attributes)  # type:ignore
 
         # Proof that C has been calculated correctly
         proof = FiatShamirProof(
             G1, C, pk,  # type:ignore
-            [pk.g1] + Y1s,  # type:ignore
+            bases,  # type:ignore
             [t] + attributes
         )
 
@@ -316,7 +761,8 @@ class ABCIssue:
         sk: SecretKey,
         pk: PublicKey,
         request: IssueRequest,
-        issuer_attributes: AttributeMap
+        issuer_attributes: AttributeMap,
+        nonce: Optional[BlindingNonce] = None
     ) -> BlindSignature:
         """Create a signature corresponding to the user's request
         This corresponds to the "Issuer signing" step in the issuance protocol.
@@ -326,26 +772,148 @@ class ABCIssue:
             pk (PublicKey): Public Key of PS Scheme
             request (IssueRequest): Requested attributes of user
             issuer_attributes (AttributeMap): Attributes belonging to issuer
+            nonce (Optional[BlindingNonce], optional): Precomputed blinding nonce, see blinding_nonce.
+                It must never be used for another signature. Defaults to a fresh one.
 
         Returns:
             BlindSignature: signature corresponding to the user's request 
         """
-        Y1_user = [pk.Y1[a]
-                   for a in pk.attributes if a not in issuer_attributes.keys()]
+        Y1_user = [pk.Y1_base(a)
+                   for a in pk.hidden(pk.mask(issuer_attributes))]
 
         # Verify that C has been calculated correctly
         assert(request.proof.verify(
             request.C,
             pk,
-            [pk.g1] + Y1_user))  # type:ignore
+            [pk.g1_base()] + Y1_user))  # type:ignore
 
         # Sign issuer attributes
+        accum = sk.X1 * multi_exponentiate(
+            G1,  # type:ignore
+            [pk.Y1_base(i) for i in issuer_attributes.keys()],
+            [attribute_exponent(a_i) for a_i in issuer_attributes.values()])
+
+        return ABCIssue._blind_sign(pk, request, accum, issuer_attributes, nonce)
+
+    @staticmethod
+    def batch_sign_issue_requests(
+        sk: SecretKey,
+        pk: PublicKey,
+        requests: List[IssueRequest],
+        issuer_attributes: List[AttributeMap],
+        nonces: Optional[Callable[[], Optional[BlindingNonce]]] = None
+    ) -> List[Optional[BlindSignature]]:
+        """Create the signatures corresponding to many user requests at once
+
+        The proofs of all requests are checked with a random linear combination of their verification
+        equations commitment_i = C_i ** c_i * g1 ** r_i0 * prod(Y1[a] ** r_ia), with small random exponents d_i:
+            prod((commitment_i / C_i ** c_i) ** d_i) = g1 ** sum(d_i * r_i0) * prod(Y1[a] ** sum(d_i * r_ia))
+        If the combination does not hold, the proofs are verified one by one to find the invalid ones.
+        Signing then shares the powers Y1[a] ** a_i between all requests with the same value of issuer attribute a.
+
+        Args:
+            sk (SecretKey): Secret Key of PS Scheme
+            pk (PublicKey): Public Key of PS Scheme
+            requests (List[IssueRequest]): Requested attributes of the users
+            issuer_attributes (List[AttributeMap]): Attributes belonging to issuer, for every request
+            nonces (Optional[Callable[[], Optional[BlindingNonce]]], optional): Takes a precomputed blinding
+                nonce for a signature, or returns None if there is none. Defaults to fresh nonces.
+
+        Returns:
+            List[Optional[BlindSignature]]: For every request, its signature, or None if its proof is invalid
+        """
+        assert len(requests) == len(issuer_attributes), \
+            f"Requests length: {len(requests)}, issuer attributes length: {len(issuer_attributes)}"
+
+        order = G1.order()
+
+        # Left hand side of the combined equation
+        lhs_bases: List[G1Element] = []
+        lhs_exponents: List[Bn] = []
+        # Combined exponent of every base of the right hand side
+        rhs: Dict[object, Bn] = dict()
+
+        batched = []
+        for i, (request, issuer_attributes_i) in enumerate(zip(requests, issuer_attributes)):
+            proof = request.proof
+            user_attributes = pk.hidden(pk.mask(issuer_attributes_i))
+
+            # Checks that do not need the batch: structure and challenge
+            if len(proof.response) != len(user_attributes) + 1 \
+                    or proof.challenge != proof.create_hash(request.C, pk, proof.commitment):
+                continue
+
+            d = Bn.from_binary(os.urandom(BATCH_EXPONENT_BYTES))
+            lhs_bases += [proof.commitment, request.C]
+            lhs_exponents += [d, -proof.challenge.mod_mul(d, order)]
+
+            # Responses are ordered as g1, then the user attributes
+            for key, r in zip([_GENERATOR] + user_attributes, proof.response):
+                rhs[key] = rhs.get(key, Bn(0)).mod_add(
+                    d.mod_mul(r, order), order)
+
+            batched.append(i)
+
+        valid = [False for _ in requests]
+        if batched:
+            lhs = multi_exponentiate(G1, lhs_bases, lhs_exponents)  # type:ignore
+            combination = multi_exponentiate(
+                G1,  # type:ignore
+                [pk.g1_base() if key is _GENERATOR else pk.Y1_base(key) for key in rhs.keys()],  # type:ignore
+                list(rhs.values()))
+
+            for i in batched:
+                valid[i] = lhs == combination or requests[i].proof.verify(
+                    requests[i].C,
+                    pk,
+                    [pk.g1_base()] + [pk.Y1_base(a) for a in pk.hidden(pk.mask(issuer_attributes[i]))])  # type:ignore
+
+        # Powers of Y1 for every issuer attribute and value, shared between the requests
+        powers: Dict[Tuple[AttributeName, AttributeValue], G1Element] = dict()
+        signatures: List[Optional[BlindSignature]] = []
+        for request, issuer_attributes_i, valid_i in zip(requests, issuer_attributes, valid):
+            if not valid_i:
+                signatures.append(None)
+                continue
+
+            accum = sk.X1
+            for attribute in issuer_attributes_i.items():
+                power = powers.get(attribute)
+                if power is None:
+                    power = powers[attribute] = pk.Y1_pow(
+                        attribute[0], attribute_exponent(attribute[1]))
+                accum = accum * power
+
+            signatures.append(ABCIssue._blind_sign(
+                pk, request, accum, issuer_attributes_i, nonces() if nonces is not None else None))
+
+        return signatures
+
+    @staticmethod
+    def blinding_nonce(pk: PublicKey) -> BlindingNonce:
+        """Draw the random exponent u of a blind signature, and compute g1 ** u.
+        It does not depend on the request, the issuer may precompute it.
+
+        Args:
+            pk (PublicKey): Public Key of PS Scheme
+
+        Returns:
+            BlindingNonce: u and g1 ** u
+        """
         u = G1.order().random()
-        accum = sk.X1 * request.C
-        for i, a_i in issuer_attributes.items():
-            accum = accum * pk.Y1[i] ** Bn.from_binary(a_i)
+        return u, pk.g1_pow(u)
 
-        signature = Signature(pk.g1 ** u, accum ** u)
+    @staticmethod
+    def _blind_sign(
+        pk: PublicKey,
+        request: IssueRequest,
+        accum: G1Element,
+        issuer_attributes: AttributeMap,
+        nonce: Optional[BlindingNonce] = None
+    ) -> BlindSignature:
+        """Blindly sign the user commitment C, given X1 times the issuer attributes in accum"""
+        u, g1_u = nonce if nonce is not None else ABCIssue.blinding_nonce(pk)
+        signature = Signature(g1_u, (accum * request.C) ** u)
         return BlindSignature(signature, issuer_attributes)
 
     @ staticmethod
@@ -373,7 +941,7 @@ class ABCIssue:
 
         # Check that signature is valid
         assert PSScheme.verify(
-            pk, unblinded_signature, list(attributes.values())),\
+            pk, unblinded_signature, [attributes[a] for a in pk.attributes]),\
             f"Verification failed.\nattributes: {attributes}\nunblinded signature generator: {unblinded_signature.gen}\nunblinded signature : {unblinded_signature.sig}"
 
         # Return unblinded signature
@@ -400,39 +968,81 @@ class ABCVerify:
         Returns:
             DisclosureProof: Proof that both parties agree on which arguments are disclosed
         """
+        return ABCVerify.complete_disclosure_proof(
+            pk, ABCVerify.precompute_disclosure_proof(pk, credential, disclosed_attributes), message)
+
+    @ staticmethod
+    def precompute_disclosure_proof(
+        pk: PublicKey,
+        credential: AnonymousCredential,
+        disclosed_attributes: List[str]
+    ) -> PrecomputedDisclosure:
+        """Precompute everything of a disclosure proof that does not depend on the message:
+        the randomized signature, the pairing over the hidden attributes and the commitment
+
+        Args:
+            pk (PublicKey): Public Key of PS Scheme
+            credential (AnonymousCredential): Signature over all attributes
+            disclosed_attributes (List[str]): Attributes that are disclosed to the verifier
+
+        Returns:
+            PrecomputedDisclosure: The precomputed proof, to be completed once with complete_disclosure_proof
+        """
         # Randomize signature
         r = G1.order().random()
         t = G1.order().random()
         signature = Signature(
             credential.signature.gen**r, (credential.signature.sig * credential.signature.gen**t)**r)
 
-        hidden_attributes = [
-            a for a in pk.attributes if a not in disclosed_attributes]
+        hidden_attributes = pk.hidden(pk.mask(disclosed_attributes))
 
         # Calculate proof over hidden attributes (right hand side of showing protocol 2b)
-        sig1 = signature.gen.pair(pk.g2)
-        Y2s = [signature.gen.pair(pk.Y2[h]) for h in hidden_attributes]
-        a_is = [Bn.from_binary(credential.attributes[h])
-                for h in hidden_attributes]
+        # The bases e(gen, g2), e(gen, Y2[h]) and the generator of GT need only a single pairing
+        bases = PairedBases(
+            signature.gen,
+            [pk.g2_base()] + [pk.Y2_base(h) for h in hidden_attributes],
+            [pk.gt_base()])  # type:ignore
+        credential_exponents = credential.exponents()
+        exponents = [t] + [credential_exponents[h] for h in hidden_attributes]
 
         disclosed_attribute_map = {
             d: credential.attributes[d] for d in disclosed_attributes}
 
-        C = sig1 ** t
-        for Y2_i, a_i in zip(Y2s, a_is):
-            C = C * Y2_i ** a_i
+        # C over the hidden attributes, the message is only added once it is known
+        C = signature.gen.pair(multi_exponentiate(G2, bases.G2_bases, exponents))  # type:ignore
+
+        # Commitment of the proof that C was calculated correctly, it does not depend on the message either
+        noise = [GT.order().random() for _ in range(len(bases))]
+        commitment = bases.multi_exponentiate(noise)
+
+        return PrecomputedDisclosure(signature, disclosed_attribute_map, exponents, noise, C, commitment)
+
+    @ staticmethod
+    def complete_disclosure_proof(
+        pk: PublicKey,
+        precomputed: PrecomputedDisclosure,
+        message: bytes
+    ) -> DisclosureProof:
+        """Complete a precomputed disclosure proof with the message, which costs a single exponentiation in GT
+
+        Args:
+            pk (PublicKey): Public Key of PS Scheme
+            precomputed (PrecomputedDisclosure): The precomputed proof, which must not be used again
+            message (bytes): The message that is to be signed together with the request
+
+        Returns:
+            DisclosureProof: Proof that both parties agree on which arguments are disclosed
+        """
+        m = Bn.from_binary(message)
 
-        # Also sign the message
-        C = C * GT.generator() ** Bn.from_binary(message)
+        # C over the hidden attributes, also signing the message
+        C = precomputed.C * pk.gt_base() ** m
 
         # Proof that C was calculated correctly
-        proof = FiatShamirProof(
-            GT, C, pk,  # type:ignore
-            [signature.gen.pair(pk.g2),  GT.generator()] + Y2s,  # type:ignore
-            [t, Bn.from_binary(message)] + a_is
-        )
+        proof = FiatShamirProof.from_commitment(
+            GT, C, pk, precomputed.commitment, precomputed.noise, precomputed.exponents + [m])  # type:ignore
 
-        return DisclosureProof(signature, disclosed_attribute_map, proof)
+        return DisclosureProof(precomputed.signature, dict(precomputed.disclosed_attributes), proof)
 
     @ staticmethod
     def verify_disclosure_proof(
@@ -450,30 +1060,168 @@ class ABCVerify:
             bool: True iff the disclosure proof could be verified, False otherwise
         """
 
-        signature = disclosure_proof.signature
         disclosed_attributes = disclosure_proof.disclosed_attributes
-        Y2_hidden = [signature.gen.pair(
-            pk.Y2[h]) for h in pk.attributes if h not in disclosure_proof.disclosed_attributes]
 
-        # Check that the signature generator is not 1
-        if signature.gen == G1.unity():
+        if not ABCVerify.is_well_formed(pk, disclosure_proof):
             return False
 
-        # Calculate proof over disclosed attributes (left hand side of showing protocol 2b)
-        sig2 = signature.sig.pair(pk.g2)
-        Y2s = [signature.gen.pair(pk.Y2[i])
-               for i in disclosed_attributes.keys()]
-        a_is = [Bn.from_binary(a)
-                for a in disclosed_attributes.values()]
+        hidden_attributes = pk.hidden(pk.mask(disclosed_attributes))
 
-        C = sig2 / signature.gen.pair(pk.X2)
-        for Y2_i, a_i in zip(Y2s, a_is):
-            C = C * Y2_i ** (-a_i)
+        C = ABCVerify.disclosure_C(pk, disclosure_proof, message)
 
-        # Also verify the message
-        C = C * GT.generator() ** Bn.from_binary(message)
+        return ABCVerify._verify_C(pk, disclosure_proof, C, hidden_attributes)
 
+    @ staticmethod
+    def _verify_C(
+        pk: PublicKey,
+        disclosure_proof: DisclosureProof,
+        C: GTElement,
+        hidden_attributes: List[AttributeName]
+    ) -> bool:
+        # The proof over the hidden attributes, a single pairing and a multi-exponentiation in G2
         return disclosure_proof.proof.verify(
             C,
             pk,
-            [signature.gen.pair(pk.g2),  GT.generator()] + Y2_hidden)
+            PairedBases(
+                disclosure_proof.signature.gen,
+                [pk.g2_base()] + [pk.Y2_base(h) for h in hidden_attributes],
+                [pk.gt_base()]))  # type:ignore
+
+    @ staticmethod
+    def is_well_formed(pk: PublicKey, disclosure_proof: DisclosureProof) -> bool:
+        """Cheap structural checks of a disclosure proof, which reject malformed proofs before any pairing
+
+        Args:
+            pk (PublicKey): Public Key of PS scheme
+            disclosure_proof (DisclosureProof): The proof to check
+
+        Returns:
+            bool: False if the proof can not be valid, True if it has to be verified
+        """
+        signature = disclosure_proof.signature
+        disclosed_attributes = disclosure_proof.disclosed_attributes
+
+        # The signature generator must not be 1
+        if signature.gen == G1.unity():
+            return False
+
+        # Disclosed attributes must exist in the key, there is one response per hidden attribute, g2 and gt
+        if any(a not in pk.index for a in disclosed_attributes):
+            return False
+        return len(disclosure_proof.proof.response) == len(pk.attributes) - len(disclosed_attributes) + 2
+
+    @ staticmethod
+    def disclosure_C(
+        pk: PublicKey,
+        disclosure_proof: DisclosureProof,
+        message: bytes
+    ) -> GTElement:
+        """Calculate C over disclosed attributes (left hand side of showing protocol 2b), also verifying the message
+
+        Args:
+            pk (PublicKey): Public Key of PS scheme
+            disclosure_proof (DisclosureProof): Proof that both parties agree on which arguments are disclosed
+            message (bytes): The message that is to be verified together with the proof
+
+        Returns:
+            GTElement: The C the proof over the hidden attributes has to match
+        """
+        signature = disclosure_proof.signature
+        disclosed_attributes = disclosure_proof.disclosed_attributes
+
+        # By bilinearity, e(sig, g2) / e(gen, X2) * prod(e(gen, Y2[i]) ** -a_i) * gt ** m
+        #               = e(sig, g2) * e(gen, X2^-1 * prod(Y2[i] ** -a_i)) * gt ** m
+        # where the G2 argument of the second pairing is fixed for a given disclosure
+        accum = pk.disclosed_base(disclosed_attributes)
+        return signature.sig.pair(pk.g2) * signature.gen.pair(accum) * \
+            pk.gt_base() ** Bn.from_binary(message)
+
+    @ staticmethod
+    def batch_verify_disclosure_proofs(
+        pk: PublicKey,
+        disclosure_proofs: List[DisclosureProof],
+        messages: List[bytes]
+    ) -> List[bool]:
+        """Verify many disclosure proofs against the same public key at once
+
+        Every proof i has to satisfy commitment_i = C_i ** c_i * e(gen_i, g2 ** r_i0 * prod(Y2[h] ** r_ih)) * gt ** r_i1.
+        Instead of checking these equations separately, we check a random linear combination of them,
+        with small random exponents d_i. Grouping the pairings by their fixed G2 argument, the right hand
+        side takes one pairing per G2 base (g2 and every hidden Y2[h]) instead of one per proof:
+            prod((commitment_i / C_i ** c_i) ** d_i) = prod_j(e(prod_i(gen_i ** (d_i * r_ij)), base_j)) * gt ** sum(d_i * r_i1)
+        Computing every C_i still takes two pairings per proof. A batch of n proofs thus takes 2n pairings
+        plus one per G2 base, against 3n for separate checks, so the proofs are checked separately unless
+        there are more proofs than G2 bases. If the combination does not hold, the proofs are verified
+        one by one to find the invalid ones.
+
+        Args:
+            pk (PublicKey): Public Key of PS scheme
+            disclosure_proofs (List[DisclosureProof]): Proofs to verify
+            messages (List[bytes]): The message of every proof
+
+        Returns:
+            List[bool]: For every proof, True iff it could be verified
+        """
+        assert len(disclosure_proofs) == len(messages), \
+            f"Proofs length: {len(disclosure_proofs)}, messages length: {len(messages)}"
+
+        order = GT.order()
+        results = [False for _ in disclosure_proofs]
+
+        # Left hand side of the combined equation
+        lhs_bases: List[GTElement] = []
+        lhs_exponents: List[Bn] = []
+        # For every G2 base of the right hand side, the G1 elements paired with it and their exponents
+        rhs: Dict[object, Tuple[List[G1Element], List[Bn]]] = dict()
+        gt_exponent = Bn(0)
+
+        # Index, C and hidden attributes of the proofs in the combination
+        batched: List[Tuple[int, GTElement, List[AttributeName]]] = []
+        for i, (disclosure_proof, message) in enumerate(zip(disclosure_proofs, messages)):
+            signature = disclosure_proof.signature
+            proof = disclosure_proof.proof
+
+            # Checks that do not need the batch: structure, generator and challenge
+            if not ABCVerify.is_well_formed(pk, disclosure_proof):
+                continue
+            hidden_attributes = pk.hidden(pk.mask(disclosure_proof.disclosed_attributes))
+
+            C = ABCVerify.disclosure_C(pk, disclosure_proof, message)
+            if proof.challenge != proof.create_hash(C, pk, proof.commitment):
+                continue
+
+            d = Bn.from_binary(os.urandom(BATCH_EXPONENT_BYTES))
+            lhs_bases += [proof.commitment, C]
+            lhs_exponents += [d, -proof.challenge.mod_mul(d, order)]
+
+            # Responses are ordered as g2, hidden attributes, then the generator of GT
+            for key, r in zip([_GENERATOR] + hidden_attributes, proof.response):
+                gens, exponents = rhs.setdefault(key, ([], []))
+                gens.append(signature.gen)
+                exponents.append(d.mod_mul(r, order))
+            gt_exponent = gt_exponent.mod_add(
+                d.mod_mul(proof.response[-1], order), order)
+
+            batched.append((i, C, hidden_attributes))
+
+        if not batched:
+            return results
+
+        if len(batched) <= len(rhs):
+            # The combination would take at least as many pairings as separate checks
+            for i, C, hidden_attributes in batched:
+                results[i] = ABCVerify._verify_C(pk, disclosure_proofs[i], C, hidden_attributes)
+            return results
+
+        lhs = multi_exponentiate(GT, lhs_bases, lhs_exponents)  # type:ignore
+        combination = pk.gt_base() ** gt_exponent
+        for key, (gens, exponents) in rhs.items():
+            base = pk.g2 if key is _GENERATOR else pk.Y2[key]
+            combination *= multi_exponentiate(G1, gens, exponents).pair(base)  # type:ignore
+
+        valid = lhs == combination
+        for i, C, hidden_attributes in batched:
+            # Without the combination, the invalid proofs are found with the C computed above
+            results[i] = valid or ABCVerify._verify_C(pk, disclosure_proofs[i], C, hidden_attributes)
+
+        return results
@@ -0,0 +1,166 @@
+"""
+Exponentiation helpers for the PS credential scheme
+
+RELIC already exponentiates an arbitrary base quite efficiently, but the scheme
+keeps raising the same long-lived bases of the public key (g1, g2, Y1, Y2) to
+fresh exponents. For those bases we can trade memory for time and precompute
+tables once per key, so that every later exponentiation only costs a handful of
+group multiplications and no squarings at all.
+
+The scheme also computes many products of powers prod(b_i ** e_i). For many
+bases, a simultaneous multi-exponentiation shares the squarings between all
+bases and is cheaper than one exponentiation per base.
+"""
+
+from copy import copy
+from typing import List, Union
+from petrelic.multiplicative.pairing import G1, G2, GT, G1Element, G2Element, GTElement
+from petrelic.bn import Bn
+
+
+Group = Union[G1, G2, GT]
+GroupElement = Union[G1Element, G2Element, GTElement]
+Exponent = Union[Bn, int]
+
+# Window size (in bits) of the fixed-base tables. Every table stores
+# ceil(order_bits / window) * (2^window - 1) group elements.
+DEFAULT_WINDOW = 6
+
+# Below this number of bases, RELIC's exponentiation of every single base is
+# faster than the multi-exponentiation implemented in python.
+MULTI_EXP_THRESHOLD = 128
+
+
+def exponent_to_int(exponent: Exponent, order: Bn) -> int:
+    """Reduce an exponent modulo the group order and convert it to a python int
+
+    Args:
+        exponent (Exponent): The exponent, possibly negative or larger than the order
+        order (Bn): Order of the group the exponent is used in
+
+    Returns:
+        int: The reduced exponent
+    """
+    if not isinstance(exponent, Bn):
+        exponent = Bn.from_num(exponent)
+    return int.from_bytes(exponent.mod(order).binary(), "big")
+
+
+class FixedBaseTable:
+    def __init__(self, base: GroupElement, window: int = DEFAULT_WINDOW):
+        """Windowed fixed-base exponentiation table of a group element
+
+        Row i of the table stores base^(j * 2^(window*i)) for every j < 2^window,
+        such that base^e is the product of one entry per row, picked by the
+        window-sized digits of e.
+
+        Args:
+            base (GroupElement): The fixed base
+            window (int, optional): Window size in bits. Defaults to DEFAULT_WINDOW.
+        """
+        self.base = base
+        self.window = window
+        self.order = base.group.order()
+        self.unity = base.group.unity()
+
+        self.rows = []
+        row_base = base
+        for _ in range(0, self.order.num_bits(), window):
+            row = [self.unity, row_base]
+            for _ in range(2, 1 << window):
+                row.append(row[-1] * row_base)
+            self.rows.append(row)
+            row_base = row[-1] * row_base
+
+    def __pow__(self, exponent: Exponent) -> GroupElement:
+        """Raise the base to the given exponent using the table
+
+        Args:
+            exponent (Exponent): The exponent
+
+        Returns:
+            GroupElement: base ** exponent
+        """
+        e = exponent_to_int(exponent, self.order)
+        mask = (1 << self.window) - 1
+
+        result = None
+        for row in self.rows:
+            digit = e & mask
+            if digit:
+                # Never hand out a table entry itself, callers may use in-place operators
+                result = copy(row[digit]) if result is None else result * row[digit]
+            e >>= self.window
+            if not e:
+                break
+
+        return copy(self.unity) if result is None else result
+
+
+def multi_exponentiate(G: Group, bases: List[Union[GroupElement, FixedBaseTable]], exponents: List[Exponent]) -> GroupElement:
+    """Calculate bases[0]**exponents[0] * ... * bases[n]**exponents[n]
+
+    Bases given as `FixedBaseTable` are exponentiated with their table. The remaining
+    bases are exponentiated one by one if there are only a few of them, and with a
+    bucketed (Pippenger) multi-exponentiation otherwise, which processes the same
+    window of all exponents at once and shares all squarings between the bases.
+
+    Args:
+        G (Group): The group the bases belong to
+        bases (List[Union[GroupElement, FixedBaseTable]]): Bases of group G, or their tables
+        exponents (List[Exponent]): Exponents of the bases
+
+    Returns:
+        GroupElement: The product of all powers, unity if there are no bases
+    """
+    assert len(bases) == len(exponents), \
+        f"Bases length: {len(bases)}, exponents length: {len(exponents)}"
+
+    result = G.unity()
+    plain_bases, plain_exponents = [], []
+    for b, e in zip(bases, exponents):
+        if isinstance(b, FixedBaseTable):
+            result *= b ** e
+        else:
+            plain_bases.append(b)
+            plain_exponents.append(e)
+
+    if len(plain_bases) < MULTI_EXP_THRESHOLD:
+        for b, e in zip(plain_bases, plain_exponents):
+            result *= b ** e
+        return result
+
+    return result * _pippenger(G, plain_bases, plain_exponents)
+
+
+def _pippenger(G: Group, bases: List[GroupElement], exponents: List[Exponent]) -> GroupElement:
+    order = G.order()
+    ints = [exponent_to_int(e, order) for e in exponents]
+
+    # The window grows with the number of bases, such that the buckets stay well filled
+    window = max(2, len(bases).bit_length() - 2)
+    mask = (1 << window) - 1
+    windows = (max(ints).bit_length() + window - 1) // window
+
+    result = G.unity()
+    for i in reversed(range(windows)):
+        for _ in range(window):
+            result = result.square()
+
+        # Sort the bases into buckets by their digit of the current window
+        shift = i * window
+        buckets = [None] * (1 << window)
+        for b, e in zip(bases, ints):
+            digit = (e >> shift) & mask
+            if digit:
+                buckets[digit] = b if buckets[digit] is None else buckets[digit] * b
+
+        # prod(bucket[d] ** d) as the product of the running suffix products
+        running = None
+        for bucket in reversed(buckets[1:]):
+            if bucket is not None:
+                running = bucket if running is None else running * bucket
+            if running is not None:
+                result = result * running
+
+    return result
@@ -0,0 +1,268 @@
+"""
+In-memory index of the PoI database
+
+The PoIs never change while the server runs, yet the routes used to query the
+database for every request. `PoIIndex` loads the whole table once into an
+immutable index: the poi_ids of all cells are packed into one array sorted by
+cell, such that the PoIs of a cell are a slice of it, and every PoI is kept as
+serialized JSON. `LivePoIIndex` reloads the index when the database file
+changes, and serves an empty index while the file does not exist.
+
+The index also caches the encoded responses of the PoI routes. The random
+padding of PoI responses is spliced into the cached bytes, between the
+encoding of the fields before and after it, using precomputed encodings of
+every padding length.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from array import array
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Database of the PoIs, relative to the working directory of the server
+DATABASE = "fingerprint.db"
+# Named by SQLAlchemy after the `PoI` model the database was created with
+POI_TABLE = "po_i"
+
+# Seconds between two checks whether the database file changed
+REFRESH_INTERVAL = 1.0
+
+# Maximum number of cells of a request covering several cells
+MAX_CELLS = 100
+
+# poi_id, poi_name, poi_address, grid_id, poi_ratings
+PoIRecord = Tuple[int, str, str, int, str]
+
+# Encodes a response as JSON
+Dumps = Callable[[object], bytes]
+
+# Placeholder of the padding while encoding a response
+PADDING_PLACEHOLDER = "\0padding\0"
+PADDING_VALUE = -1
+
+
+def json_dumps(obj) -> bytes:
+    """Encode with the default settings of the json module"""
+    return json.dumps(obj).encode()
+
+
+def jsonify_dumps(obj) -> bytes:
+    """Encode like `jsonify` of the Flask server, which runs in debug mode:
+    sorted keys, indented by 2 and followed by a newline"""
+    return (json.dumps(obj, indent=2, sort_keys=True) + "\n").encode()
+
+
+def parse_cell_ids(data: bytes) -> List[int]:
+    """Parse the JSON list of cell_ids of a request covering several cells
+
+    Args:
+        data (bytes): The encoded list
+
+    Raises:
+        ValueError: If it is not a non-empty list of at most MAX_CELLS integers
+
+    Returns:
+        List[int]: The cell_ids
+    """
+    cell_ids = json.loads(data.decode("utf-8"))
+    if not isinstance(cell_ids, list) or not 0 < len(cell_ids) <= MAX_CELLS \
+            or any(type(cell_id) is not int for cell_id in cell_ids):
+        raise ValueError(f"Expected a list of 1 to {MAX_CELLS} cell_ids")
+    return cell_ids
+
+
+class PoIIndex:
+    def __init__(self, records: Iterable[PoIRecord], dumps: Dumps = json_dumps):
+        """Immutable index of PoI records
+
+        Args:
+            records (Iterable[PoIRecord]): All PoI records
+            dumps (Dumps, optional): Encodes the responses. Defaults to json_dumps.
+        """
+        records = sorted(records, key=lambda record: (record[3], record[0]))
+
+        # poi_ids of cell c are poi_ids[offsets[c - first_cell]:offsets[c - first_cell + 1]]
+        self.poi_ids_by_cell = array("q", (record[0] for record in records))
+        self.first_cell = records[0][3] if records else 0
+        cells = records[-1][3] - self.first_cell + 1 if records else 0
+        self.offsets = array("q", [0] * (cells + 1))
+        for record in records:
+            self.offsets[record[3] - self.first_cell + 1] += 1
+        for i in range(cells):
+            self.offsets[i + 1] += self.offsets[i]
+
+        self.pois: Dict[int, bytes] = {
+            record[0]: self.serialize(record) for record in records}
+
+        # Encoded responses, built the first time they are requested
+        self.dumps = dumps
+        self.cell_responses: Dict[int, bytes] = dict()
+        self.poi_responses: Dict[int, Tuple[bytes, bytes]] = dict()
+        self.paddings: List[bytes] = []
+        self.empty_cell_response: Optional[bytes] = None
+
+    @staticmethod
+    def serialize(record: PoIRecord) -> bytes:
+        """Serialize a PoI record as a dict of its fields, with the ratings decoded"""
+        poi_id, poi_name, poi_address, grid_id, poi_ratings = record
+        return json.dumps(dict(
+            poi_id=poi_id,
+            poi_name=poi_name,
+            poi_address=poi_address,
+            grid_id=grid_id,
+            poi_ratings=json.loads(poi_ratings),
+        )).encode()
+
+    @staticmethod
+    def load(path: str = DATABASE, dumps: Dumps = json_dumps) -> "PoIIndex":
+        """Load the index of a PoI database
+
+        Args:
+            path (str, optional): Path of the database. Defaults to DATABASE.
+            dumps (Dumps, optional): Encodes the responses. Defaults to json_dumps.
+
+        Returns:
+            PoIIndex: The index of all PoIs in the database
+        """
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            records = connection.execute(
+                f"SELECT poi_id, poi_name, poi_address, grid_id, poi_ratings FROM {POI_TABLE}").fetchall()
+        finally:
+            connection.close()
+        return PoIIndex(records, dumps)
+
+    def poi_ids(self, cell_id: int) -> array:
+        """poi_ids of the PoIs in a cell, in increasing order
+
+        Args:
+            cell_id (int): The cell
+
+        Returns:
+            array: The poi_ids, empty if there are no PoIs in the cell
+        """
+        i = cell_id - self.first_cell
+        if not 0 <= i < len(self.offsets) - 1:
+            return array("q")
+        return self.poi_ids_by_cell[self.offsets[i]:self.offsets[i + 1]]
+
+    def poi(self, poi_id: int) -> Optional[bytes]:
+        """Serialized JSON of a PoI, None if there is no PoI with this ID"""
+        return self.pois.get(poi_id)
+
+    def cell_response(self, cell_id: int) -> bytes:
+        """Encoded response listing the poi_ids of a cell, {"poi_list": [...]}"""
+        response = self.cell_responses.get(cell_id)
+        if response is None:
+            poi_ids = self.poi_ids(cell_id)
+            if not poi_ids:
+                # Not cached per cell, there is any number of empty cells
+                if self.empty_cell_response is None:
+                    self.empty_cell_response = self.dumps({"poi_list": []})
+                return self.empty_cell_response
+            response = self.cell_responses[cell_id] = self.dumps({"poi_list": poi_ids.tolist()})
+        return response
+
+    def cells_response(self, cell_ids: List[int]) -> bytes:
+        """Encoded response with the PoIs of several cells, in the order of the cells,
+        {"cells": [{"cell_id": ..., "pois": [...]}, ...]}"""
+        return self.dumps({"cells": [
+            {"cell_id": cell_id, "pois": [json.loads(self.pois[poi_id]) for poi_id in self.poi_ids(cell_id)]}
+            for cell_id in cell_ids]})
+
+    def poi_response(self, poi_id: int, padding_length: int) -> Optional[bytes]:
+        """Encoded response of a PoI, with a padding of the given length
+
+        Args:
+            poi_id (int): The PoI
+            padding_length (int): Number of padding values
+
+        Returns:
+            Optional[bytes]: The response, None if there is no PoI with this ID
+        """
+        parts = self.poi_responses.get(poi_id)
+        if parts is None:
+            poi = self.poi(poi_id)
+            if poi is None:
+                return None
+            parts = self.poi_responses[poi_id] = self._split({**json.loads(poi), "padding": PADDING_PLACEHOLDER})
+        head, tail = parts
+        return head + self.padding(padding_length) + tail
+
+    def padding(self, length: int) -> bytes:
+        """Encoded padding of the given length, as a field of a response"""
+        paddings = self.paddings
+        if length >= len(paddings):
+            # The padding is encoded the same in any response, take it from the smallest one
+            head, tail = self._split({"padding": PADDING_PLACEHOLDER})
+            paddings = list(paddings)
+            while length >= len(paddings):
+                full = self.dumps({"padding": [PADDING_VALUE] * len(paddings)})
+                paddings.append(full[len(head):len(full) - len(tail)])
+            # Replaced rather than extended, requests in other threads may be reading it
+            self.paddings = paddings
+        return paddings[length]
+
+    def _split(self, response: dict) -> Tuple[bytes, bytes]:
+        # Encoding before and after the padding placeholder
+        encoded = self.dumps(response)
+        placeholder = self.dumps(PADDING_PLACEHOLDER).strip()
+        head, tail = encoded.split(placeholder)
+        return head, tail
+
+
+class LivePoIIndex:
+    def __init__(self, path: str = DATABASE, refresh_interval: float = REFRESH_INTERVAL, dumps: Dumps = json_dumps):
+        """Index of a PoI database file, which is reloaded when the file changes
+
+        Args:
+            path (str, optional): Path of the database, resolved once from the
+                working directory. Defaults to DATABASE.
+            refresh_interval (float, optional): Seconds between two checks of the file. Defaults to REFRESH_INTERVAL.
+            dumps (Dumps, optional): Encodes the responses. Defaults to json_dumps.
+        """
+        self.path = os.path.abspath(path)
+        self.refresh_interval = refresh_interval
+        self.dumps = dumps
+        self.lock = Lock()
+        self.version = self._version()
+        self.index = self._load(self.version)
+        self.checked = time.monotonic()
+
+    def _version(self) -> Optional[Tuple[int, int, int]]:
+        # None while the file does not exist
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load(self, version: Optional[Tuple[int, int, int]]) -> PoIIndex:
+        if version is None:
+            # Without a database every PoI route answers as for an unknown cell or PoI
+            return PoIIndex([], self.dumps)
+        return PoIIndex.load(self.path, self.dumps)
+
+    def stale(self) -> bool:
+        """Whether the next `get` checks the database file, and may reload it"""
+        return time.monotonic() - self.checked >= self.refresh_interval
+
+    def get(self) -> PoIIndex:
+        """The index of the current content of the database file"""
+        now = time.monotonic()
+        if now - self.checked < self.refresh_interval:
+            return self.index
+
+        with self.lock:
+            if now - self.checked >= self.refresh_interval:
+                version = self._version()
+                if version != self.version:
+                    # Swap in a new index, requests still using the old one are not affected
+                    self.index = self._load(version)
+                    self.version = version
+                self.checked = time.monotonic()
+        return self.index
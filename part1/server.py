@@ -1,20 +1,17 @@
 """
 Server entrypoint.
 
-!!! DO NOT MODIFY THIS FILE !!!
-
+Generates the keys of the server (`setup`) and runs it (`run`). The routes of
+the Flask application are defined in `server_app.py`, which is only imported
+to run the server.
 """
 
 import argparse
-import json
-import random
 import sys
-from typing import Dict, List, Union
-
-from flask import Flask, jsonify, make_response, request
-from flask_sqlalchemy import SQLAlchemy
+from typing import List
 
-from stroll import Server
+from stroll import NONCE_POOL_DEPTH, Server, WorkerPool
+from wire import JSONPICKLE, WIRE_FORMATS
 
 
 def main(args: List[str]) -> None:
@@ -50,6 +47,13 @@ def main(args: List[str]) -> None:
         default=list(),
         action="append"
     )
+    parser_setup.add_argument(
+        "-f",
+        "--wire-format",
+        help="Wire format of the keys, which clients use by default.",
+        choices=WIRE_FORMATS,
+        default=JSONPICKLE
+    )
 
     parser_setup.set_defaults(callback=server_setup)
 
@@ -68,6 +72,20 @@ def main(args: List[str]) -> None:
         default="key.sec",
         type=argparse.FileType("rb")
     )
+    parser_run.add_argument(
+        "-w",
+        "--workers",
+        help="Number of worker processes for the crypto, 0 to run it in the request thread.",
+        type=int,
+        default=0
+    )
+    parser_run.add_argument(
+        "-n",
+        "--nonce-pool-depth",
+        help="Number of blinding nonces precomputed for registrations, 0 to precompute none.",
+        type=int,
+        default=NONCE_POOL_DEPTH
+    )
 
     parser_run.set_defaults(callback=server_run)
 
@@ -89,7 +107,7 @@ def server_setup(args: argparse.Namespace) -> None:
     subscriptions.append("username")
 
     try:
-        secret_key, public_key = Server.generate_ca(subscriptions)
+        secret_key, public_key = Server.generate_ca(subscriptions, args.wire_format)
 
         public_key_fd.write(public_key)
         secret_key_fd.write(secret_key)
@@ -105,195 +123,22 @@ def server_setup(args: argparse.Namespace) -> None:
 def server_run(args: argparse.Namespace) -> None:
     """Handle `run` subcommand."""
 
-    # pylint: disable=global-statement
-    global PUBLIC_KEY
-    global SECRET_KEY
-    global SERVER
-
     try:
-        PUBLIC_KEY = args.pub.read()
-        SECRET_KEY = args.sec.read()
+        public_key = args.pub.read()
+        secret_key = args.sec.read()
 
     finally:
         args.pub.close()
         args.sec.close()
 
-    SERVER = Server()
-
-    host = "0.0.0.0"
-    port = 8080
-
-    APP.run(host=host, port=port, debug=True, threaded=False, processes=1)
-
-
-APP = Flask(__name__)
-
-
-DB = SQLAlchemy()
-
-
-class PoI(DB.Model):  # type: ignore
-    """A PoI object consists of the following:
-
-    poi_id -- ID of the PoI
-    poi_name -- Name of the PoI
-    poi_address -- Address of the PoI
-    grid_id -- Grid in which the PoI is present
-    poi_ratings -- List of ratings for the PoI.
-    """
-
-    # pylint: disable=no-member
-
-    poi_id = DB.Column(DB.Integer, primary_key=True)  # type: ignore
-    poi_name = DB.Column(DB.String)  # type: ignore
-    poi_address = DB.Column(DB.String)  # type: ignore
-    grid_id = DB.Column(DB.Integer)  # type: ignore
-    poi_ratings = DB.Column(DB.String)  # type: ignore
-
-    def to_dict(self) -> Dict[str, Union[int, str]]:
-        """
-        Return a dictionary representation of the object.
-        """
-        return dict(
-            poi_id=self.poi_id,
-            poi_name=self.poi_name,
-            poi_address=self.poi_address,
-            grid_id=self.grid_id,
-            poi_ratings=self.poi_ratings,
-        )
-
-
-APP.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///fingerprint.db"
-APP.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-DB.app = APP
-DB.init_app(APP)
-
-
-PUBLIC_KEY = None
-SECRET_KEY = None
-SERVER = None
-
-
-@APP.route("/public-key", methods=["GET"])  # type: ignore
-def get_public_key():
-    """Handle requests for public key."""
-    return PUBLIC_KEY, 200
-
-
-@APP.route("/register", methods=["POST"])
-def register():
-    """Handle registrations."""
-    username = request.files.get("username").read().decode("utf-8")
-    subscriptions_raw = request.files.get(
-        "subscriptions").read().decode("utf-8")
-    issuance_req = request.files.get("issuance_req").read()
-    subscriptions = json.loads(subscriptions_raw)
-    registration_res = SERVER.process_registration(
-        SECRET_KEY,  # type: ignore
-        PUBLIC_KEY,  # type: ignore
-        issuance_req,
-        username,
-        subscriptions
-    )
-
-    server_res = make_response(registration_res)
-    return server_res
-
-
-def convert_loc_to_gridval(loc):
-    """Placeholder function. Final function would convert the location to a grid value."""
-    return int(loc)
-
-
-@APP.route("/poi-loc", methods=["POST"])
-def get_poi_loc():
-    """Takes in a latitude and longitude as input, returns a list of associated POIs."""
-
-    lat = float(request.files.get("lat").read().decode("utf-8"))
-    lon = float(request.files.get("lon").read().decode("utf-8"))
-    types = json.loads(request.files.get("types").read().decode("utf-8"))
-    signature = request.files.get("signature").read()
-    message = (f"{lat},{lon}").encode("utf-8")
-
-    valid = SERVER.check_request_signature(
-        PUBLIC_KEY, message, types, signature  # type: ignore
-    )
-
-    if not valid:
-        return "Invalid signature", 401
-
-    # PoIs are within coordinates (46.5, 6.55) and (46.57, 6.65)
-    # mapped to a 10 x 10 grid
-    if 46.5 <= lat <= 46.57 and 6.55 <= lon <= 6.65:
-        cell_x = ((lat - 46.5) / 0.07) * 10
-        cell_y = ((lon - 6.55) / 0.1) * 10
-        cell_id = int(cell_x + (cell_y * 10))
-        records = PoI.query.filter_by(grid_id=cell_id).all()
-
-        if records:
-            poi_list = [record.to_dict()["poi_id"] for record in records]
-            poi_list_res = {"poi_list": poi_list}
-        else:
-            poi_list_res = {"poi_list": []}
-    else:
-        poi_list_res = {"poi_list": []}
-
-    return jsonify(poi_list_res)
-
-
-@APP.route("/poi-grid", methods=["POST"])
-def get_poi_list():
-    """Takes in a cell ID as input, returns a list of associated POIs."""
+    # Flask is only imported to run the server, not for `setup`
+    import server_app  # pylint: disable=import-outside-toplevel
 
-    cell_id = int(request.files.get("cell_id").read().decode("utf-8"))
-    types = json.loads(request.files.get("types").read().decode("utf-8"))
-    signature = request.files.get("signature").read()
-    message = (f"{cell_id}").encode("utf-8")
-
-    valid = SERVER.check_request_signature(
-        PUBLIC_KEY, message, types, signature  # type: ignore
-    )
-
-    if not valid:
-        return "Invalid signature", 401
-
-    records = PoI.query.filter_by(grid_id=cell_id).all()
-
-    if records:
-        poi_list = [record.to_dict()["poi_id"] for record in records]
-        poi_list_res = {"poi_list": poi_list}
-
-    else:
-        return "Not found", 404
-
-    return jsonify(poi_list_res)
-
-
-@APP.route("/poi", methods=["GET"])
-def get_poi_info():
-    """Takes in a PoI ID as input, returns information about that PoI.
-    We have a paramter 'noise_factor' for tuning.
-    This is used to slightly alter the size of responses sent by the server.
-    Server adds padding records based on the noise factor. Do not change
-    the noise code, this is used to simulate slight variations in traces
-    from the server."""
-
-    poi_id = request.args.get('poi_id')
-    noise_factor = 10
-
-    records = PoI.query.filter_by(poi_id=int(poi_id)).all()  # type: ignore
-    if records:
-        poi_info = records[0].to_dict()
-        poi_info["poi_ratings"] = json.loads(poi_info["poi_ratings"])
-
-        random_length = random.randint(0, noise_factor)
-        padding = [-1 for x in range(0, random_length)]
-        poi_info["padding"] = padding
-
-    else:
-        return "Not found", 404
+    # With workers, requests are handled in threads that wait for the workers
+    workers = WorkerPool(args.workers, keys=[public_key, secret_key],
+                         nonce_pool_depth=args.nonce_pool_depth) if args.workers else None
 
-    return jsonify(poi_info)
+    server_app.run(public_key, secret_key, workers, args.nonce_pool_depth)
 
 
 if __name__ == "__main__":
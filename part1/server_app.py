@@ -0,0 +1,201 @@
+"""
+Flask application of the server entrypoint.
+
+Only imported by `server.py run`, such that the short-lived `server.py setup`
+does not import Flask. The PoI routes are served from the in-memory index of
+`poi_index.py`, the database is never queried through SQLAlchemy.
+"""
+
+import json
+import random
+from typing import Optional
+
+from flask import Flask, jsonify, make_response, request
+
+from poi_index import DATABASE, LivePoIIndex, parse_cell_ids
+from stroll import NONCE_POOL_DEPTH, Server, WorkerPool, cells_message
+
+
+def run(public_key: bytes, secret_key: bytes, workers: Optional[WorkerPool] = None,
+        nonce_pool_depth: int = NONCE_POOL_DEPTH) -> None:
+    """Run the server with the given keys.
+
+    Args:
+        public_key: the server's public key (serialized)
+        secret_key: the server's secret key (serialized)
+        workers: worker processes running the crypto. None runs it in the
+            request thread.
+        nonce_pool_depth: number of blinding nonces precomputed for
+            registrations in the background, 0 to precompute none. Workers
+            keep their own nonces.
+    """
+
+    # pylint: disable=global-statement
+    global PUBLIC_KEY
+    global SECRET_KEY
+    global SERVER
+    global POI_INDEX
+
+    PUBLIC_KEY = public_key
+    SECRET_KEY = secret_key
+    SERVER = Server(workers=workers, nonce_pool_depth=nonce_pool_depth)
+    if workers is None and nonce_pool_depth:
+        SERVER.precompute_registrations(public_key)
+    POI_INDEX = LivePoIIndex(DATABASE, dumps=jsonify_bytes)
+
+    host = "0.0.0.0"
+    port = 8080
+
+    APP.run(host=host, port=port, debug=True, threaded=workers is not None, processes=1)
+
+
+APP = Flask(__name__)
+
+
+PUBLIC_KEY = None
+SECRET_KEY = None
+SERVER = None
+POI_INDEX = None
+
+
+def jsonify_bytes(obj) -> bytes:
+    """Encode obj like `jsonify`, such that the response can be cached."""
+    with APP.app_context():
+        return jsonify(obj).get_data()
+
+
+def cached_response(body: bytes):
+    """Response for bytes encoded by `jsonify_bytes`."""
+    return APP.response_class(body, mimetype=APP.json.mimetype)  # type: ignore
+
+
+@APP.route("/public-key", methods=["GET"])  # type: ignore
+def get_public_key():
+    """Handle requests for public key."""
+    return PUBLIC_KEY, 200
+
+
+@APP.route("/register", methods=["POST"])
+def register():
+    """Handle registrations."""
+    username = request.files.get("username").read().decode("utf-8")
+    subscriptions_raw = request.files.get(
+        "subscriptions").read().decode("utf-8")
+    issuance_req = request.files.get("issuance_req").read()
+    subscriptions = json.loads(subscriptions_raw)
+    registration_res = SERVER.process_registration(
+        SECRET_KEY,  # type: ignore
+        PUBLIC_KEY,  # type: ignore
+        issuance_req,
+        username,
+        subscriptions
+    )
+
+    server_res = make_response(registration_res)
+    return server_res
+
+
+def convert_loc_to_gridval(loc):
+    """Placeholder function. Final function would convert the location to a grid value."""
+    return int(loc)
+
+
+@APP.route("/poi-loc", methods=["POST"])
+def get_poi_loc():
+    """Takes in a latitude and longitude as input, returns a list of associated POIs."""
+
+    lat = float(request.files.get("lat").read().decode("utf-8"))
+    lon = float(request.files.get("lon").read().decode("utf-8"))
+    types = json.loads(request.files.get("types").read().decode("utf-8"))
+    signature = request.files.get("signature").read()
+    message = (f"{lat},{lon}").encode("utf-8")
+
+    valid = SERVER.check_request_signature(
+        PUBLIC_KEY, message, types, signature  # type: ignore
+    )
+
+    if not valid:
+        return "Invalid signature", 401
+
+    # PoIs are within coordinates (46.5, 6.55) and (46.57, 6.65)
+    # mapped to a 10 x 10 grid
+    if 46.5 <= lat <= 46.57 and 6.55 <= lon <= 6.65:
+        cell_x = ((lat - 46.5) / 0.07) * 10
+        cell_y = ((lon - 6.55) / 0.1) * 10
+        cell_id = int(cell_x + (cell_y * 10))
+        return cached_response(POI_INDEX.get().cell_response(cell_id))  # type: ignore
+    else:
+        poi_list_res = {"poi_list": []}
+
+    return jsonify(poi_list_res)
+
+
+@APP.route("/poi-grid", methods=["POST"])
+def get_poi_list():
+    """Takes in a cell ID as input, returns a list of associated POIs."""
+
+    cell_id = int(request.files.get("cell_id").read().decode("utf-8"))
+    types = json.loads(request.files.get("types").read().decode("utf-8"))
+    signature = request.files.get("signature").read()
+    message = (f"{cell_id}").encode("utf-8")
+
+    valid = SERVER.check_request_signature(
+        PUBLIC_KEY, message, types, signature  # type: ignore
+    )
+
+    if not valid:
+        return "Invalid signature", 401
+
+    index = POI_INDEX.get()  # type: ignore
+
+    if not index.poi_ids(cell_id):
+        return "Not found", 404
+
+    return cached_response(index.cell_response(cell_id))
+
+
+@APP.route("/poi-cells", methods=["POST"])
+def get_poi_cells():
+    """Takes in a list of cell IDs as input, signed by a single signature,
+    returns information about the POIs of all these cells."""
+
+    try:
+        cell_ids = parse_cell_ids(request.files.get("cell_ids").read())
+    except ValueError:
+        return "Invalid cell_ids", 400
+    types = json.loads(request.files.get("types").read().decode("utf-8"))
+    signature = request.files.get("signature").read()
+    message = cells_message(cell_ids)
+
+    valid = SERVER.check_request_signature(
+        PUBLIC_KEY, message, types, signature  # type: ignore
+    )
+
+    if not valid:
+        return "Invalid signature", 401
+
+    return cached_response(POI_INDEX.get().cells_response(cell_ids))  # type: ignore
+
+
+@APP.route("/poi", methods=["GET"])
+def get_poi_info():
+    """Takes in a PoI ID as input, returns information about that PoI.
+    We have a paramter 'noise_factor' for tuning.
+    This is used to slightly alter the size of responses sent by the server.
+    Server adds padding records based on the noise factor. Do not change
+    the noise code, this is used to simulate slight variations in traces
+    from the server."""
+
+    poi_id = request.args.get('poi_id')
+    noise_factor = 10
+
+    index = POI_INDEX.get()  # type: ignore
+    if index.poi(int(poi_id)) is not None:
+        # The padding is spliced into the cached response
+        random_length = random.randint(0, noise_factor)
+        poi_info = index.poi_response(int(poi_id), random_length)
+
+    else:
+        return "Not found", 404
+
+    return cached_response(poi_info)
@@ -0,0 +1,379 @@
+"""
+Asyncio server entrypoint.
+
+Serves the same routes as `server.py`, but handles all requests concurrently on
+an event loop. The crypto of registrations and signature checks runs in an
+executor (a single thread, or a pool of worker processes), such that a slow
+verification never blocks the public key or PoI lookups of other clients, which
+are served from the in-memory PoI index. Keep-alive connections may pipeline
+their requests. Once too many crypto requests are pending, new ones are
+rejected right away with 503 instead of queueing without bound.
+
+Keys are generated with `server.py setup`.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from poi_index import DATABASE, LivePoIIndex, PoIIndex, jsonify_dumps, parse_cell_ids
+from stroll import NONCE_POOL_DEPTH, Server, WorkerPool, cells_message
+
+
+# Maximum number of crypto requests queued or running, further ones get 503
+MAX_PENDING = 64
+
+# Seconds a client should wait after a 503
+RETRY_AFTER = 1
+
+
+#
+# Parser
+#
+
+
+def main(args: List[str]) -> None:
+    """Parse the arguments given to the server, and call the appropriate method."""
+
+    parser = argparse.ArgumentParser(
+        description="Asyncio server for CS-523 project 2.")
+    subparsers = parser.add_subparsers(help="Command")
+
+    parser_run = subparsers.add_parser("run", help="Run the server.")
+    parser_run.add_argument(
+        "-p",
+        "--pub",
+        help="Name of the file containing the public key.",
+        default="key.pub",
+        type=argparse.FileType("rb")
+    )
+    parser_run.add_argument(
+        "-s",
+        "--sec",
+        help="Name of the file containing the secret key.",
+        default="key.sec",
+        type=argparse.FileType("rb")
+    )
+    parser_run.add_argument(
+        "-w",
+        "--workers",
+        help="Number of worker processes for the crypto, 0 to run it in a single thread.",
+        type=int,
+        default=0
+    )
+    parser_run.add_argument(
+        "-m",
+        "--max-pending",
+        help="Maximum number of pending crypto requests, further ones are rejected.",
+        type=int,
+        default=MAX_PENDING
+    )
+    parser_run.add_argument(
+        "-n",
+        "--nonce-pool-depth",
+        help="Number of blinding nonces precomputed for registrations, 0 to precompute none.",
+        type=int,
+        default=NONCE_POOL_DEPTH
+    )
+    parser_run.add_argument(
+        "--port",
+        help="Port to listen on.",
+        type=int,
+        default=8080
+    )
+
+    parser_run.set_defaults(callback=server_run)
+
+    namespace = parser.parse_args(args)
+
+    if "callback" in namespace:
+        namespace.callback(namespace)
+
+    else:
+        parser.print_help()
+
+
+def server_run(args: argparse.Namespace) -> None:
+    """Handle `run` subcommand."""
+
+    try:
+        public_key = args.pub.read()
+        secret_key = args.sec.read()
+
+    finally:
+        args.pub.close()
+        args.sec.close()
+
+    workers = WorkerPool(args.workers, keys=[public_key, secret_key],
+                         nonce_pool_depth=args.nonce_pool_depth) if args.workers else None
+    app = make_app(public_key, secret_key, workers=workers, max_pending=args.max_pending,
+                   nonce_pool_depth=args.nonce_pool_depth)
+
+    web.run_app(app, host="0.0.0.0", port=args.port)
+
+
+#
+# Crypto
+#
+
+
+class Overloaded(Exception):
+    """Too many crypto requests are pending."""
+
+
+class CryptoExecutor:
+    """Runs the crypto of the server outside of the event loop, and bounds the
+    number of pending requests."""
+
+    def __init__(self, public_key: bytes, secret_key: bytes, workers: Optional[WorkerPool] = None,
+                 max_pending: int = MAX_PENDING, nonce_pool_depth: int = NONCE_POOL_DEPTH):
+        """
+        Args:
+            public_key: the server's public key (serialized)
+            secret_key: the server's secret key (serialized)
+            workers: worker processes running the crypto. None runs it in a
+                single thread of this process.
+            max_pending: maximum number of requests queued or running
+            nonce_pool_depth: number of blinding nonces precomputed for
+                registrations in the background, 0 to precompute none.
+                Workers keep their own nonces.
+        """
+        self.public_key = public_key
+        self.secret_key = secret_key
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        # Without workers, the server runs in the crypto thread only
+        self.server = Server(nonce_pool_depth=nonce_pool_depth)
+        self.thread: Optional[Executor] = None if workers else ThreadPoolExecutor(1, thread_name_prefix="crypto")
+        if workers is None and nonce_pool_depth:
+            self.server.precompute_registrations(public_key)
+
+    async def _run(self, submit: Callable[[], "Future"]):
+        if self.pending >= self.max_pending:
+            raise Overloaded()
+        self.pending += 1
+        try:
+            return await asyncio.wrap_future(submit())
+        finally:
+            self.pending -= 1
+
+    async def process_registration(self, issuance_request: bytes, username: str, subscriptions: List[str]) -> bytes:
+        """Server.process_registration with the keys of the server"""
+        args = (self.secret_key, self.public_key, issuance_request, username, subscriptions)
+        if self.workers is not None:
+            return await self._run(lambda: self.workers.process_registration(*args))  # type: ignore
+        return await self._run(lambda: self.thread.submit(self.server.process_registration, *args))  # type: ignore
+
+    async def check_request_signature(self, message: bytes, types: List[str], signature: bytes) -> bool:
+        """Server.check_request_signature with the public key of the server"""
+        args = (self.public_key, message, types, signature)
+
+        # Resubmitted requests are answered from the replay cache, without taking a pending slot
+        key = self.server.replays.key(*args)
+        verdict = self.server.replays.get(key)
+        if verdict is not None:
+            return verdict
+
+        if self.workers is not None:
+            verdict = await self._run(lambda: self.workers.check_request_signature(*args))  # type: ignore
+        else:
+            verdict = await self._run(lambda: self.thread.submit(self.server.verify_request_signature, *args))  # type: ignore
+        self.server.replays.put(key, verdict)
+        return verdict
+
+    def shutdown(self):
+        """Stop the crypto threads and workers"""
+        self.server.stop()
+        if self.thread is not None:
+            self.thread.shutdown()
+        if self.workers is not None:
+            self.workers.shutdown()
+
+
+#
+# Routes
+#
+
+
+# aiohttp < 3.9 (the last ones for Python 3.7) has no typed application keys
+if hasattr(web, "AppKey"):
+    CRYPTO = web.AppKey("crypto", CryptoExecutor)
+    POI_INDEX = web.AppKey("poi_index", LivePoIIndex)
+else:
+    CRYPTO = "crypto"  # type: ignore
+    POI_INDEX = "poi_index"  # type: ignore
+
+
+async def read_files(request: web.Request) -> Dict[str, bytes]:
+    """Read the files of a multipart request, as sent by `client.py`"""
+    files = dict()
+    reader = await request.multipart()
+    async for part in reader:
+        files[part.name] = bytes(await part.read())  # type: ignore
+    return files
+
+
+@web.middleware
+async def overload_middleware(request: web.Request, handler):
+    """Answer 503 if the crypto executor is overloaded"""
+    try:
+        return await handler(request)
+    except Overloaded:
+        return web.Response(status=503, text="Server overloaded", headers={"Retry-After": str(RETRY_AFTER)})
+
+
+def json_bytes_response(body: bytes) -> web.Response:
+    """Response for cached JSON bytes"""
+    return web.Response(body=body, content_type="application/json")
+
+
+async def poi_index(request: web.Request) -> PoIIndex:
+    """The current PoI index. Checking the database file, and reloading it,
+    runs in a thread, such that it never blocks the event loop."""
+    live = request.app[POI_INDEX]
+    if live.stale():
+        return await asyncio.get_running_loop().run_in_executor(None, live.get)
+    return live.get()
+
+
+async def get_public_key(request: web.Request) -> web.Response:
+    """Handle requests for public key."""
+    return web.Response(body=request.app[CRYPTO].public_key)
+
+
+async def register(request: web.Request) -> web.Response:
+    """Handle registrations."""
+    files = await read_files(request)
+    username = files["username"].decode("utf-8")
+    subscriptions = json.loads(files["subscriptions"].decode("utf-8"))
+    issuance_req = files["issuance_req"]
+
+    registration_res = await request.app[CRYPTO].process_registration(issuance_req, username, subscriptions)
+    return web.Response(body=registration_res)
+
+
+def loc_to_cell_id(lat: float, lon: float) -> Optional[int]:
+    """Cell of a location, None if it is outside of the grid"""
+    # PoIs are within coordinates (46.5, 6.55) and (46.57, 6.65)
+    # mapped to a 10 x 10 grid
+    if 46.5 <= lat <= 46.57 and 6.55 <= lon <= 6.65:
+        cell_x = ((lat - 46.5) / 0.07) * 10
+        cell_y = ((lon - 6.55) / 0.1) * 10
+        return int(cell_x + (cell_y * 10))
+    return None
+
+
+async def get_poi_loc(request: web.Request) -> web.Response:
+    """Takes in a latitude and longitude as input, returns a list of associated POIs."""
+    files = await read_files(request)
+    lat = float(files["lat"].decode("utf-8"))
+    lon = float(files["lon"].decode("utf-8"))
+    types = json.loads(files["types"].decode("utf-8"))
+    signature = files["signature"]
+    message = (f"{lat},{lon}").encode("utf-8")
+
+    if not await request.app[CRYPTO].check_request_signature(message, types, signature):
+        return web.Response(status=401, text="Invalid signature")
+
+    cell_id = loc_to_cell_id(lat, lon)
+    if cell_id is None:
+        return json_bytes_response(jsonify_dumps({"poi_list": []}))
+    return json_bytes_response((await poi_index(request)).cell_response(cell_id))
+
+
+async def get_poi_list(request: web.Request) -> web.Response:
+    """Takes in a cell ID as input, returns a list of associated POIs."""
+    files = await read_files(request)
+    cell_id = int(files["cell_id"].decode("utf-8"))
+    types = json.loads(files["types"].decode("utf-8"))
+    signature = files["signature"]
+    message = (f"{cell_id}").encode("utf-8")
+
+    if not await request.app[CRYPTO].check_request_signature(message, types, signature):
+        return web.Response(status=401, text="Invalid signature")
+
+    index = await poi_index(request)
+    if not index.poi_ids(cell_id):
+        return web.Response(status=404, text="Not found")
+    return json_bytes_response(index.cell_response(cell_id))
+
+
+async def get_poi_cells(request: web.Request) -> web.Response:
+    """Takes in a list of cell IDs as input, signed by a single signature,
+    returns information about the POIs of all these cells."""
+    files = await read_files(request)
+    try:
+        cell_ids = parse_cell_ids(files["cell_ids"])
+    except ValueError:
+        return web.Response(status=400, text="Invalid cell_ids")
+    types = json.loads(files["types"].decode("utf-8"))
+    signature = files["signature"]
+    message = cells_message(cell_ids)
+
+    if not await request.app[CRYPTO].check_request_signature(message, types, signature):
+        return web.Response(status=401, text="Invalid signature")
+
+    return json_bytes_response((await poi_index(request)).cells_response(cell_ids))
+
+
+async def get_poi_info(request: web.Request) -> web.Response:
+    """Takes in a PoI ID as input, returns information about that PoI.
+    Adds the same random padding as `server.py`, to simulate slight
+    variations in traces from the server."""
+    poi_id = int(request.query["poi_id"])
+    noise_factor = 10
+
+    index = await poi_index(request)
+    if index.poi(poi_id) is None:
+        return web.Response(status=404, text="Not found")
+
+    # The padding is spliced into the cached response
+    random_length = random.randint(0, noise_factor)
+    return json_bytes_response(index.poi_response(poi_id, random_length))  # type: ignore
+
+
+def make_app(public_key: bytes, secret_key: bytes, database: str = DATABASE,
+             workers: Optional[WorkerPool] = None, max_pending: int = MAX_PENDING,
+             nonce_pool_depth: int = NONCE_POOL_DEPTH) -> web.Application:
+    """Create the application serving the routes of `server.py`
+
+    Args:
+        public_key: the server's public key (serialized)
+        secret_key: the server's secret key (serialized)
+        database: path of the PoI database
+        workers: worker processes running the crypto. None runs it in a
+            single thread.
+        max_pending: maximum number of pending crypto requests
+        nonce_pool_depth: number of blinding nonces precomputed for
+            registrations, 0 to precompute none
+
+    Returns:
+        the application
+    """
+    app = web.Application(middlewares=[overload_middleware])
+    app[CRYPTO] = CryptoExecutor(public_key, secret_key, workers, max_pending, nonce_pool_depth)
+    # Responses are encoded byte for byte like the ones of server.py
+    app[POI_INDEX] = LivePoIIndex(database, dumps=jsonify_dumps)
+
+    async def shutdown(app: web.Application):
+        app[CRYPTO].shutdown()
+    app.on_cleanup.append(shutdown)
+
+    app.router.add_get("/public-key", get_public_key)
+    app.router.add_post("/register", register)
+    app.router.add_post("/poi-loc", get_poi_loc)
+    app.router.add_post("/poi-grid", get_poi_list)
+    app.router.add_post("/poi-cells", get_poi_cells)
+    app.router.add_get("/poi", get_poi_info)
+    return app
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
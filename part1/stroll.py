@@ -4,15 +4,397 @@ Classes that you need to complete.
 
 
 from credential import *
-from typing import List, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Any, Deque, FrozenSet, Hashable, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+import time
 
 # Optional import
 from serialization import jsonpickle
+from wire import JSONPICKLE, WIRE_FORMATS, decode_public_key, dumps, loads, wire_format_of
 
 
 PRESENT_SUBSCRIPTION = b'present'
 ABSENT_SUBSCRIPTION = b'absent'
 
+# Every credential and disclosure carries them, their exponents are converted once
+intern_attribute(PRESENT_SUBSCRIPTION)
+intern_attribute(ABSENT_SUBSCRIPTION)
+
+# Number of decoded keys kept by a KeyCache
+KEY_CACHE_SIZE = 8
+
+# Number of precomputed disclosure proofs a DisclosurePool keeps ready per request type
+DISCLOSURE_POOL_DEPTH = 4
+
+# Number of blinding nonces a NoncePool keeps ready per public key
+NONCE_POOL_DEPTH = 64
+
+# Number of verdicts a ReplayCache keeps, and seconds it keeps them for
+REPLAY_CACHE_SIZE = 4096
+REPLAY_WINDOW = 60.0
+
+
+def cells_message(cell_ids: List[int]) -> bytes:
+    """The message signed by a request for the PoIs of several cells. It is
+    hashed, such that it stays smaller than the group order however many cells
+    it covers, and it never equals the message of a single cell request."""
+    return hashlib.sha256(("cells:" + ",".join(str(cell_id) for cell_id in cell_ids)).encode()).digest()
+
+
+class KeyCache:
+    """Bounded cache of decoded keys, keyed by a hash of their serialization.
+    Keys never change during the lifetime of a server or client, but they are
+    passed serialized to every call. Clients keep their decoded credentials in
+    one as well."""
+
+    def __init__(self, size: int = KEY_CACHE_SIZE, precompute: bool = False):
+        """
+        Args:
+            size: maximum number of keys kept, the least recently used ones are dropped
+            precompute: whether public keys are switched to precomputation mode,
+                which pays off if they are used for many requests
+        """
+        self.size = size
+        self.precompute = precompute
+        self.keys: "OrderedDict[bytes, Union[PublicKey, SecretKey]]" = OrderedDict()
+        self.lock = Lock()
+
+    def decode(self, serialized: bytes, key_type: Union[type, Tuple[type, ...]]) -> Union[PublicKey, SecretKey]:
+        """Decode a key, or return it from the cache if it was decoded before.
+
+        Args:
+            serialized: the serialized key
+            key_type: the expected type of the key, or a tuple of the types it may have
+
+        Returns:
+            the decoded key
+        """
+        digest = hashlib.sha256(serialized).digest()
+
+        with self.lock:
+            key = self.keys.get(digest)
+            if key is not None:
+                self.keys.move_to_end(digest)
+
+        if key is None:
+            # Public keys decode their elements lazily, when their attributes are used
+            lazy = key_type is PublicKey or isinstance(key_type, tuple) and PublicKey in key_type
+            key = decode_public_key(serialized) if lazy else loads(serialized)
+            if not isinstance(key, key_type):
+                raise TypeError("Invalid type provided.")
+            if self.precompute and isinstance(key, PublicKey):
+                key.precompute()
+
+            with self.lock:
+                self.keys[digest] = key
+                while len(self.keys) > self.size:
+                    self.keys.popitem(last=False)
+
+        if not isinstance(key, key_type):
+            raise TypeError("Invalid type provided.")
+        return key
+
+
+class ReplayCache:
+    """Bounded cache of the verdicts of recently checked signatures, keyed by
+    a hash of the request. Clients retry requests over flaky circuits, and a
+    byte-identical request gets the same verdict without verifying it again.
+    Verdicts expire after a time window."""
+
+    def __init__(self, size: int = REPLAY_CACHE_SIZE, window: float = REPLAY_WINDOW):
+        """
+        Args:
+            size: maximum number of verdicts kept, the oldest ones are dropped
+            window: seconds a verdict is kept
+        """
+        self.size = size
+        self.window = window
+        # Ordered by the time the verdicts were added
+        self.verdicts: "OrderedDict[bytes, Tuple[float, bool]]" = OrderedDict()
+        self.lock = Lock()
+        # Requests answered from the cache, and requests that had to be verified
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key(server_pk: bytes, message: bytes, revealed_attributes: List[str], signature: bytes) -> bytes:
+        """Identify a request by a hash of everything its verdict depends on"""
+        h = hashlib.sha256()
+        for data in [server_pk, message, json.dumps(revealed_attributes).encode(), signature]:
+            h.update(len(data).to_bytes(8, "big") + data)
+        return h.digest()
+
+    def get(self, key: bytes) -> Optional[bool]:
+        """The verdict of a request, None if it was not checked within the window"""
+        with self.lock:
+            entry = self.verdicts.get(key)
+            if entry is not None and time.monotonic() - entry[0] >= self.window:
+                del self.verdicts[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: bytes, verdict: bool):
+        """Keep the verdict of a request for the time window"""
+        now = time.monotonic()
+        with self.lock:
+            self.verdicts.pop(key, None)
+            self.verdicts[key] = (now, verdict)
+            # Drop expired verdicts, and the oldest ones beyond the size
+            while self.verdicts:
+                oldest = next(iter(self.verdicts.values()))
+                if len(self.verdicts) <= self.size and now - oldest[0] < self.window:
+                    break
+                self.verdicts.popitem(last=False)
+
+
+# Server's public key, credential and disclosed attributes of a request type
+RequestType = Tuple[bytes, bytes, FrozenSet[str]]
+
+
+class PrecomputationPool(ABC):
+    """Pool of precomputed values, kept ready for every registered target,
+    optionally by a background thread that refills the pool whenever values
+    are taken from it. Every value is handed out only once. Subclasses define
+    how a value is precomputed for a target."""
+
+    def __init__(self, depth: int, thread_name: str):
+        """
+        Args:
+            depth: number of values kept ready per target
+            thread_name: name of the background thread
+        """
+        self.depth = depth
+        self.thread_name = thread_name
+        self.targets: Dict[Hashable, Any] = dict()
+        self.values: Dict[Hashable, Deque[Any]] = dict()
+        self.lock = Lock()
+        self.wakeup = Event()
+        self.thread: Optional[Thread] = None
+        self.stopped = False
+        # Takes of registered targets the pool had a value for, and had none for
+        self.hits = self.misses = 0
+
+    @abstractmethod
+    def precompute(self, target) -> Any:
+        """Precompute a value for a target"""
+
+    def add_target(self, key: Hashable, target):
+        """Keep values for a target ready from now on"""
+        with self.lock:
+            self.targets[key] = target
+            self.values.setdefault(key, deque())
+        self.wakeup.set()
+
+    def take(self, key: Hashable) -> Optional[Any]:
+        """Take a precomputed value of a target, None if there is none ready"""
+        with self.lock:
+            values = self.values.get(key)
+            if values is None:
+                # Never registered, the pool did not run dry
+                return None
+            value = values.popleft() if values else None
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self.wakeup.set()
+        return value
+
+    def fill(self) -> int:
+        """Precompute values until every registered target has `depth` of them
+
+        Returns:
+            the number of precomputed values
+        """
+        count = 0
+        while not self.stopped:
+            with self.lock:
+                missing = [(key, target) for key, target in self.targets.items()
+                           if len(self.values[key]) < self.depth]
+            if not missing:
+                return count
+
+            # One value per target and round, such that no target starves
+            for key, target in missing:
+                value = self.precompute(target)
+                with self.lock:
+                    self.values[key].append(value)
+                count += 1
+        return count
+
+    def start(self):
+        """Start refilling the pool in a background thread"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.stopped = False
+            self.thread = Thread(target=self._refill, name=self.thread_name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background thread, after it finished the value it is precomputing"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+            self.stopped = True
+        self.wakeup.set()
+        if thread is not None:
+            thread.join()
+
+    def _refill(self):
+        while not self.stopped:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            self.fill()
+
+
+class DisclosurePool(PrecomputationPool):
+    """Pool of precomputed disclosure proofs, which only need to be completed
+    with the message of a request. Proofs are precomputed for every registered
+    request type."""
+
+    def __init__(self, depth: int = DISCLOSURE_POOL_DEPTH):
+        """
+        Args:
+            depth: number of proofs kept ready per request type
+        """
+        super().__init__(depth, "disclosure-pool")
+        self.proofs: Dict[RequestType, Deque[PrecomputedDisclosure]] = self.values  # type:ignore
+
+    @staticmethod
+    def request_type(server_pk: bytes, credentials: bytes, types: List[str]) -> RequestType:
+        """Identify a request type by the hashes of the key and credential and the disclosed attributes"""
+        return hashlib.sha256(server_pk).digest(), hashlib.sha256(credentials).digest(), frozenset(types)
+
+    def register(self, request_type: RequestType, pk: PublicKey, credential: AnonymousCredential, types: List[str]):
+        """Keep proofs for a request type ready from now on"""
+        self.add_target(request_type, (pk, credential, list(types)))
+
+    def precompute(self, target: Tuple[PublicKey, AnonymousCredential, List[str]]) -> PrecomputedDisclosure:
+        pk, credential, types = target
+        return ABCVerify.precompute_disclosure_proof(pk, credential, types)
+
+
+class NoncePool(PrecomputationPool):
+    """Pool of blinding nonces (u, g1 ** u) of the issuer, such that signing a
+    registration only takes the proof check and a single exponentiation.
+    Nonces are precomputed for every registered public key. A miss means that
+    the pool ran dry, and the registration computed its own nonce."""
+
+    def __init__(self, depth: int = NONCE_POOL_DEPTH):
+        """
+        Args:
+            depth: number of nonces kept ready per public key
+        """
+        super().__init__(depth, "nonce-pool")
+
+    @staticmethod
+    def key_id(server_pk: bytes) -> bytes:
+        """Identify a public key by the hash of its serialization"""
+        return hashlib.sha256(server_pk).digest()
+
+    def register(self, key_id: bytes, pk: PublicKey):
+        """Keep nonces for a public key ready from now on"""
+        self.add_target(key_id, pk)
+
+    def precompute(self, target: PublicKey) -> BlindingNonce:
+        return ABCIssue.blinding_nonce(target)
+
+
+class WorkerPool:
+    """Pool of worker processes running the crypto of Server and Client.
+    Every worker imports petrelic once and keeps its own Server and Client,
+    whose key caches stay warm between tasks. Tasks only carry the serialized
+    arguments of the methods."""
+
+    def __init__(self, size: Optional[int] = None, keys: Sequence[bytes] = (),
+                 key_cache_size: int = KEY_CACHE_SIZE, nonce_pool_depth: int = NONCE_POOL_DEPTH):
+        """
+        Args:
+            size: number of worker processes, defaults to the number of cores
+            keys: serialized keys every worker decodes when it starts. The
+                generator tables of public keys are built right away, so that
+                no request pays for them. Tables of attribute bases are left
+                out, every worker would hold its own copy.
+            key_cache_size: number of decoded keys every worker keeps
+            nonce_pool_depth: number of blinding nonces every worker keeps
+                ready for each public key in `keys`, 0 to precompute none
+        """
+        self.size = size or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            self.size, initializer=_start_worker, initargs=(list(keys), key_cache_size, nonce_pool_depth))
+
+    def process_registration(self, server_sk: bytes, server_pk: bytes, issuance_request: bytes,
+                             username: str, subscriptions: List[str]) -> "Future[bytes]":
+        """Run Server.process_registration in a worker"""
+        return self.executor.submit(
+            _worker_process_registration, server_sk, server_pk, issuance_request, username, subscriptions)
+
+    def check_request_signature(self, server_pk: bytes, message: bytes, revealed_attributes: List[str],
+                                signature: bytes) -> "Future[bool]":
+        """Run Server.check_request_signature in a worker"""
+        return self.executor.submit(
+            _worker_check_request_signature, server_pk, message, revealed_attributes, signature)
+
+    def sign_request(self, server_pk: bytes, credentials: bytes, message: bytes, types: List[str],
+                     wire_format: Optional[str] = None) -> "Future[bytes]":
+        """Run Client.sign_request in a worker"""
+        return self.executor.submit(
+            _worker_sign_request, server_pk, credentials, message, types, wire_format)
+
+    def shutdown(self):
+        """Stop the workers, after they finished their tasks"""
+        self.executor.shutdown()
+
+
+# Server and client of a worker process
+_WORKER: Optional[Tuple["Server", "Client"]] = None
+
+
+def _start_worker(keys: List[bytes], key_cache_size: int, nonce_pool_depth: int):
+    global _WORKER
+    server = Server(key_cache_size, nonce_pool_depth=nonce_pool_depth)
+    client = Client(key_cache_size)
+    # Both share the decoded keys and their tables
+    client.keys = server.keys
+    _WORKER = server, client
+
+    for serialized in keys:
+        # Decoded once, public keys lazily
+        key = server.keys.decode(serialized, (PublicKey, SecretKey))
+        if isinstance(key, PublicKey):
+            key.g1_base(), key.g2_base(), key.gt_base()
+            if nonce_pool_depth:
+                server.precompute_registrations(serialized)
+
+
+def _worker_process_registration(server_sk: bytes, server_pk: bytes, issuance_request: bytes,
+                                 username: str, subscriptions: List[str]) -> bytes:
+    return _WORKER[0].process_registration(  # type:ignore
+        server_sk, server_pk, issuance_request, username, subscriptions)
+
+
+def _worker_check_request_signature(server_pk: bytes, message: bytes, revealed_attributes: List[str],
+                                    signature: bytes) -> bool:
+    # The replay cache is in the process which submitted the check
+    return _WORKER[0].verify_request_signature(  # type:ignore
+        server_pk, message, revealed_attributes, signature)
+
+
+def _worker_sign_request(server_pk: bytes, credentials: bytes, message: bytes, types: List[str],
+                         wire_format: Optional[str]) -> bytes:
+    client = _WORKER[1]  # type:ignore
+    client.wire_format = wire_format
+    return client.sign_request(server_pk, credentials, message, types)
+
 
 class State:
     def __init__(self, attributes, t):
@@ -23,14 +405,31 @@ class State:
 class Server:
     """Server"""
 
-    def __init__(self):
+    def __init__(self, key_cache_size: int = KEY_CACHE_SIZE, workers: Optional[WorkerPool] = None,
+                 replay_cache_size: int = REPLAY_CACHE_SIZE, replay_window: float = REPLAY_WINDOW,
+                 nonce_pool_depth: int = NONCE_POOL_DEPTH):
         """
         Server constructor.
+
+        Args:
+            key_cache_size: number of decoded keys to keep. The server keeps
+                them in precomputation mode, as it uses them for every request.
+            workers: worker processes that run registrations and signature
+                checks, which then run in parallel when called from several
+                threads. None runs them in the calling thread.
+            replay_cache_size: number of signature verdicts to keep, such that
+                resubmitted requests are not verified again
+            replay_window: seconds a signature verdict is kept
+            nonce_pool_depth: number of blinding nonces kept ready for every
+                public key registered with `precompute_registrations`
         """
-        pass
+        self.keys = KeyCache(key_cache_size, precompute=True)
+        self.workers = workers
+        self.replays = ReplayCache(replay_cache_size, replay_window)
+        self.nonces = NoncePool(nonce_pool_depth)
 
     @staticmethod
-    def generate_ca(subscriptions: List[str]) -> Tuple[bytes, bytes]:
+    def generate_ca(subscriptions: List[str], wire_format: str = JSONPICKLE) -> Tuple[bytes, bytes]:
         """Initializes the credential system. Runs exactly once in the
         beginning. Decides on schemes public parameters and choses a secret key
         for the server.
@@ -38,6 +437,8 @@ class Server:
         Args:
             subscriptions: a list of all valid attributes. Users cannot get a
                 credential with a attribute which is not included here.
+            wire_format: the wire format of the keys, one of WIRE_FORMATS.
+                Clients use the wire format of the public key by default.
 
         Returns:
             tuple containing:
@@ -48,7 +449,7 @@ class Server:
         """
 
         sk, pk = PSScheme.generate_keys(subscriptions)
-        return jsonpickle.encode(sk).encode(), jsonpickle.encode(pk).encode()
+        return dumps(sk, wire_format), dumps(pk, wire_format)
 
     def process_registration(
         self,
@@ -72,25 +473,74 @@ class Server:
                 credential with this response).
         """
 
-        # Decode the public and secret keys
-        sk, pk = jsonpickle.decode(server_sk), jsonpickle.decode(server_pk)
+        if self.workers is not None:
+            return self.workers.process_registration(
+                server_sk, server_pk, issuance_request, username, subscriptions).result()
 
+        # Decode the public and secret keys
         # Check the types of sk and pk and make sure that they are in proper format.
-        if not isinstance(sk, SecretKey) or not isinstance(pk, PublicKey):
-            raise TypeError("Invalid type provided.")
+        sk = self.keys.decode(server_sk, SecretKey)
+        pk = self.keys.decode(server_pk, PublicKey)
 
         # Decode the issuance
-        issuance = jsonpickle.decode(issuance_request)
+        issuance = loads(issuance_request)
 
         if not isinstance(issuance, IssueRequest):
             raise TypeError("Invalid type provided.")
 
+        issuer_attributes = self.issuer_attributes(pk, username, subscriptions)
+
+        # Use the helper function to get the blind signature, the issuer issues all subscriptions in the name of the client
+        blind_signature = ABCIssue.sign_issue_request(
+            sk, pk, issuance, issuer_attributes, self.nonces.take(NoncePool.key_id(server_pk)))
+
+        # Encode and return it, in the wire format of the request
+        return dumps(blind_signature, wire_format_of(issuance_request))
+
+    def precompute_registrations(self, server_pk: bytes, background: bool = True):
+        """Keep blinding nonces ready for registrations with the given key,
+        such that signing a registration only takes the proof check and a
+        single exponentiation. Registrations with workers use the nonces of
+        the workers, see `WorkerPool`.
+
+        Args:
+            server_pk: the server's public key (serialized)
+            background: whether to precompute in a background thread, which
+                also refills the pool after every registration. Otherwise, the
+                pool is filled once before returning.
+        """
+
+        pk = self.keys.decode(server_pk, PublicKey)
+
+        self.nonces.register(NoncePool.key_id(server_pk), pk)
+        if background:
+            self.nonces.start()
+        else:
+            self.nonces.fill()
+
+    def stop(self):
+        """Stop precomputing blinding nonces in the background"""
+        self.nonces.stop()
+
+    @staticmethod
+    def issuer_attributes(pk: PublicKey, username: str, subscriptions: List[str]) -> AttributeMap:
+        """Computes the attributes the issuer signs for a user.
+
+        Args:
+            pk: the server's public key
+            username: username
+            subscriptions: attributes
+
+        Return:
+            the issuer attributes
+        """
+
         # Make sure that subscriptions are valid
         # The issuer will issue all the attributes
         issuer_attributes = {
             attribute: ABSENT_SUBSCRIPTION for attribute in pk.attributes}
         for sub in subscriptions:
-            if sub not in pk.attributes:
+            if sub not in pk.index:
                 raise Exception(f"{sub} is not a valid subscription")
             # Make sure that they are not duplicate
             if issuer_attributes[sub] == PRESENT_SUBSCRIPTION:
@@ -103,12 +553,61 @@ class Server:
             raise Exception(f"A subscription with name username is present")
         issuer_attributes["username"] = username.encode()
 
-        # Use the helper function to get the blind signature, the issuer issues all subscriptions in the name of the client
-        blind_signature = ABCIssue.sign_issue_request(
-            sk, pk, issuance, issuer_attributes)
+        return issuer_attributes
 
-        # Encode and return it
-        return jsonpickle.encode(blind_signature).encode()
+    def process_registrations_batch(
+        self,
+        server_sk: bytes,
+        server_pk: bytes,
+        registrations: List[Tuple[bytes, str, List[str]]]
+    ) -> List[Optional[bytes]]:
+        """ Registers many new accounts on the server at once.
+
+        Args:
+            server_sk: the server's secret key (serialized)
+            server_pk: the server's public key (serialized)
+            registrations: for every registration, a tuple containing:
+                - The issuance request (serialized)
+                - username
+                - subscriptions
+
+        Return:
+            for every registration, the serialized response, or None if the
+                registration failed.
+        """
+
+        # Decode the public and secret keys
+        # Check the types of sk and pk and make sure that they are in proper format.
+        sk = self.keys.decode(server_sk, SecretKey)
+        pk = self.keys.decode(server_pk, PublicKey)
+
+        # A malformed registration only fails itself, not the whole batch
+        indices, issuances, issuer_attributes = [], [], []
+        for i, (issuance_request, username, subscriptions) in enumerate(registrations):
+            try:
+                issuance = loads(issuance_request)
+            except ValueError:
+                continue
+            if not isinstance(issuance, IssueRequest):
+                continue
+            try:
+                attributes = self.issuer_attributes(pk, username, subscriptions)
+            except Exception:
+                continue
+
+            indices.append(i)
+            issuances.append(issuance)
+            issuer_attributes.append(attributes)
+
+        responses: List[Optional[bytes]] = [None for _ in registrations]
+        key_id = NoncePool.key_id(server_pk)
+        blind_signatures = ABCIssue.batch_sign_issue_requests(
+            sk, pk, issuances, issuer_attributes, lambda: self.nonces.take(key_id))
+        for i, blind_signature in zip(indices, blind_signatures):
+            if blind_signature is not None:
+                responses[i] = dumps(blind_signature, wire_format_of(registrations[i][0]))
+
+        return responses
 
     def check_request_signature(
         self,
@@ -129,10 +628,43 @@ class Server:
             whether a signature is valid
         """
 
-        pk = jsonpickle.decode(server_pk)
-        if not isinstance(pk, PublicKey):
-            raise TypeError("Invalid type provided.")
-        sig = jsonpickle.decode(signature)
+        # Resubmitted requests get the verdict of their first submission
+        key = self.replays.key(server_pk, message, revealed_attributes, signature)
+        verdict = self.replays.get(key)
+        if verdict is not None:
+            return verdict
+
+        if self.workers is not None:
+            verdict = self.workers.check_request_signature(
+                server_pk, message, revealed_attributes, signature).result()
+        else:
+            verdict = self.verify_request_signature(server_pk, message, revealed_attributes, signature)
+
+        self.replays.put(key, verdict)
+        return verdict
+
+    def verify_request_signature(
+        self,
+        server_pk: bytes,
+        message: bytes,
+        revealed_attributes: List[str],
+        signature: bytes
+    ) -> bool:
+        """ Verify the signature on the location request in the calling
+        thread, without the replay cache.
+
+        Args:
+            server_pk: the server's public key (serialized)
+            message: The message to sign
+            revealed_attributes: revealed attributes
+            signature: user's authorization (serialized)
+
+        Returns:
+            whether a signature is valid
+        """
+
+        pk = self.keys.decode(server_pk, PublicKey)
+        sig = loads(signature)
         if not isinstance(sig, DisclosureProof):
             raise TypeError("Invalid type provided.")
 
@@ -140,17 +672,113 @@ class Server:
             if a not in sig.disclosed_attributes or sig.disclosed_attributes[a] != PRESENT_SUBSCRIPTION:
                 return False
 
+        # Also rejects malformed proofs before any pairing
         return ABCVerify.verify_disclosure_proof(pk, sig, message)
 
+    def check_request_signatures_batch(
+        self,
+        server_pk: bytes,
+        requests: List[Tuple[bytes, List[str], bytes]]
+    ) -> List[bool]:
+        """ Verify the signatures on many location requests at once
+
+        Args:
+            server_pk: the server's public key (serialized)
+            requests: for every request, a tuple containing:
+                - The message to sign
+                - revealed attributes
+                - user's authorization (serialized)
+
+        Raises:
+            TypeError: if a signature is not a disclosure proof, like check_request_signature
+            ValueError: if a signature can not be decoded
+
+        Returns:
+            for every request, whether its signature is valid
+        """
+
+        pk = self.keys.decode(server_pk, PublicKey)
+
+        results = [False for _ in requests]
+        keys = [self.replays.key(server_pk, *request) for request in requests]
+        # Requests which are not in the replay cache, the first of every duplicate within the batch
+        unchecked: Dict[bytes, int] = dict()
+        indices, sigs, messages = [], [], []
+        for i, (message, revealed_attributes, signature) in enumerate(requests):
+            verdict = self.replays.get(keys[i])
+            if verdict is not None:
+                results[i] = verdict
+                continue
+            if keys[i] in unchecked:
+                continue
+            unchecked[keys[i]] = i
+
+            # Signatures which can not be decoded raise, like in check_request_signature
+            sig = loads(signature)
+            if not isinstance(sig, DisclosureProof):
+                raise TypeError("Invalid type provided.")
+
+            if any(a not in sig.disclosed_attributes or sig.disclosed_attributes[a] != PRESENT_SUBSCRIPTION
+                   for a in revealed_attributes):
+                continue
+
+            # Malformed proofs are rejected by the batch before any pairing
+            indices.append(i)
+            sigs.append(sig)
+            messages.append(message)
+
+        for i, valid in zip(indices, ABCVerify.batch_verify_disclosure_proofs(pk, sigs, messages)):
+            results[i] = valid
+
+        for key, first in unchecked.items():
+            self.replays.put(key, results[first])
+        for i, key in enumerate(keys):
+            if key in unchecked:
+                results[i] = results[unchecked[key]]
+
+        return results
+
 
 class Client:
     """Client"""
 
-    def __init__(self):
+    def __init__(self, key_cache_size: int = KEY_CACHE_SIZE, precompute: bool = False,
+                 wire_format: Optional[str] = None, pool_depth: int = DISCLOSURE_POOL_DEPTH,
+                 workers: Optional[WorkerPool] = None):
         """
         Client constructor.
+
+        Args:
+            key_cache_size: number of decoded keys to keep
+            precompute: whether to keep the public keys in precomputation mode,
+                which only pays off for clients signing many requests
+            wire_format: the wire format of the issuance requests, credentials
+                and signatures, one of WIRE_FORMATS. None uses the wire format
+                of the server's public key.
+            pool_depth: number of precomputed disclosure proofs kept ready for
+                every request type registered with `precompute_requests`
+            workers: worker processes that sign requests without precomputed
+                proofs. None signs them in the calling thread.
         """
-        pass
+        if wire_format is not None and wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format {wire_format}")
+        self.keys = KeyCache(key_cache_size, precompute)
+        self.credentials = KeyCache(key_cache_size)
+        self.wire_format = wire_format
+        self.pool = DisclosurePool(pool_depth)
+        self.workers = workers
+
+    def encode(self, obj, server_pk: bytes) -> bytes:
+        """Serialize an object in the wire format of the client.
+
+        Args:
+            obj: the object to serialize
+            server_pk: the server's public key (serialized)
+
+        Returns:
+            the serialized object
+        """
+        return dumps(obj, self.wire_format or wire_format_of(server_pk))
 
     def prepare_registration(
         self,
@@ -173,15 +801,13 @@ class Client:
                 You need to design the state yourself.
         """
 
-        pk = jsonpickle.decode(server_pk)
-        if not isinstance(pk, PublicKey):
-            raise TypeError("Invalid type provided.")
+        pk = self.keys.decode(server_pk, PublicKey)
 
         # Check that subscriptions are valid ones
         # Also make sure that they are unique
         count_dict: Dict[str, int] = dict()
         for sub in subscriptions:
-            if sub not in pk.attributes:
+            if sub not in pk.index:
                 raise Exception(f"{sub} is not a valid subscription.")
             count_dict[sub] = count_dict.get(sub, 0)+1
             if count_dict[sub] > 1:
@@ -200,11 +826,11 @@ class Client:
 
         # User attributes maps subscription to True/False
         attribute_map = {
-            sub: PRESENT_SUBSCRIPTION if sub in subscriptions else ABSENT_SUBSCRIPTION for sub in pk.attributes
+            sub: PRESENT_SUBSCRIPTION if sub in count_dict else ABSENT_SUBSCRIPTION for sub in pk.attributes
         }
         attribute_map["username"] = username.encode()
 
-        return jsonpickle.encode(issue_request).encode(), State(attribute_map, t)
+        return self.encode(issue_request, server_pk), State(attribute_map, t)
 
     def process_registration_response(
         self,
@@ -224,11 +850,9 @@ class Client:
             credentials: create an attribute-based credential for the user
         """
 
-        pk = jsonpickle.decode(server_pk)
-        if not isinstance(pk, PublicKey):
-            raise TypeError("Invalid type provided.")
+        pk = self.keys.decode(server_pk, PublicKey)
 
-        response = jsonpickle.decode(server_response)
+        response = loads(server_response)
         if not isinstance(response, BlindSignature):
             raise TypeError("Invalid type provided.")
 
@@ -243,7 +867,7 @@ class Client:
         credential = ABCIssue.obtain_credential(
             pk, response, private_state.attributes, private_state.t)
 
-        return jsonpickle.encode(credential).encode()
+        return self.encode(credential, server_pk)
 
     def sign_request(
         self,
@@ -264,14 +888,92 @@ class Client:
             A message's signature (serialized)
         """
 
-        pk = jsonpickle.decode(server_pk)
-        if not isinstance(pk, PublicKey):
-            raise TypeError("Invalid type provided.")
+        pk = self.keys.decode(server_pk, PublicKey)
+
+        # Only the message dependent step is left for precomputed proofs
+        precomputed = self.pool.take(DisclosurePool.request_type(server_pk, credentials, types))
+        if precomputed is not None:
+            sig = ABCVerify.complete_disclosure_proof(pk, precomputed, message)
+            return self.encode(sig, server_pk)
+
+        if self.workers is not None:
+            return self.workers.sign_request(
+                server_pk, credentials, message, types, self.wire_format).result()
+
+        credential = self.credential(credentials, types)
+        sig = ABCVerify.create_disclosure_proof(pk, credential, types, message)
+        return self.encode(sig, server_pk)
+
+    def precompute_requests(
+        self,
+        server_pk: bytes,
+        credentials: bytes,
+        types: List[str],
+        background: bool = True
+    ):
+        """Keep precomputed disclosure proofs ready for requests with the given
+        credential and types, such that `sign_request` only needs to complete
+        them with the message.
+
+        Arg:
+            server_pk: a server's public key (serialized)
+            credential: client's credential (serialized)
+            types: which attributes are sent along with the requests
+            background: whether to precompute in a background thread, which
+                also refills the pool after every request. Otherwise, the pool
+                is filled once before returning.
+        """
 
-        credential = jsonpickle.decode(credentials)
+        pk = self.keys.decode(server_pk, PublicKey)
+        credential = self.credential(credentials, types)
+
+        self.pool.register(DisclosurePool.request_type(server_pk, credentials, types), pk, credential, types)
+        if background:
+            self.pool.start()
+        else:
+            self.pool.fill()
+
+    def stop(self):
+        """Stop precomputing disclosure proofs in the background"""
+        self.pool.stop()
+
+    def credential(self, credentials: bytes, types: List[str]) -> AnonymousCredential:
+        """Decode a credential like `decode_credential`, or return it from the
+        cache if it was decoded before.
+
+        Arg:
+            credential: client's credential (serialized)
+            types: which attributes should be sent along with the request?
+
+        Returns:
+            the decoded credential
+        """
+
+        credential = self.credentials.decode(credentials, AnonymousCredential)
+        return self.check_types(credential, types)  # type:ignore
+
+    @staticmethod
+    def decode_credential(credentials: bytes, types: List[str]) -> AnonymousCredential:
+        """Decode a credential and check that it can reveal the given types.
+
+        Arg:
+            credential: client's credential (serialized)
+            types: which attributes should be sent along with the request?
+
+        Returns:
+            the decoded credential
+        """
+
+        credential = loads(credentials)
         if not isinstance(credential, AnonymousCredential):
             raise TypeError("Invalid type provided.")
 
+        return Client.check_types(credential, types)
+
+    @staticmethod
+    def check_types(credential: AnonymousCredential, types: List[str]) -> AnonymousCredential:
+        """Check that a credential can reveal the given types, returns the credential."""
+
         # Verify that revealed attributes are in user subscriptions.
         for typee in types:
             if typee not in credential.attributes:
@@ -279,5 +981,4 @@ class Client:
             if credential.attributes[typee] == ABSENT_SUBSCRIPTION:
                 raise Exception(f"{typee} is not in user subscriptions.")
 
-        sig = ABCVerify.create_disclosure_proof(pk, credential, types, message)
-        return jsonpickle.encode(sig).encode()
+        return credential
@@ -1,621 +1,517 @@
-"""5 10 20 50 100 500"""
-from stroll import *
-
-
-def whole_setup(n):
-    """Test the whole setup
-    """
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
-
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
-
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
-
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
-
-    return server.check_request_signature(
-        server_pk, message, revealed_attributes, signature)
-
-
-def key_gen(server, client, attributes):
-    server_sk, server_pk = server.generate_ca(attributes)
-
-
-def issuance(server, client, server_sk, server_pk, username, subscriptions):
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
-
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
-
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
-
-
-def sign(server, client, server_pk, credentials, message, revealed_attributes):
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
-
-
-def verify(server, client, server_pk, message, revealed_attributes, signature):
-    server.check_request_signature(
-        server_pk, message, revealed_attributes, signature)
-
+"""
+Benchmarks of the credential scheme
 
-def test_keygen5(benchmark):
-    """Benchmark testing"""
-    n = 5
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    benchmark.pedantic(key_gen, args=(
-        server, client, attributes), rounds=100)
-
-
-def test_keygen10(benchmark):
-    """Benchmark testing"""
-    n = 10
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    benchmark.pedantic(key_gen, args=(
-        server, client, attributes), rounds=100)
+Every stage of the scheme (keygen, issuance, sign, verify, serialize and
+deserialize) is benchmarked for every combination of the parameters it depends
+on: the number of subscriptions, the fraction of them disclosed by a request,
+the size of the signed message and the wire format. The cases are generated
+from STAGES and the sweeps below.
 
+With pytest-benchmark, the peak memory, operation counts and encoded size of
+every case are stored in its extra_info:
 
-def test_keygen20(benchmark):
-    """Benchmark testing"""
-    n = 20
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    benchmark.pedantic(key_gen, args=(
-        server, client, attributes), rounds=100)
-
-
-def test_keygen50(benchmark):
-    """Benchmark testing"""
-    n = 50
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    benchmark.pedantic(key_gen, args=(
-        server, client, attributes), rounds=100)
+    python3 -m pytest test_benchmark_computation.py --benchmark-json results.json
 
+As a script, the percentiles of the time, the peak memory, the number of
+pairings and exponentiations and the encoded size of every case are written as
+JSON or CSV, and the cases which got slower or need more operations than in a
+previous run are reported:
 
-def test_keygen100(benchmark):
-    """Benchmark testing"""
-    n = 100
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    benchmark.pedantic(key_gen, args=(
-        server, client, attributes), rounds=100)
-
-
-def test_keygen500(benchmark):
-    """Benchmark testing"""
-    n = 500
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    benchmark.pedantic(key_gen, args=(
-        server, client, attributes), rounds=100)
-
-
-def test_issue5(benchmark):
-    """Benchmark testing"""
-    n = 5
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    benchmark.pedantic(issuance, args=(
-        server, client, server_sk, server_pk, username, subscriptions), rounds=100)
-
-
-def test_issue10(benchmark):
-    """Benchmark testing"""
-    n = 10
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    benchmark.pedantic(issuance, args=(
-        server, client, server_sk, server_pk, username, subscriptions), rounds=100)
-
-
-def test_issue20(benchmark):
-    """Benchmark testing"""
-    n = 20
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    benchmark.pedantic(issuance, args=(
-        server, client, server_sk, server_pk, username, subscriptions), rounds=100)
-
-
-def test_issue50(benchmark):
-    """Benchmark testing"""
-    n = 50
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    benchmark.pedantic(issuance, args=(
-        server, client, server_sk, server_pk, username, subscriptions), rounds=100)
-
-
-def test_issue100(benchmark):
-    """Benchmark testing"""
-    n = 100
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    benchmark.pedantic(issuance, args=(
-        server, client, server_sk, server_pk, username, subscriptions), rounds=100)
-
-
-def test_issue500(benchmark):
-    """Benchmark testing"""
-    n = 500
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    benchmark.pedantic(issuance, args=(
-        server, client, server_sk, server_pk, username, subscriptions), rounds=100)
-
-
-def test_sign5(benchmark):
-    """Benchmark testing"""
-    n = 5
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
-
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
-
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
-
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
-
-    benchmark.pedantic(sign, args=(
-        server, client, server_pk, credentials, message, revealed_attributes), rounds=100)
-
-
-def test_sign10(benchmark):
-    """Benchmark testing"""
-    n = 10
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
-
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
-
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
-
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
-
-    benchmark.pedantic(sign, args=(
-        server, client, server_pk, credentials, message, revealed_attributes), rounds=100)
-
-
-def test_sign20(benchmark):
-    """Benchmark testing"""
-    n = 20
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
-
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
-
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
-
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
-
-    benchmark.pedantic(sign, args=(
-        server, client, server_pk, credentials, message, revealed_attributes), rounds=100)
-
+    python3 test_benchmark_computation.py -o results.csv --baseline previous.csv
+"""
+from stroll import *
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, NamedTuple
+import argparse
+import collections
+import csv
+import exponentiation
+import functools
+import itertools
+import json
+import pytest
+import sys
+import time
+import tracemalloc
 
-def test_sign50(benchmark):
-    """Benchmark testing"""
-    n = 50
-    server = Server()
-    client = Client()
 
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
+# Number of subscriptions of the keys, which also have the username attribute
+ATTRIBUTE_COUNTS = [5, 10, 20, 50, 100, 500]
 
-    server_sk, server_pk = server.generate_ca(attributes)
+# Fraction of the subscriptions disclosed by a request, the username is always hidden
+DISCLOSED_FRACTIONS = [0.0, 0.5, 1.0]
+
+# Sizes of the signed message in bytes. Messages are used as exponents, which
+# RELIC's bignums can not hold beyond a couple hundred bytes.
+MESSAGE_SIZES = [16, 64, 128]
 
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
+# Timed rounds of every case
+ROUNDS = 10
+
+# Percentiles of the time of every case
+PERCENTILES = [50, 90, 99]
 
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
+# A case regressed if its median grew by more than this factor
+REGRESSION_THRESHOLD = 1.2
 
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
+# Fields of a result, in the order of the CSV columns
+PARAMETERS = ["stage", "n", "disclosed", "message_size", "wire_format"]
+COUNTS = ["pairings", "exponentiations", "multi_exponentiations"]
+FIELDS = PARAMETERS + ["rounds", "min_ms"] + [f"p{p}_ms" for p in PERCENTILES] + \
+    ["max_ms", "mean_ms", "peak_memory"] + COUNTS + ["size"]
 
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
 
-    benchmark.pedantic(sign, args=(
-        server, client, server_pk, credentials, message, revealed_attributes), rounds=100)
+class Case(NamedTuple):
+    """Parameters of a benchmark, None for the ones its stage does not depend on"""
+    stage: str
+    n: int
+    disclosed: Optional[float] = None
+    message_size: Optional[int] = None
+    wire_format: Optional[str] = None
 
+    def name(self) -> str:
+        """Name of the case, e.g. sign-n5-disclosed0.5-message_size16"""
+        parameters = [f"{field}{value}" for field, value in zip(self._fields[2:], self[2:]) if value is not None]
+        return "-".join([self.stage, f"n{self.n}"] + parameters)
 
-def test_sign100(benchmark):
-    """Benchmark testing"""
-    n = 100
-    server = Server()
-    client = Client()
 
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
+#
+# Setup
+#
 
-    server_sk, server_pk = server.generate_ca(attributes)
 
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
+class Setup:
+    """Keys and a credential over n subscriptions, shared by all cases with the same n"""
 
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
+    def __init__(self, n: int):
+        self.server = Server()
+        self.client = Client()
 
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
+        self.subscriptions = [str(i) for i in range(n)]
+        self.attributes = self.subscriptions + ["username"]
+        self.username = "Furkan"
 
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
+        self.server_sk, self.server_pk = self.server.generate_ca(self.attributes)
+        self.issuance_request, private_state = self.client.prepare_registration(
+            self.server_pk, self.username, self.subscriptions)
+        self.server_response = self.server.process_registration(
+            self.server_sk, self.server_pk, self.issuance_request, self.username, self.subscriptions)
+        self.credentials = self.client.process_registration_response(
+            self.server_pk, self.server_response, private_state)
 
-    benchmark.pedantic(sign, args=(
-        server, client, server_pk, credentials, message, revealed_attributes), rounds=100)
+    @functools.lru_cache(maxsize=None)
+    def request(self, disclosed: float, message_size: int) -> Tuple[bytes, List[str], bytes]:
+        """Message, disclosed types and signature of a request"""
+        message = bytes(range(256))[:message_size]
+        types = self.subscriptions[:round(disclosed * len(self.subscriptions))]
+        signature = self.client.sign_request(self.server_pk, self.credentials, message, types)
+        return message, types, signature
 
+    def objects(self, disclosed: float) -> List[Any]:
+        """Objects sent between the client and the server: the public key, the
+        issuance request and response, and the signature of a request"""
+        _, _, signature = self.request(disclosed, MESSAGE_SIZES[0])
+        return [loads(data) for data in (self.server_pk, self.issuance_request, self.server_response, signature)]
 
-def test_sign500(benchmark):
-    """Benchmark testing"""
-    n = 500
-    server = Server()
-    client = Client()
 
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
+@functools.lru_cache(maxsize=None)
+def setup(n: int) -> Setup:
+    """The setup of n subscriptions, created the first time it is needed"""
+    return Setup(n)
 
-    server_sk, server_pk = server.generate_ca(attributes)
 
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
+#
+# Stages
+#
 
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
 
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
+def keygen(case: Case) -> Callable[[], Any]:
+    s = setup(case.n)
+    # Only the public key is sent to the clients
+    return lambda: s.server.generate_ca(s.attributes)[1]
 
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
 
-    benchmark.pedantic(sign, args=(
-        server, client, server_pk, credentials, message, revealed_attributes), rounds=100)
+def issuance(case: Case) -> Callable[[], Any]:
+    s = setup(case.n)
 
+    def run():
+        issuance_request, private_state = s.client.prepare_registration(
+            s.server_pk, s.username, s.subscriptions)
+        server_response = s.server.process_registration(
+            s.server_sk, s.server_pk, issuance_request, s.username, s.subscriptions)
+        s.client.process_registration_response(s.server_pk, server_response, private_state)
+        return issuance_request, server_response
+    return run
 
-def test_verify5(benchmark):
-    """Benchmark testing"""
-    n = 5
-    server = Server()
-    client = Client()
 
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
+def sign(case: Case) -> Callable[[], Any]:
+    s = setup(case.n)
+    message, types, _ = s.request(case.disclosed, case.message_size)
+    return lambda: s.client.sign_request(s.server_pk, s.credentials, message, types)
 
-    server_sk, server_pk = server.generate_ca(attributes)
 
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
+def verify(case: Case) -> Callable[[], Any]:
+    s = setup(case.n)
+    message, types, signature = s.request(case.disclosed, case.message_size)
+    # Without the replay cache, which would answer every round but the first
+    return lambda: s.server.verify_request_signature(s.server_pk, message, types, signature)
 
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
 
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
+def serialize(case: Case) -> Callable[[], Any]:
+    objects = setup(case.n).objects(case.disclosed)
+    return lambda: [dumps(obj, case.wire_format) for obj in objects]
 
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
 
-    benchmark.pedantic(verify, args=(
-        server, client, server_pk, message, revealed_attributes, signature), rounds=100)
+def deserialize(case: Case) -> Callable[[], Any]:
+    encodings = [dumps(obj, case.wire_format) for obj in setup(case.n).objects(case.disclosed)]
+    return lambda: [loads(data) for data in encodings]
 
 
-def test_verify10(benchmark):
-    """Benchmark testing"""
-    n = 10
-    server = Server()
-    client = Client()
+# For every stage, the function preparing a round of it and the parameters it depends on besides n
+STAGES: Dict[str, Tuple[Callable[[Case], Callable[[], Any]], List[str]]] = {
+    "keygen": (keygen, []),
+    "issuance": (issuance, []),
+    "sign": (sign, ["disclosed", "message_size"]),
+    "verify": (verify, ["disclosed", "message_size"]),
+    "serialize": (serialize, ["disclosed", "wire_format"]),
+    "deserialize": (deserialize, ["disclosed", "wire_format"]),
+}
 
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
+SWEEPS: Dict[str, List[Any]] = {
+    "disclosed": DISCLOSED_FRACTIONS,
+    "message_size": MESSAGE_SIZES,
+    "wire_format": WIRE_FORMATS,
+}
 
-    server_sk, server_pk = server.generate_ca(attributes)
 
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
+def cases(stages: List[str] = list(STAGES), counts: List[int] = ATTRIBUTE_COUNTS,
+          sweeps: Dict[str, List[Any]] = SWEEPS) -> List[Case]:
+    """All cases of the given stages, for every combination of their parameters
 
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
+    Args:
+        stages: names of the stages
+        counts: numbers of subscriptions
+        sweeps: values of every other parameter
 
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
+    Returns:
+        the cases, grouped by stage and then by n
+    """
+    result = []
+    for stage in stages:
+        parameters = STAGES[stage][1]
+        for n in counts:
+            for values in itertools.product(*(sweeps[p] for p in parameters)):
+                result.append(Case(stage, n, **dict(zip(parameters, values))))
+    return result
 
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
 
-    benchmark.pedantic(verify, args=(
-        server, client, server_pk, message, revealed_attributes, signature), rounds=100)
+#
+# Measurements
+#
 
 
-def test_verify20(benchmark):
+@contextmanager
+def count_operations() -> Iterator[Dict[str, int]]:
+    """Count the pairings, exponentiations and (Pippenger) multi-exponentiations
+    in the context, by wrapping them. Only meant for untimed rounds.
+    """
+    counts: Dict[str, int] = collections.Counter()
+    targets = [(G1Element, "pair", "pairings"), (exponentiation, "_pippenger", "multi_exponentiations")] + \
+        [(owner, "__pow__", "exponentiations") for owner in (G1Element, G2Element, GTElement, FixedBaseTable)]
+
+    def counted(function, key):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            counts[key] += 1
+            return function(*args, **kwargs)
+        return wrapper
+
+    # Inherited operators are wrapped on the class itself, and removed again afterwards
+    originals = [(owner, name, vars(owner).get(name)) for owner, name, _ in targets]
+    try:
+        for owner, name, key in targets:
+            setattr(owner, name, counted(getattr(owner, name), key))
+        yield counts
+    finally:
+        for owner, name, original in originals:
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+
+
+def peak_memory(run: Callable[[], Any]) -> int:
+    """Peak of the memory allocated by a round, as traced by tracemalloc"""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        else:
+            # Python < 3.9 (the Docker images), clearing the traces resets the peak as well
+            tracemalloc.clear_traces()
+        start, _ = tracemalloc.get_traced_memory()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        return peak - start
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+
+def encoded_size(result) -> Optional[int]:
+    """Number of bytes of the encoded result of a round, None if it is not encoded"""
+    if isinstance(result, bytes):
+        return len(result)
+    if isinstance(result, (list, tuple)) and result and all(isinstance(r, bytes) for r in result):
+        return sum(len(r) for r in result)
+    return None
+
+
+def profile(run: Callable[[], Any]) -> Dict[str, Any]:
+    """Warm up the caches and tables used by a round, then measure the operation
+    counts, peak memory and encoded size of one round"""
+    run()
+    with count_operations() as counts:
+        result = run()
+    return dict(peak_memory=peak_memory(run), **{c: counts[c] for c in COUNTS}, size=encoded_size(result))
+
+
+def percentile(times: List[float], p: float) -> float:
+    """Percentile of sorted times, interpolated between the closest ranks"""
+    rank = (len(times) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(times) - 1)
+    return times[low] + (times[high] - times[low]) * (rank - low)
+
+
+def measure(case: Case, rounds: int = ROUNDS) -> Dict[str, Any]:
+    """Benchmark a case
+
+    Args:
+        case: the case
+        rounds: number of timed rounds
+
+    Returns:
+        the result, with the fields in FIELDS
+    """
+    run = STAGES[case.stage][0](case)
+    result: Dict[str, Any] = dict(case._asdict(), rounds=rounds)
+    profiled = profile(run)
+
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+
+    result["min_ms"] = times[0]
+    for p in PERCENTILES:
+        result[f"p{p}_ms"] = percentile(times, p)
+    result["max_ms"] = times[-1]
+    result["mean_ms"] = sum(times) / len(times)
+    result.update(profiled)
+    return result
+
+
+#
+# Results
+#
+
+
+def write_results(results: List[Dict[str, Any]], path: Optional[str]):
+    """Write results as CSV if the path ends with .csv, as JSON otherwise, to stdout without a path"""
+    out = open(path, "w", newline="") if path else sys.stdout
+    try:
+        if path and path.endswith(".csv"):
+            writer = csv.DictWriter(out, FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            json.dump(results, out, indent=2)
+            out.write("\n")
+    finally:
+        if path:
+            out.close()
+
+
+def read_results(path: str) -> List[Dict[str, Any]]:
+    """Read results written by write_results"""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            return list(csv.DictReader(f))
+        return json.load(f)
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[str, ...]:
+    """Identify the case of a result, the same for results read from JSON and CSV"""
+    return tuple("" if result[p] is None else str(result[p]) for p in PARAMETERS)
+
+
+def regressions(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+                threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Compare results with the results of a previous run
+
+    Args:
+        results: the results
+        baseline: results of a previous run, cases it does not have are skipped
+        threshold: factor the median may grow by
+
+    Returns:
+        a description of every regression
+    """
+    previous = {result_key(r): r for r in baseline}
+    found = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        name = Case(**{p: result[p] for p in PARAMETERS}).name()
+        if result["p50_ms"] > threshold * float(before["p50_ms"]):
+            found.append(f"{name}: median {float(before['p50_ms']):.3f} ms -> {result['p50_ms']:.3f} ms")
+        for count in COUNTS:
+            if result[count] > int(before[count]):
+                found.append(f"{name}: {count} {before[count]} -> {result[count]}")
+    return found
+
+
+#
+# Benchmarks
+#
+
+
+@pytest.mark.parametrize("case", cases(), ids=Case.name)
+def test_stage(benchmark, case):
     """Benchmark testing"""
-    n = 20
-    server = Server()
-    client = Client()
+    benchmark.group = f"{case.stage}{case.n}"
+    run = STAGES[case.stage][0](case)
+    benchmark.extra_info.update(profile(run))
+    benchmark.pedantic(run, rounds=ROUNDS)
 
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
-
-    server_sk, server_pk = server.generate_ca(attributes)
 
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
+def test_measure():
+    """Test that cases are generated from the sweeps, and measured with their operation counts
+    """
+    assert len(cases(["keygen", "sign"], [5, 10], dict(SWEEPS, disclosed=[0.0, 1.0], message_size=[16]))) == 6
 
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
+    sign_result, verify_result = [measure(Case(stage, 5, 0.5, 16), rounds=3) for stage in ("sign", "verify")]
+    assert set(sign_result) == set(FIELDS)
+    assert sign_result["min_ms"] <= sign_result["p50_ms"] <= sign_result["p99_ms"] <= sign_result["max_ms"]
+    assert sign_result["size"] > 0 and sign_result["peak_memory"] > 0
+    # Signing pairs for C and the commitment, verification for C (twice) and the commitment
+    assert sign_result["pairings"] == 2 and verify_result["pairings"] == 3
+    # The wrapped operators are restored
+    assert "__pow__" not in vars(G1Element) or not hasattr(G1Element.__pow__, "__wrapped__")
 
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
+    slower = dict(verify_result, p50_ms=verify_result["p50_ms"] * 2, pairings=4)
+    assert len(regressions([slower], [verify_result])) == 2
+    assert not regressions([verify_result], [slower])
 
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
 
-    benchmark.pedantic(verify, args=(
-        server, client, server_pk, message, revealed_attributes, signature), rounds=100)
+@pytest.mark.parametrize("n", ATTRIBUTE_COUNTS[:2])
+def test_communication(n):
+    """Test that the sizes of the cases are the bytes exchanged by the client and the server
+    """
+    s = setup(n)
+    sizes = {stage: profile(STAGES[stage][0](Case(stage, n, 0.5, MESSAGE_SIZES[0])))["size"]
+             for stage in ("keygen", "issuance", "sign")}
+    _, _, signature = s.request(0.5, MESSAGE_SIZES[0])
+    assert sizes["keygen"] == len(s.server_pk)
+    assert sizes["issuance"] == len(s.issuance_request) + len(s.server_response)
+    assert sizes["sign"] == len(signature)
 
+    # Every wire format encodes the same objects
+    for wire_format in WIRE_FORMATS:
+        assert profile(serialize(Case("serialize", n, 0.5, wire_format=wire_format)))["size"] > 0
 
-def test_verify50(benchmark):
-    """Benchmark testing"""
-    n = 50
-    server = Server()
-    client = Client()
 
+def hidden_setup(n):
+    """Credential over n subscriptions, which are all hidden when signing
+    """
     attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
-    message = b"Hello from Mars!"
+    attribute_map = {a: PRESENT_SUBSCRIPTION for a in attributes}
+    attribute_map["username"] = b"Furkan"
 
-    server_sk, server_pk = server.generate_ca(attributes)
+    sk, pk = PSScheme.generate_keys(attributes)
+    request, t = ABCIssue.create_issue_request(pk, attribute_map)
+    response = ABCIssue.sign_issue_request(sk, pk, request, {})
+    credential = ABCIssue.obtain_credential(pk, response, attribute_map, t)
 
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
+    return pk, credential
 
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
 
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
+def pairing_per_attribute_disclosure(pk, credential, disclosed_attributes, message):
+    """Showing path pairing every hidden attribute separately, as a baseline
+    """
+    r = G1.order().random()
+    t = G1.order().random()
+    signature = Signature(
+        credential.signature.gen**r, (credential.signature.sig * credential.signature.gen**t)**r)
 
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
+    hidden_attributes = [
+        a for a in pk.attributes if a not in disclosed_attributes]
 
-    benchmark.pedantic(verify, args=(
-        server, client, server_pk, message, revealed_attributes, signature), rounds=100)
+    bases = [signature.gen.pair(pk.g2), GT.generator()] + \
+        [signature.gen.pair(pk.Y2[h]) for h in hidden_attributes]
+    exponents = [t, Bn.from_binary(message)] + \
+        [Bn.from_binary(credential.attributes[h]) for h in hidden_attributes]
 
+    C = multi_exponentiate(GT, bases, exponents)
+    FiatShamirProof(GT, C, pk, bases, exponents)
 
-def test_verify100(benchmark):
-    """Benchmark testing"""
-    n = 100
-    server = Server()
-    client = Client()
 
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
+@pytest.mark.parametrize("n", ATTRIBUTE_COUNTS)
+def test_sign_hidden(benchmark, n):
+    """Benchmark testing, single pairing for all hidden attributes"""
+    benchmark.group = f"sign_hidden{n}"
+    pk, credential = hidden_setup(n)
     message = b"Hello from Mars!"
 
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
-
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
+    benchmark.pedantic(ABCVerify.create_disclosure_proof, args=(
+        pk, credential, [], message), rounds=10)
 
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
 
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
-
-    benchmark.pedantic(verify, args=(
-        server, client, server_pk, message, revealed_attributes, signature), rounds=100)
-
-
-def test_verify500(benchmark):
-    """Benchmark testing"""
-    n = 500
-    server = Server()
-    client = Client()
-
-    attributes = [str(i) for i in range(n)]+["username"]
-    username = "Furkan"
-    subscriptions = [str(i) for i in range(n)]
-    revealed_attributes = [str(i) for i in range(n)]
+@pytest.mark.parametrize("n", ATTRIBUTE_COUNTS)
+def test_sign_hidden_pairing_per_attribute(benchmark, n):
+    """Benchmark testing, one pairing per hidden attribute"""
+    benchmark.group = f"sign_hidden{n}"
+    pk, credential = hidden_setup(n)
     message = b"Hello from Mars!"
 
-    server_sk, server_pk = server.generate_ca(attributes)
-
-    issuance_request, private_state = client.prepare_registration(
-        server_pk, username, subscriptions)
-
-    server_response = server.process_registration(
-        server_sk, server_pk, issuance_request, username, subscriptions)
-
-    credentials = client.process_registration_response(
-        server_pk, server_response, private_state)
-
-    signature = client.sign_request(
-        server_pk, credentials, message, revealed_attributes)
-
-    benchmark.pedantic(verify, args=(
-        server, client, server_pk, message, revealed_attributes, signature), rounds=100)
+    benchmark.pedantic(pairing_per_attribute_disclosure, args=(
+        pk, credential, [], message), rounds=10)
+
+
+def main(args: List[str]) -> int:
+    """Run the benchmarks selected by the arguments, returns the exit status"""
+    parser = argparse.ArgumentParser(description="Benchmarks of the credential scheme.")
+    parser.add_argument("-o", "--output", help="File to write the results to, CSV if it ends with .csv, JSON otherwise. Defaults to stdout.")
+    parser.add_argument("-r", "--rounds", help="Number of timed rounds of every case.", type=int, default=ROUNDS)
+    parser.add_argument("-s", "--stages", help="Stages to benchmark.", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("-n", "--attributes", help="Numbers of subscriptions.", nargs="+", type=int, default=ATTRIBUTE_COUNTS)
+    parser.add_argument("-d", "--disclosed", help="Fractions of the subscriptions disclosed.", nargs="+", type=float, default=DISCLOSED_FRACTIONS)
+    parser.add_argument("-m", "--message-sizes", help="Sizes of the signed messages in bytes.", nargs="+", type=int, default=MESSAGE_SIZES)
+    parser.add_argument("-w", "--wire-formats", help="Wire formats to serialize to.", nargs="+", choices=WIRE_FORMATS, default=WIRE_FORMATS)
+    parser.add_argument("-b", "--baseline", help="Results of a previous run to compare with.")
+    parser.add_argument("-t", "--threshold", help="Factor the median time of a case may grow by.", type=float, default=REGRESSION_THRESHOLD)
+    namespace = parser.parse_args(args)
+
+    sweeps = dict(disclosed=namespace.disclosed, message_size=namespace.message_sizes, wire_format=namespace.wire_formats)
+    results = []
+    for case in cases(namespace.stages, namespace.attributes, sweeps):
+        print(case.name(), file=sys.stderr)
+        results.append(measure(case, namespace.rounds))
+    write_results(results, namespace.output)
+
+    if namespace.baseline:
+        found = regressions(results, read_results(namespace.baseline), namespace.threshold)
+        for regression in found:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
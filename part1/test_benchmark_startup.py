@@ -0,0 +1,41 @@
+"""Startup time of the entry points: a fresh interpreter importing them"""
+import os
+import pytest
+import subprocess
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Entry points, and the heavy modules they must not import
+ENTRY_POINTS = {
+    "client_cli": {"petrelic", "requests", "jsonpickle", "flask"},
+    "client": {"petrelic", "requests", "jsonpickle", "flask"},
+    "server": {"flask", "flask_sqlalchemy", "sqlalchemy", "requests"},
+    "stroll": {"flask", "requests"},
+}
+
+
+def python(code):
+    """Run code in a fresh interpreter, returns its output
+    """
+    return subprocess.run([sys.executable, "-c", code], capture_output=True,
+                          check=True, text=True, cwd=HERE).stdout
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_deferred_imports(module):
+    """Test that entry points only import what they use"""
+    imported = python(f"import sys, {module}; print(' '.join(sys.modules))").split()
+    assert not ENTRY_POINTS[module] & set(imported)
+
+
+@pytest.mark.parametrize("module", list(ENTRY_POINTS) + ["server_app"])
+def test_import(benchmark, module):
+    """Benchmark testing"""
+    benchmark.pedantic(python, args=(f"import {module}",), rounds=10)
+
+
+def test_interpreter(benchmark):
+    """Benchmark testing, the baseline of the imports"""
+    benchmark.pedantic(python, args=("pass",), rounds=10)
@@ -0,0 +1,120 @@
+"""
+Unit tests for client.py
+"""
+
+from aiohttp import web
+from client import *
+from client_cli import ClientDaemonError
+from server_async import make_app
+from stroll import Client, Server
+from test_server_async import create_database
+import asyncio
+import client_cli
+import os
+import pytest
+import subprocess
+import sys
+import threading
+import time
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Run server_async.py on a free port in a background thread, yields its host and keys
+    """
+    create_database(tmp_path / "fingerprint.db")
+    server_sk, server_pk = Server.generate_ca(["bar", "username"])
+    app = make_app(server_pk, server_sk, database=str(tmp_path / "fingerprint.db"))
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = runner.addresses[0][1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    yield f"127.0.0.1:{port}", server_sk, server_pk
+
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def write_credential(tmp_path, server_sk, server_pk):
+    """Register a user subscribed to bar, and write its key and credential files
+    """
+    client = Client()
+    issuance_request, state = client.prepare_registration(server_pk, "Furkan", ["bar"])
+    response = Server().process_registration(server_sk, server_pk, issuance_request, "Furkan", ["bar"])
+    (tmp_path / "key-client.pub").write_bytes(server_pk)
+    (tmp_path / "anon.cred").write_bytes(client.process_registration_response(server_pk, response, state))
+
+
+def test_fetch_pois(server):
+    """Test that PoIs fetched concurrently are in the order of their IDs
+    """
+    host, _, _ = server
+    session = create_session(None)  # type:ignore
+    pois = fetch_pois(session, host, [3, 1, 2, 1])
+    assert [poi["poi_id"] for poi in pois] == [3, 1, 2, 1]
+
+    with pytest.raises(ClientHTTPError):
+        fetch_pois(session, host, [1, 42])
+
+
+def test_daemon(server, tmp_path, capsys):
+    """Test that commands forwarded to the daemon output the same as without it
+    """
+    host, server_sk, server_pk = server
+    write_credential(tmp_path, server_sk, server_pk)
+    path = str(tmp_path / DAEMON_SOCKET)
+
+    with ClientDaemon(path, host, None) as daemon:
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+
+        def forward(command):
+            return forward_command(
+                path, dict(command, pub=str(tmp_path / "key-client.pub"), credential=str(tmp_path / "anon.cred")))
+
+        for _ in range(2):
+            assert forward({"command": "grid", "cell_id": 3, "types": ["bar"]}) == \
+                ['You are near "Sushi bar".', 'You are near "Bar".']
+        assert forward({"command": "loc", "lat": 46.52, "lon": 6.56, "types": ["bar"]}) == \
+            ["Sigh... nothing interesting nearby."]
+
+        # Errors are raised in the front end
+        with pytest.raises(ClientDaemonError):
+            forward({"command": "grid", "cell_id": 3, "types": ["sushi"]})
+        with pytest.raises(ClientDaemonError):
+            forward({"command": "register"})
+
+        # The public key and credential were decoded once
+        assert len(daemon.client.keys.keys) == 1 and len(daemon.client.credentials.keys) == 1
+
+        # Once precomputed, signatures are completed from the pool
+        while not daemon.client.pool.proofs[next(iter(daemon.request_types))]:
+            time.sleep(0.01)
+        hits = daemon.client.pool.hits
+        assert forward({"command": "grid", "cell_id": 7, "types": ["bar"]}) == ['You are near "Dojo".']
+        assert daemon.client.pool.hits == hits + 1
+
+        # The thin front end outputs the same
+        client_cli.main(["--socket", path, "grid", "3", "-T", "bar",
+                         "-p", str(tmp_path / "key-client.pub"), "-c", str(tmp_path / "anon.cred")])
+        assert capsys.readouterr().out == 'You are near "Sushi bar".\nYou are near "Bar".\n'
+
+        daemon.shutdown()
+        thread.join()
+
+
+def test_thin_front_end():
+    """Test that the front end of the daemon does not import the client's dependencies
+    """
+    code = "import client_cli, sys; print(sorted({'petrelic', 'requests', 'stroll'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert output.strip() == "[]"
@@ -3,9 +3,14 @@ Unit tests for the credential module for implementing PS credentials
 """
 
 from credential import *
+from exponentiation import FixedBaseTable, MULTI_EXP_THRESHOLD, multi_exponentiate
+from serialization import jsonpickle
 import os
+import pytest
 import random
 import string
+import threading
+import time
 
 
 def test_ps_scheme():
@@ -30,6 +35,83 @@ def test_ps_scheme():
     assert not PSScheme.verify(pk2, signature, msgs)
 
 
+def test_ps_scheme_attribute_order():
+    """Test that messages are signed for the attributes of the public key,
+    whatever the order of the secret key's attributes
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    sk, pk = PSScheme.generate_keys(attributes)
+    msgs = [os.urandom(128) for _ in attributes]
+
+    sk.y = dict(reversed(list(sk.y.items())))
+    assert not PSScheme.verify(pk, PSScheme.sign(sk, msgs), msgs)
+    assert PSScheme.verify(pk, PSScheme.sign(sk, msgs, pk.attributes), msgs)
+
+
+def test_ps_scheme_precomputed():
+    """Test PS Scheme with precomputed fixed-base tables
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+
+    sk, pk = PSScheme.generate_keys(attributes, precompute=True)
+    msgs = [os.urandom(128) for _ in attributes]
+
+    signature = PSScheme.sign(sk, msgs)
+    assert PSScheme.verify(pk, signature, msgs)
+
+    # Tables are not part of the serialized keys
+    pk_decoded = jsonpickle.decode(jsonpickle.encode(pk))
+    assert jsonpickle.encode(pk_decoded) == jsonpickle.encode(pk)
+    assert PSScheme.verify(pk_decoded, signature, msgs)
+
+    # Only the generators use tables, unless attribute tables are requested
+    assert isinstance(pk.g2_base(), FixedBaseTable) and pk.Y2_base("bar") is pk.Y2["bar"]
+    pk.precompute(attribute_tables=True)
+    assert isinstance(pk.Y1_base("bar"), FixedBaseTable) and isinstance(pk.Y2_base("bar"), FixedBaseTable)
+    assert PSScheme.verify(pk, signature, msgs)
+    pk.precompute()
+    assert pk.Y2_base("bar") is pk.Y2["bar"] and isinstance(pk.g2_base(), FixedBaseTable)
+    assert list(pk._tables) == ["g1", "g2"]
+
+
+def test_fixed_base_table():
+    """Test that fixed-base tables agree with plain exponentiation
+    """
+    for G in (G1, G2, GT):
+        base = G.generator() ** G.order().random()
+        table = FixedBaseTable(base)
+        for e in [0, 1, -1, 12345, G.order(), G.order().random()]:
+            assert table ** e == base ** e
+
+        # Results must not alias the table entries
+        result = table ** 1
+        result *= base
+        assert table ** 1 == base
+
+
+def test_multi_exponentiate():
+    """Test that multi-exponentiation agrees with separate exponentiations
+    """
+    for G in (G1, G2, GT):
+        for N in (0, 5, MULTI_EXP_THRESHOLD + 1):
+            bases = [G.generator() ** G.order().random() for _ in range(N)]
+            exponents = [G.order().random() for _ in range(N)]
+            if N:
+                exponents[0] = -exponents[0]
+                exponents[-1] = 0
+
+            expected = G.unity()
+            for b, e in zip(bases, exponents):
+                expected *= b ** e
+
+            assert multi_exponentiate(G, bases, exponents) == expected
+
+            # Mix in bases with precomputed tables
+            if N:
+                tables = [FixedBaseTable(bases[0])] + bases[1:]
+                assert multi_exponentiate(G, tables, exponents) == expected
+
+
 def test_fiat_shamir():
     """Test Fiat Shamir proof when verification should succeed
     """
@@ -61,6 +143,25 @@ def test_fiat_shamir():
     assert not proof.verify(C**2, pk, bases)
 
 
+def test_fiat_shamir_transcript():
+    """Test that challenges are bound to the public key, C and the commitment
+    """
+    sk, pk = PSScheme.generate_keys(["restaurant", "bar", "username"])
+    _, other_pk = PSScheme.generate_keys(["restaurant", "bar", "username"])
+    C, commitment = G1.generator() ** 3, G1.generator() ** 5
+
+    challenge = FiatShamirProof.create_hash(C, pk, commitment)
+    assert challenge == FiatShamirProof.create_hash(C, pk, commitment)
+
+    # The key digest is absorbed once, and decoded keys hash the same
+    assert pk._transcript is not None
+    assert challenge == FiatShamirProof.create_hash(C, jsonpickle.decode(jsonpickle.encode(pk)), commitment)
+
+    assert challenge != FiatShamirProof.create_hash(C, other_pk, commitment)
+    assert challenge != FiatShamirProof.create_hash(commitment, pk, C)
+    assert challenge != FiatShamirProof.create_hash(C, pk, commitment ** 2)
+
+
 def test_abc():
 
     # Attributes with random values
@@ -114,3 +215,291 @@ def test_abc():
     verification3 = ABCVerify.verify_disclosure_proof(
         pk, disclosure_proof, message2)
     assert not verification3
+
+
+def test_attribute_sets():
+    """Test the bitmasks of attribute sets, and that no step depends on the order of attribute maps
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    sk, pk = PSScheme.generate_keys(attributes)
+    assert not hasattr(pk, "__dict__")
+
+    mask = pk.mask(["sushi", "restaurant", "sushi"])
+    assert mask == 0b101
+    assert pk.hidden(mask) == ["bar", "username"] and pk.selected(mask) == ["restaurant", "sushi"]
+    assert pk.hidden(0) == attributes and pk.selected(0) == []
+    with pytest.raises(KeyError):
+        pk.mask(["pizza"])
+
+    # Attribute maps in another order than the key
+    attribute_map = {a: os.urandom(16) for a in reversed(attributes)}
+    request, t = ABCIssue.create_issue_request(pk, {a: attribute_map[a] for a in ["username", "bar"]})
+    response = ABCIssue.sign_issue_request(
+        sk, pk, request, {a: attribute_map[a] for a in ["sushi", "restaurant"]})
+    credential = ABCIssue.obtain_credential(pk, response, attribute_map, t)
+
+    disclosure_proof = ABCVerify.create_disclosure_proof(pk, credential, ["sushi", "bar"], b"Hello")
+    disclosure_proof.disclosed_attributes = dict(reversed(list(disclosure_proof.disclosed_attributes.items())))
+    assert ABCVerify.verify_disclosure_proof(pk, disclosure_proof, b"Hello")
+
+    # The key still serializes the same
+    assert jsonpickle.decode(jsonpickle.encode(pk)).index == pk.index
+
+
+def test_abc_precomputed():
+    """Test the showing protocol with a public key in precomputation mode
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    attribute_map = {a: os.urandom(128) for a in attributes}
+    disclosed_attributes = ["restaurant", "sushi"]
+    message = os.urandom(128)
+
+    sk, pk = PSScheme.generate_keys(attributes, precompute=True)
+    request, t = ABCIssue.create_issue_request(pk, attribute_map)
+    response = ABCIssue.sign_issue_request(sk, pk, request, {})
+    credential = ABCIssue.obtain_credential(pk, response, attribute_map, t)
+
+    disclosure_proof = ABCVerify.create_disclosure_proof(
+        pk, credential, disclosed_attributes, message)
+    assert ABCVerify.verify_disclosure_proof(pk, disclosure_proof, message)
+
+    # Proofs verify the same with a key without tables
+    pk_plain = jsonpickle.decode(jsonpickle.encode(pk))
+    assert ABCVerify.verify_disclosure_proof(
+        pk_plain, disclosure_proof, message)
+
+    # Check that a tampered disclosed attribute fails
+    disclosure_proof.disclosed_attributes["sushi"] = os.urandom(128)
+    assert not ABCVerify.verify_disclosure_proof(
+        pk, disclosure_proof, message)
+
+
+def test_precomputed_disclosure():
+    """Test disclosure proofs precomputed before the message is known
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    attribute_map = {a: os.urandom(128) for a in attributes}
+    message = os.urandom(128)
+
+    sk, pk = PSScheme.generate_keys(attributes)
+    request, t = ABCIssue.create_issue_request(pk, attribute_map)
+    response = ABCIssue.sign_issue_request(sk, pk, request, {})
+    credential = ABCIssue.obtain_credential(pk, response, attribute_map, t)
+
+    precomputed = ABCVerify.precompute_disclosure_proof(pk, credential, ["bar"])
+    disclosure_proof = ABCVerify.complete_disclosure_proof(pk, precomputed, message)
+    assert ABCVerify.verify_disclosure_proof(pk, disclosure_proof, message)
+    assert not ABCVerify.verify_disclosure_proof(pk, disclosure_proof, os.urandom(128))
+
+
+def test_attribute_exponents():
+    """Test interned attribute values and the exponents cached by credentials
+    """
+    assert intern_attribute(b"present") is attribute_exponent(b"present")
+    assert attribute_exponent(b"present") == Bn.from_binary(b"present")
+    value = os.urandom(16)
+    assert attribute_exponent(value) == Bn.from_binary(value)
+
+    attributes = ["bar", "sushi", "username"]
+    attribute_map = {"bar": b"present", "sushi": b"absent", "username": os.urandom(16)}
+    sk, pk = PSScheme.generate_keys(attributes)
+    request, t = ABCIssue.create_issue_request(pk, {"username": attribute_map["username"]})
+    response = ABCIssue.sign_issue_request(
+        sk, pk, request, {"bar": b"present", "sushi": b"absent"})
+    credential = ABCIssue.obtain_credential(pk, response, attribute_map, t)
+
+    exponents = credential.exponents()
+    assert exponents is credential.exponents()
+    assert exponents == {a: Bn.from_binary(v) for a, v in attribute_map.items()}
+
+    # The exponents are not serialized, decoded credentials convert them again
+    decoded = jsonpickle.decode(jsonpickle.encode(credential))
+    assert decoded._exponents is None
+    assert decoded.exponents() == exponents
+    disclosure_proof = ABCVerify.create_disclosure_proof(pk, decoded, ["bar"], b"message")
+    assert ABCVerify.verify_disclosure_proof(pk, disclosure_proof, b"message")
+
+
+def test_disclosed_base():
+    """Test that the G2 argument of disclosures is cached for interned values only
+    """
+    attributes = ["bar", "sushi", "username"]
+    sk, pk = PSScheme.generate_keys(attributes)
+    intern_attribute(b"present")
+
+    expected = pk.X2.inverse() * pk.Y2["bar"] ** -Bn.from_binary(b"present")
+    base = pk.disclosed_base({"bar": b"present"})
+    assert base == expected
+    assert pk.disclosed_base({"bar": b"present"}) is base
+
+    username = os.urandom(16)
+    assert pk.disclosed_base({"bar": b"present", "username": username}) == \
+        expected * pk.Y2["username"] ** -Bn.from_binary(username)
+    assert len(pk._disclosed) == 1
+
+    # Proofs disclosing a cached set still verify, and only with the disclosed values
+    attribute_map = {"bar": b"present", "sushi": b"absent", "username": username}
+    request, t = ABCIssue.create_issue_request(pk, attribute_map)
+    response = ABCIssue.sign_issue_request(sk, pk, request, {})
+    credential = ABCIssue.obtain_credential(pk, response, attribute_map, t)
+    for _ in range(2):
+        disclosure_proof = ABCVerify.create_disclosure_proof(pk, credential, ["bar"], b"message")
+        assert ABCVerify.verify_disclosure_proof(pk, disclosure_proof, b"message")
+    disclosure_proof.disclosed_attributes["bar"] = b"absent"
+    assert not ABCVerify.verify_disclosure_proof(pk, disclosure_proof, b"message")
+
+
+def test_batch_verification():
+    """Test batch verification of disclosure proofs, with valid and invalid proofs
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    attribute_map = {a: os.urandom(128) for a in attributes}
+
+    sk, pk = PSScheme.generate_keys(attributes)
+    request, t = ABCIssue.create_issue_request(pk, attribute_map)
+    response = ABCIssue.sign_issue_request(sk, pk, request, {})
+    credential = ABCIssue.obtain_credential(pk, response, attribute_map, t)
+
+    # Proofs disclosing different attributes
+    disclosures = [[], ["bar"], ["restaurant", "sushi"], attributes]
+    messages = [os.urandom(128) for _ in disclosures]
+    proofs = [ABCVerify.create_disclosure_proof(pk, credential, d, m)
+              for d, m in zip(disclosures, messages)]
+
+    assert ABCVerify.batch_verify_disclosure_proofs(
+        pk, proofs, messages) == [True, True, True, True]
+    assert ABCVerify.batch_verify_disclosure_proofs(pk, [], []) == []
+
+    # Invalid proofs are found, the others still pass
+    proofs[1].signature.sig **= 2
+    messages[3] = os.urandom(128)
+    assert ABCVerify.batch_verify_disclosure_proofs(
+        pk, proofs, messages) == [True, False, True, False]
+
+    # A wrong response only fails the combined equation
+    proofs[2].proof.response[0] += 1
+    assert ABCVerify.batch_verify_disclosure_proofs(
+        pk, proofs, messages) == [True, False, False, False]
+
+
+def test_batch_verification_generator_name(monkeypatch):
+    """Test that a hidden attribute named like the generator is batched with its own base
+    """
+    attributes = ["g2", "username"]
+    attribute_map = {a: os.urandom(16) for a in attributes}
+    sk, pk = PSScheme.generate_keys(attributes)
+    request, t = ABCIssue.create_issue_request(pk, attribute_map)
+    credential = ABCIssue.obtain_credential(
+        pk, ABCIssue.sign_issue_request(sk, pk, request, {}), attribute_map, t)
+    # More proofs than G2 bases (g2 and both hidden attributes), such that they are combined
+    messages = [os.urandom(16) for _ in range(4)]
+    proofs = [ABCVerify.create_disclosure_proof(pk, credential, [], m) for m in messages]
+
+    # The combined equation holds, the proofs are not verified one by one
+    with monkeypatch.context() as m:
+        m.setattr(FiatShamirProof, "verify", lambda *args: pytest.fail("combined equation failed"))
+        assert ABCVerify.batch_verify_disclosure_proofs(pk, proofs, messages) == [True] * 4
+
+
+def test_batch_verification_pairings(monkeypatch):
+    """Test that a batch never takes more pairings than verifying its proofs separately
+    """
+    pairings = []
+    pair = G1Element.pair
+    monkeypatch.setattr(G1Element, "pair", lambda *args: pairings.append(1) or pair(*args))
+
+    for n, count in ((20, 3), (2, 8)):
+        attributes = [str(i) for i in range(n)]
+        attribute_map = {a: os.urandom(16) for a in attributes}
+        sk, pk = PSScheme.generate_keys(attributes)
+        request, t = ABCIssue.create_issue_request(pk, attribute_map)
+        credential = ABCIssue.obtain_credential(
+            pk, ABCIssue.sign_issue_request(sk, pk, request, {}), attribute_map, t)
+        messages = [os.urandom(16) for _ in range(count)]
+        proofs = [ABCVerify.create_disclosure_proof(pk, credential, [], m) for m in messages]
+
+        pairings.clear()
+        assert ABCVerify.batch_verify_disclosure_proofs(pk, proofs, messages) == [True] * count
+        # Two pairings per C, then one per proof, or one per G2 base once there are more proofs
+        assert len(pairings) == 2 * count + min(count, n + 1)
+
+
+def test_batch_issuance():
+    """Test signing many issue requests at once, with valid and invalid requests
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    sk, pk = PSScheme.generate_keys(attributes)
+
+    # Users commit to their username, the issuer signs the subscriptions
+    attribute_maps = [{a: os.urandom(16) for a in attributes} for _ in range(4)]
+    user_maps = [{"username": m["username"]} for m in attribute_maps]
+    issuer_maps = [{a: m[a] for a in attributes if a != "username"}
+                   for m in attribute_maps]
+    requests, ts = zip(*[ABCIssue.create_issue_request(pk, u)
+                         for u in user_maps])
+    requests = list(requests)
+
+    # Forged commitment and wrong response
+    requests[1] = IssueRequest(requests[1].C ** 2, requests[1].proof)
+    requests[2].proof.response[0] += 1
+
+    responses = ABCIssue.batch_sign_issue_requests(
+        sk, pk, requests, issuer_maps)
+    assert [r is not None for r in responses] == [True, False, False, True]
+
+    for i in (0, 3):
+        credential = ABCIssue.obtain_credential(
+            pk, responses[i], attribute_maps[i], ts[i])
+        assert PSScheme.verify(
+            pk, credential.signature, list(attribute_maps[i].values()))
+
+
+def test_batch_issuance_generator_name(monkeypatch):
+    """Test that a user attribute named like the generator is batched with its own base
+    """
+    attributes = ["g1", "username"]
+    sk, pk = PSScheme.generate_keys(attributes)
+    attribute_maps = [{"g1": os.urandom(16), "username": os.urandom(16)} for _ in range(2)]
+    requests, ts = zip(*[ABCIssue.create_issue_request(pk, m) for m in attribute_maps])
+
+    # The combined equation holds, the proofs are not verified one by one
+    with monkeypatch.context() as m:
+        m.setattr(FiatShamirProof, "verify", lambda *args: pytest.fail("combined equation failed"))
+        responses = ABCIssue.batch_sign_issue_requests(sk, pk, list(requests), [{}, {}])
+    assert all(r is not None for r in responses)
+    for response, attribute_map, t in zip(responses, attribute_maps, ts):
+        credential = ABCIssue.obtain_credential(pk, response, attribute_map, t)
+        assert PSScheme.verify(pk, credential.signature, list(attribute_map.values()))
+
+
+def test_hidden_threads():
+    """Test that threads sharing a key can evict the cached hidden sets concurrently
+    """
+    attributes = [f"a{i}" for i in range(12)]
+    _, pk = PSScheme.generate_keys(attributes)
+
+    class SlowDict(dict):
+        # Leaves other threads time to evict the same entry
+        def __iter__(self):
+            for key in list(super().__iter__()):
+                time.sleep(0.001)
+                yield key
+
+    pk._hidden = SlowDict()
+    errors = []
+
+    def run(offset):
+        try:
+            for mask in range(offset, 1 << len(attributes), 16):
+                assert pk.hidden(mask) == [a for i, a in enumerate(attributes) if not mask >> i & 1]
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(pk._hidden) <= HIDDEN_CACHE_SIZE
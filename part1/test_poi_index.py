@@ -0,0 +1,105 @@
+"""
+Unit tests for poi_index.py
+"""
+
+from poi_index import *
+import json
+import pytest
+import sqlite3
+
+
+def write_database(path, records):
+    """Write a PoI database with the given records
+    """
+    connection = sqlite3.connect(path)
+    connection.execute(f"DROP TABLE IF EXISTS {POI_TABLE}")
+    connection.execute(
+        f"CREATE TABLE {POI_TABLE} (poi_id INTEGER PRIMARY KEY, poi_name TEXT, poi_address TEXT, grid_id INTEGER, poi_ratings TEXT)")
+    connection.executemany(f"INSERT INTO {POI_TABLE} VALUES (?, ?, ?, ?, ?)", records)
+    connection.commit()
+    connection.close()
+
+
+def test_index():
+    """Test the lookups of cells and PoIs
+    """
+    index = PoIIndex([(5, "Dojo", "Rue 5", 9, "[]"), (2, "Bar", "Rue 2", 3, "[3]"),
+                      (1, "Sushi bar", "Rue 1", 3, "[4, 5]")])
+
+    assert index.poi_ids(3).tolist() == [1, 2]
+    assert index.poi_ids(9).tolist() == [5]
+    for cell_id in (-1, 0, 4, 8, 10, 100):
+        assert index.poi_ids(cell_id).tolist() == []
+
+    assert json.loads(index.poi(1)) == dict(  # type:ignore
+        poi_id=1, poi_name="Sushi bar", poi_address="Rue 1", grid_id=3, poi_ratings=[4, 5])
+    assert index.poi(3) is None
+
+    empty = PoIIndex([])
+    assert empty.poi_ids(0).tolist() == [] and empty.poi(0) is None
+
+
+def test_refresh(tmp_path):
+    """Test that the index is reloaded when the database file changes
+    """
+    path = str(tmp_path / "fingerprint.db")
+    write_database(path, [(1, "Sushi bar", "Rue 1", 3, "[4, 5]")])
+
+    live = LivePoIIndex(path, refresh_interval=0)
+    index = live.get()
+    assert index.poi_ids(3).tolist() == [1]
+    assert live.stale() and not LivePoIIndex(path, refresh_interval=60).stale()
+    assert live.get() is index
+
+    write_database(path, [(1, "Sushi bar", "Rue 1", 3, "[4, 5]"), (2, "Bar", "Rue 2", 3, "[3]")])
+    assert live.get().poi_ids(3).tolist() == [1, 2]
+
+    # Indexes in use are never changed
+    assert index.poi_ids(3).tolist() == [1]
+
+
+def test_missing_database(tmp_path):
+    """Test that a missing database file serves an empty index until it is created
+    """
+    path = str(tmp_path / "fingerprint.db")
+
+    live = LivePoIIndex(path, refresh_interval=0)
+    assert live.get().poi_ids(3).tolist() == [] and live.get().poi(1) is None
+    assert json.loads(live.get().cell_response(3)) == {"poi_list": []}
+
+    write_database(path, [(1, "Sushi bar", "Rue 1", 3, "[4, 5]")])
+    assert live.get().poi_ids(3).tolist() == [1]
+
+
+def test_responses():
+    """Test that cached responses with spliced padding equal freshly encoded ones
+    """
+    records = [(1, "Sushi bar", "Rue 1", 3, "[4, 5]"), (2, "Bar", "Rue 2", 3, "[3]")]
+
+    def pretty_dumps(obj):
+        return (json.dumps(obj, indent=2, sort_keys=True) + "\n").encode()
+
+    for dumps in (json_dumps, pretty_dumps):
+        index = PoIIndex(records, dumps)
+        assert index.cell_response(3) == dumps({"poi_list": [1, 2]})
+        assert index.cell_response(3) is index.cell_response(3)
+        assert index.cell_response(42) == dumps({"poi_list": []})
+
+        poi = dict(poi_id=2, poi_name="Bar", poi_address="Rue 2", grid_id=3, poi_ratings=[3])
+        for padding_length in (3, 0, 10):
+            assert index.poi_response(2, padding_length) == dumps(
+                {**poi, "padding": [PADDING_VALUE] * padding_length})
+        assert index.poi_response(42, 0) is None
+
+        assert index.cells_response([42, 3]) == dumps({"cells": [
+            {"cell_id": 42, "pois": []},
+            {"cell_id": 3, "pois": [json.loads(index.poi(1)), poi]}]})  # type:ignore
+
+
+def test_parse_cell_ids():
+    """Test that only short lists of integer cell_ids are accepted
+    """
+    assert parse_cell_ids(b"[7, 3]") == [7, 3]
+    for data in (b"[]", b"3", b'["3"]', b"[3.0]", b"[true]", b"[3", json.dumps(list(range(MAX_CELLS + 1))).encode()):
+        with pytest.raises(ValueError):
+            parse_cell_ids(data)
@@ -0,0 +1,150 @@
+"""
+Unit tests for server_async.py
+"""
+
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+from poi_index import MAX_CELLS, POI_TABLE
+from server_async import *
+from stroll import Client, cells_message
+import asyncio
+import json
+import sqlite3
+
+
+def create_database(path):
+    """Create a PoI database with two PoIs in cell 3 and one in cell 7
+    """
+    connection = sqlite3.connect(path)
+    connection.execute(
+        f"CREATE TABLE {POI_TABLE} (poi_id INTEGER PRIMARY KEY, poi_name TEXT, poi_address TEXT, grid_id INTEGER, poi_ratings TEXT)")
+    connection.executemany(
+        f"INSERT INTO {POI_TABLE} VALUES (?, ?, ?, ?, ?)",
+        [(1, "Sushi bar", "Rue 1", 3, "[4, 5]"), (2, "Bar", "Rue 2", 3, "[3]"), (3, "Dojo", "Rue 3", 7, "[]")])
+    connection.commit()
+    connection.close()
+
+
+def form(files):
+    """Multipart form with files, like the ones sent by client.py
+    """
+    data = FormData()
+    for name, value in files.items():
+        data.add_field(name, value, filename=name)
+    return data
+
+
+def run(app, scenario):
+    """Run a scenario against the app
+    """
+    async def main():
+        async with TestClient(TestServer(app)) as client:
+            await scenario(client)
+    asyncio.run(main())
+
+
+def test_routes(tmp_path):
+    """Test that the routes behave like the ones of server.py
+    """
+    create_database(tmp_path / "fingerprint.db")
+    server_sk, server_pk = Server.generate_ca(["bar", "sushi", "username"])
+    app = make_app(server_pk, server_sk, database=str(tmp_path / "fingerprint.db"))
+    client = Client()
+
+    async def scenario(http):
+        response = await http.get("/public-key")
+        assert await response.read() == server_pk
+
+        issuance_request, state = client.prepare_registration(server_pk, "Furkan", ["bar"])
+        response = await http.post("/register", data=form({
+            "username": b"Furkan", "subscriptions": json.dumps(["bar"]).encode(), "issuance_req": issuance_request}))
+        assert response.status == 200
+        credentials = client.process_registration_response(server_pk, await response.read(), state)
+
+        signature = client.sign_request(server_pk, credentials, b"3", ["bar"])
+        response = await http.post("/poi-grid", data=form({
+            "cell_id": b"3", "types": json.dumps(["bar"]).encode(), "signature": signature}))
+        assert (await response.json())["poi_list"] == [1, 2]
+
+        # The signature is for another cell
+        response = await http.post("/poi-grid", data=form({
+            "cell_id": b"7", "types": json.dumps(["bar"]).encode(), "signature": signature}))
+        assert response.status == 401
+
+        signature = client.sign_request(server_pk, credentials, b"46.52,6.56", ["bar"])
+        response = await http.post("/poi-loc", data=form({
+            "lat": b"46.52", "lon": b"6.56", "types": json.dumps(["bar"]).encode(), "signature": signature}))
+        assert (await response.json())["poi_list"] == []
+
+        response = await http.get("/poi", params={"poi_id": "1"})
+        poi = await response.json()
+        assert poi["poi_name"] == "Sushi bar" and poi["poi_ratings"] == [4, 5]
+        assert set(poi["padding"]) <= {-1}
+
+        response = await http.get("/poi", params={"poi_id": "42"})
+        assert response.status == 404
+
+    run(app, scenario)
+
+
+def test_backpressure(tmp_path):
+    """Test that crypto requests beyond the limit are rejected, and other routes still answer
+    """
+    create_database(tmp_path / "fingerprint.db")
+    server_sk, server_pk = Server.generate_ca(["bar", "username"])
+    app = make_app(server_pk, server_sk, database=str(tmp_path / "fingerprint.db"), max_pending=0)
+
+    async def scenario(http):
+        response = await http.post("/poi-grid", data=form({
+            "cell_id": b"3", "types": b"[]", "signature": b"{}"}))
+        assert response.status == 503
+        assert response.headers["Retry-After"] == str(RETRY_AFTER)
+
+        response = await http.get("/public-key")
+        assert response.status == 200
+
+    run(app, scenario)
+
+
+def test_poi_cells(tmp_path):
+    """Test that one signature covers the PoIs of several cells
+    """
+    create_database(tmp_path / "fingerprint.db")
+    server_sk, server_pk = Server.generate_ca(["bar", "username"])
+    app = make_app(server_pk, server_sk, database=str(tmp_path / "fingerprint.db"))
+    client = Client()
+
+    async def scenario(http):
+        issuance_request, state = client.prepare_registration(server_pk, "Furkan", ["bar"])
+        response = await http.post("/register", data=form({
+            "username": b"Furkan", "subscriptions": json.dumps(["bar"]).encode(), "issuance_req": issuance_request}))
+        credentials = client.process_registration_response(server_pk, await response.read(), state)
+
+        signature = client.sign_request(server_pk, credentials, cells_message([7, 3, 5]), ["bar"])
+        response = await http.post("/poi-cells", data=form({
+            "cell_ids": b"[7, 3, 5]", "types": json.dumps(["bar"]).encode(), "signature": signature}))
+        cells = (await response.json())["cells"]
+        assert [cell["cell_id"] for cell in cells] == [7, 3, 5]
+        assert [[poi["poi_name"] for poi in cell["pois"]] for cell in cells] == [["Dojo"], ["Sushi bar", "Bar"], []]
+
+        # The signature covers exactly these cells, in this order
+        for cell_ids in (b"[3, 7, 5]", b"[7, 3]", b"[7, 3, 5, 9]"):
+            response = await http.post("/poi-cells", data=form({
+                "cell_ids": cell_ids, "types": json.dumps(["bar"]).encode(), "signature": signature}))
+            assert response.status == 401
+
+        for cell_ids in (b"[]", b"3", b'["3"]', json.dumps(list(range(MAX_CELLS + 1))).encode()):
+            response = await http.post("/poi-cells", data=form({
+                "cell_ids": cell_ids, "types": json.dumps(["bar"]).encode(), "signature": signature}))
+            assert response.status == 400
+
+    run(app, scenario)
+
+
+def test_flask_encoding(monkeypatch):
+    """Test that responses are encoded like the ones of the Flask server, which runs in debug mode
+    """
+    import server_app
+    monkeypatch.setattr(server_app.APP, "debug", True)
+    response = {"poi_name": "Café", "poi_ratings": [4, 5], "padding": [-1], "poi_id": 1, "cells": [{}]}
+    assert jsonify_dumps(response) == server_app.jsonify_bytes(response)
@@ -3,7 +3,10 @@ Unit tests for stroll.py
 """
 
 from stroll import *
+from wire import BINARY, LazyElements
+import os
 import pytest
+import time
 
 
 def test_setup_valid_and_invalid():
@@ -118,3 +121,372 @@ def test_no_reveal():
         server_pk, credentials, message, revealed_attributes)
 
     assert server.check_request_signature(server_pk, message, revealed_attributes, signature)
+
+
+def test_batch_check():
+    """Test checking the signatures of many requests at once
+    """
+    server = Server()
+    client = Client()
+
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    username = "Furkan"
+    subscriptions = ["bar", "sushi"]
+
+    server_sk, server_pk = server.generate_ca(attributes)
+
+    issuance_request, private_state = client.prepare_registration(
+        server_pk, username, subscriptions)
+
+    server_response = server.process_registration(
+        server_sk, server_pk, issuance_request, username, subscriptions)
+
+    credentials = client.process_registration_response(
+        server_pk, server_response, private_state)
+
+    requests = []
+    for revealed_attributes in ([], ["bar"], ["sushi", "bar"]):
+        message = f"{len(requests)}".encode()
+        signature = client.sign_request(
+            server_pk, credentials, message, revealed_attributes)
+        requests.append((message, revealed_attributes, signature))
+
+    assert server.check_request_signatures_batch(
+        server_pk, requests) == [True, True, True]
+
+    # Wrong message and attribute not revealed
+    requests.append((b"Hello from Mars!", [], requests[0][2]))
+    requests.append((requests[1][0], ["sushi"], requests[1][2]))
+    assert server.check_request_signatures_batch(
+        server_pk, requests) == [True, True, True, False, False]
+
+    # Signatures which are not disclosure proofs raise, like for a single request
+    for signature in (jsonpickle.encode(None).encode(), b"not a signature"):
+        with pytest.raises((TypeError, ValueError)) as single:
+            server.check_request_signature(server_pk, requests[2][0], [], signature)
+        with pytest.raises(single.type):
+            server.check_request_signatures_batch(server_pk, requests + [(requests[2][0], [], signature)])
+
+
+def test_batch_registration():
+    """Test registering many clients at once
+    """
+    server = Server()
+    client = Client()
+
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    server_sk, server_pk = server.generate_ca(attributes)
+
+    registrations = [("Furkan", ["bar", "sushi"]), ("Pascal", ["restaurant"]),
+                     ("Rudolf", ["bar"]), ("Mallory", ["very secret place"])]
+    states = []
+    requests = []
+    for username, subscriptions in registrations:
+        issuance_request, private_state = client.prepare_registration(
+            server_pk, username, [s for s in subscriptions if s in attributes])
+        states.append(private_state)
+        requests.append((issuance_request, username, subscriptions))
+
+    # Malformed request
+    requests[2] = (jsonpickle.encode(None).encode(), "Rudolf", ["bar"])
+
+    responses = server.process_registrations_batch(
+        server_sk, server_pk, requests)
+    assert [r is not None for r in responses] == [True, True, False, False]
+
+    for i in (0, 1):
+        credentials = client.process_registration_response(
+            server_pk, responses[i], states[i])
+        revealed_attributes = registrations[i][1]
+        signature = client.sign_request(
+            server_pk, credentials, b"Hello from Mars!", revealed_attributes)
+        assert server.check_request_signature(
+            server_pk, b"Hello from Mars!", revealed_attributes, signature)
+
+
+def test_key_cache():
+    """Test that decoded keys are cached by content and the cache is bounded
+    """
+    cache = KeyCache(size=2, precompute=True)
+
+    keys = [Server.generate_ca(["bar", "username"]) for _ in range(3)]
+    pk = cache.decode(keys[0][1], PublicKey)
+
+    # Same content, different bytes object
+    assert cache.decode(bytes(bytearray(keys[0][1])), PublicKey) is pk
+
+    # Wrong type is rejected, also when cached
+    with pytest.raises(TypeError):
+        cache.decode(keys[0][1], SecretKey)
+    with pytest.raises(TypeError):
+        cache.decode(jsonpickle.encode(None).encode(), PublicKey)
+
+    # Least recently used key is dropped
+    cache.decode(keys[1][1], PublicKey)
+    cache.decode(keys[2][1], PublicKey)
+    assert len(cache.keys) == 2
+    assert cache.decode(keys[0][1], PublicKey) is not pk
+
+
+@pytest.mark.parametrize("wire_format", [JSONPICKLE, BINARY])
+def test_start_worker(monkeypatch, wire_format):
+    """Test that a worker decodes its keys once, public keys lazily
+    """
+    import stroll
+    monkeypatch.setattr(stroll, "_WORKER", None)
+    sk, pk = Server.generate_ca(["bar", "username"], wire_format)
+
+    # Keys are only decoded by the key cache, never fully to find their type
+    monkeypatch.setattr(stroll, "loads", lambda *args: pytest.fail("key decoded eagerly"))
+    stroll._start_worker([sk, pk], KEY_CACHE_SIZE, 0)
+
+    server, _ = stroll._WORKER
+    assert isinstance(server.keys.decode(sk, SecretKey), SecretKey)
+    assert isinstance(server.keys.decode(pk, PublicKey).Y2, LazyElements)
+
+
+@pytest.mark.parametrize("key_format, client_format", [
+    (JSONPICKLE, None), (BINARY, None), (JSONPICKLE, BINARY), (BINARY, JSONPICKLE)])
+def test_wire_formats(key_format, client_format):
+    """Test that server and client negotiate the wire format
+    """
+    server = Server()
+    client = Client(wire_format=client_format)
+
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    message = b"Hello from Mars!"
+
+    server_sk, server_pk = server.generate_ca(attributes, key_format)
+    assert wire_format_of(server_pk) == key_format
+
+    # The client uses the wire format of the public key by default
+    expected_format = client_format or key_format
+
+    issuance_request, private_state = client.prepare_registration(
+        server_pk, "Furkan", ["bar"])
+    assert wire_format_of(issuance_request) == expected_format
+
+    # The server responds in the wire format of the request
+    server_response = server.process_registration(
+        server_sk, server_pk, issuance_request, "Furkan", ["bar"])
+    assert wire_format_of(server_response) == expected_format
+
+    credentials = client.process_registration_response(
+        server_pk, server_response, private_state)
+    signature = client.sign_request(server_pk, credentials, message, ["bar"])
+    assert wire_format_of(signature) == expected_format
+
+    assert server.check_request_signature(server_pk, message, ["bar"], signature)
+
+    # A truncated signature can not be decoded, alone or in a batch
+    with pytest.raises(ValueError):
+        server.check_request_signature(server_pk, message, ["bar"], signature[:-10])
+    with pytest.raises(ValueError):
+        server.check_request_signatures_batch(server_pk, [
+            (message, ["bar"], signature), (message, ["bar"], signature[:-10])])
+
+
+def test_baseline_files():
+    """Test that keys and credentials written by the first version of the code still work
+    """
+    testdata = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+    server_pk, server_sk, credentials = [open(os.path.join(testdata, name), "rb").read()
+                                         for name in ("baseline_key.pub", "baseline_key.sec", "baseline_anon.cred")]
+
+    # Without the lazy decoding of the key cache as well
+    pk = loads(server_pk)
+    assert pk.index == {"bar": 0, "sushi": 1, "username": 2}
+    assert pk.mask(["sushi"]) == 2
+    pk.precompute()
+    assert pk.g1_pow(Bn(3)) == pk.g1 ** 3
+    assert loads(server_sk).g1_pow(Bn(3)) == G1.generator() ** 3
+
+    server = Server()
+    client = Client()
+    issuance_request, private_state = client.prepare_registration(server_pk, "Furkan", ["sushi"])
+    server_response = server.process_registration(server_sk, server_pk, issuance_request, "Furkan", ["sushi"])
+    new_credentials = client.process_registration_response(server_pk, server_response, private_state)
+
+    for creds, types in ((credentials, ["bar"]), (new_credentials, ["sushi"])):
+        signature = client.sign_request(server_pk, creds, b"message", types)
+        assert server.check_request_signature(server_pk, b"message", types, signature)
+
+
+def test_disclosure_pool():
+    """Test that requests are signed with precomputed proofs, which are refilled and never reused
+    """
+    server = Server()
+    client = Client(pool_depth=3)
+
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    server_sk, server_pk = server.generate_ca(attributes)
+    issuance_request, private_state = client.prepare_registration(
+        server_pk, "Furkan", ["bar", "sushi"])
+    server_response = server.process_registration(
+        server_sk, server_pk, issuance_request, "Furkan", ["bar", "sushi"])
+    credentials = client.process_registration_response(
+        server_pk, server_response, private_state)
+
+    # Types must be in the credential
+    with pytest.raises(Exception):
+        client.precompute_requests(server_pk, credentials, ["restaurant"], background=False)
+
+    client.precompute_requests(server_pk, credentials, ["sushi", "bar"], background=False)
+    assert sum(len(proofs) for proofs in client.pool.proofs.values()) == 3
+
+    # The order of the types does not matter
+    signatures = [client.sign_request(server_pk, credentials, f"{i}".encode(), ["bar", "sushi"])
+                  for i in range(4)]
+    assert client.pool.hits == 3 and client.pool.misses == 1
+    for i, signature in enumerate(signatures):
+        assert server.check_request_signature(server_pk, f"{i}".encode(), ["bar", "sushi"], signature)
+        assert not server.check_request_signature(server_pk, b"other", ["bar", "sushi"], signature)
+    assert len({loads(signature).signature.gen.to_binary() for signature in signatures}) == 4
+
+    # Other types are not precomputed, and do not count as misses
+    client.sign_request(server_pk, credentials, b"Hello from Mars!", ["bar"])
+    assert client.pool.hits == 3 and client.pool.misses == 1
+
+    # Pools only exist for a kind of precomputed values
+    with pytest.raises(TypeError):
+        PrecomputationPool(3, "pool")  # type:ignore
+
+    # The background thread refills the pool
+    client.precompute_requests(server_pk, credentials, ["bar", "sushi"])
+    deadline = time.time() + 30
+    while len(client.pool.proofs[DisclosurePool.request_type(server_pk, credentials, ["bar", "sushi"])]) < 3:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    client.stop()
+    assert client.pool.thread is None
+
+
+def test_nonce_pool():
+    """Test that registrations are signed with precomputed nonces, which are refilled and never reused
+    """
+    server = Server(nonce_pool_depth=3)
+    client = Client()
+
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    server_sk, server_pk = server.generate_ca(attributes)
+    server.precompute_registrations(server_pk, background=False)
+    key_id = NoncePool.key_id(server_pk)
+    nonces = list(server.nonces.values[key_id])
+    assert len(nonces) == 3
+
+    def register(username):
+        issuance_request, private_state = client.prepare_registration(server_pk, username, ["bar"])
+        server_response = server.process_registration(
+            server_sk, server_pk, issuance_request, username, ["bar"])
+        return loads(server_response), client.process_registration_response(
+            server_pk, server_response, private_state)
+
+    responses = [register(f"user{i}") for i in range(2)]
+    assert server.nonces.hits == 2 and server.nonces.misses == 0
+    assert [response.signature.gen for response, _ in responses] == [g1_u for _, g1_u in nonces[:2]]
+
+    # Batch registrations take nonces as well, the pool runs dry on the second one
+    registrations = []
+    for username in ("alice", "bob"):
+        issuance_request, _ = client.prepare_registration(server_pk, username, ["sushi"])
+        registrations.append((issuance_request, username, ["sushi"]))
+    batch = server.process_registrations_batch(server_sk, server_pk, registrations)
+    assert loads(batch[0]).signature.gen == nonces[2][1]
+    assert server.nonces.hits == 3 and server.nonces.misses == 1
+
+    # Credentials signed with pooled nonces work
+    _, credentials = responses[0]
+    signature = client.sign_request(server_pk, credentials, b"message", ["bar"])
+    assert server.check_request_signature(server_pk, b"message", ["bar"], signature)
+
+    # The background thread refills the pool
+    server.precompute_registrations(server_pk)
+    deadline = time.time() + 30
+    while len(server.nonces.values[key_id]) < 3:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    server.stop()
+    assert server.nonces.thread is None
+    assert not {g1_u for _, g1_u in nonces} & {g1_u for _, g1_u in server.nonces.values[key_id]}
+
+
+def test_worker_pool():
+    """Test registrations, signatures and checks run by worker processes
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    server_sk, server_pk = Server.generate_ca(attributes)
+
+    workers = WorkerPool(2, keys=[server_sk, server_pk])
+    try:
+        server = Server(workers=workers)
+        client = Client(workers=workers)
+
+        issuance_request, private_state = client.prepare_registration(
+            server_pk, "Furkan", ["bar"])
+        server_response = server.process_registration(
+            server_sk, server_pk, issuance_request, "Furkan", ["bar"])
+        credentials = client.process_registration_response(
+            server_pk, server_response, private_state)
+
+        signature = client.sign_request(server_pk, credentials, b"Hello from Mars!", ["bar"])
+        assert server.check_request_signature(server_pk, b"Hello from Mars!", ["bar"], signature)
+
+        # Many checks in parallel
+        futures = [workers.check_request_signature(server_pk, message, ["bar"], signature)
+                   for message in (b"Hello from Mars!", b"Hello from Venus!") * 4]
+        assert [future.result() for future in futures] == [True, False] * 4
+
+        # Errors are raised in the caller
+        with pytest.raises(TypeError):
+            server.check_request_signature(server_pk, b"Hello from Mars!", ["bar"], credentials)
+    finally:
+        workers.shutdown()
+
+
+def test_replay_cache(monkeypatch):
+    """Test that resubmitted and malformed requests are rejected without pairings
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    server_sk, server_pk = Server.generate_ca(attributes)
+    server = Server(replay_cache_size=2, replay_window=0.5)
+    client = Client()
+
+    issuance_request, private_state = client.prepare_registration(
+        server_pk, "Furkan", ["bar"])
+    server_response = server.process_registration(
+        server_sk, server_pk, issuance_request, "Furkan", ["bar"])
+    credentials = client.process_registration_response(
+        server_pk, server_response, private_state)
+    signature = client.sign_request(server_pk, credentials, b"Hello from Mars!", ["bar"])
+
+    pairings = []
+    verify = ABCVerify.verify_disclosure_proof
+    monkeypatch.setattr(ABCVerify, "verify_disclosure_proof",
+                        lambda *args: pairings.append(args) or verify(*args))
+
+    # Resubmissions get the cached verdict, valid or not
+    for _ in range(3):
+        assert server.check_request_signature(server_pk, b"Hello from Mars!", ["bar"], signature)
+        assert not server.check_request_signature(server_pk, b"Hello from Venus!", ["bar"], signature)
+    assert len(pairings) == 2 and server.replays.hits == 4
+
+    # Verdicts are bounded and expire
+    assert server.check_request_signatures_batch(server_pk, [
+        (b"Hello from Mars!", ["bar"], signature), (b"Hello from Jupiter!", ["bar"], signature)]) == [True, False]
+    assert len(server.replays.verdicts) == 2
+    time.sleep(0.5)
+    assert server.replays.get(ReplayCache.key(server_pk, b"Hello from Mars!", ["bar"], signature)) is None
+
+    # Malformed proofs are rejected before any crypto
+    pk = loads(server_pk)
+    sig = loads(signature)
+    sig.signature.gen = G1.unity()
+    assert not ABCVerify.is_well_formed(pk, sig)
+    sig = loads(signature)
+    sig.disclosed_attributes["pizza"] = PRESENT_SUBSCRIPTION
+    assert not ABCVerify.is_well_formed(pk, sig)
+    assert not server.check_request_signature(server_pk, b"Hello from Mars!", ["pizza"], dumps(sig))
+    sig = loads(signature)
+    sig.proof.response.pop()
+    assert not ABCVerify.is_well_formed(pk, sig)
+    assert not server.check_request_signature(server_pk, b"Hello from Mars!", ["bar"], dumps(sig))
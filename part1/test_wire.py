@@ -0,0 +1,149 @@
+"""
+Unit tests for the binary wire format
+"""
+
+from credential import *
+from wire import *
+import os
+import pytest
+
+
+def credential_objects():
+    """Create one object of every class of the credential module
+    """
+    attributes = ["restaurant", "bar", "sushi", "username"]
+    sk, pk = PSScheme.generate_keys(attributes)
+
+    issue_request, t = ABCIssue.create_issue_request(pk, {})
+    issuer_attributes = {"restaurant": b"absent", "bar": b"present",
+                         "sushi": b"present", "username": b"Furkan"}
+    blind_signature = ABCIssue.sign_issue_request(sk, pk, issue_request, issuer_attributes)
+    credential = ABCIssue.obtain_credential(pk, blind_signature, issuer_attributes, t)
+    disclosure_proof = ABCVerify.create_disclosure_proof(
+        pk, credential, ["bar"], b"Hello from Mars!")
+
+    return pk, [sk, pk, credential.signature, credential, blind_signature,
+                issue_request.proof, issue_request, disclosure_proof]
+
+
+def test_roundtrip():
+    """Test that every class survives encoding and decoding, and that the binary
+    encoding is smaller than jsonpickle
+    """
+    pk, objects = credential_objects()
+
+    for obj in objects:
+        data = dumps(obj, BINARY)
+        assert wire_format_of(data) == BINARY
+        assert len(data) < len(dumps(obj, JSONPICKLE))
+
+        decoded = loads(data)
+        assert type(decoded) is type(obj)
+        assert encode(decoded) == data
+
+    # The decoded objects are usable
+    disclosure_proof = loads(dumps(objects[-1], BINARY))
+    assert ABCVerify.verify_disclosure_proof(loads(dumps(pk, BINARY)), disclosure_proof, b"Hello from Mars!")
+
+
+def test_jsonpickle_still_accepted():
+    """Test that loads accepts both wire formats
+    """
+    _, objects = credential_objects()
+
+    for obj in objects:
+        data = dumps(obj, JSONPICKLE)
+        assert wire_format_of(data) == JSONPICKLE
+        assert encode(loads(data)) == encode(obj)
+
+    with pytest.raises(ValueError):
+        dumps(objects[0], "xml")
+    with pytest.raises(TypeError):
+        encode("not a credential object")
+
+
+def test_malformed():
+    """Test that malformed encodings are rejected
+    """
+    _, objects = credential_objects()
+    data = dumps(objects[-1], BINARY)
+
+    # Truncated and trailing data
+    for i in range(len(MAGIC), len(data), 17):
+        with pytest.raises(ValueError):
+            decode(data[:i])
+    with pytest.raises(ValueError):
+        decode(data + b"\x00")
+
+    # Unknown version and type
+    with pytest.raises(ValueError):
+        decode(MAGIC + bytes([VERSION + 1, 8]) + data[len(MAGIC) + 2:])
+    with pytest.raises(ValueError):
+        decode(MAGIC + bytes([VERSION, 100]) + data[len(MAGIC) + 2:])
+
+    # Element of the wrong group
+    w = Writer()
+    w.element(G2.generator())
+    w.element(G1.generator())
+    with pytest.raises(ValueError):
+        decode(MAGIC + bytes([VERSION, 3]) + w.getvalue())
+
+    # Point which is not on the curve
+    point = bytes([ELEMENT_TAGS[G1Element], 49, 0x02]) + b"\xff" * 48
+    with pytest.raises(ValueError):
+        decode(MAGIC + bytes([VERSION, 3]) + point + point)
+
+
+@pytest.mark.parametrize("wire_format", WIRE_FORMATS)
+def test_lazy_public_key(wire_format, tmp_path):
+    """Test that public keys decode Y1 and Y2 only when an attribute is used
+    """
+    attributes = [str(i) for i in range(50)] + ["username"]
+    sk, pk = PSScheme.generate_keys(attributes)
+    data = dumps(pk, wire_format)
+
+    lazy_pk = decode_public_key(memoryview(data))
+    assert isinstance(lazy_pk.Y1, LazyElements) and isinstance(lazy_pk.Y2, LazyElements)
+    assert list(lazy_pk.Y2) == attributes and not lazy_pk.Y2.elements
+
+    assert lazy_pk.Y2["3"] == pk.Y2["3"]
+    assert list(lazy_pk.Y2.elements) == ["3"] and not lazy_pk.Y1.elements
+
+    # Lazy keys hash the same as the original key, without decoding their elements
+    C = G1.generator() ** 3
+    assert FiatShamirProof.create_hash(C, lazy_pk, C) == FiatShamirProof.create_hash(C, pk, C)
+    assert not lazy_pk.Y1.elements
+
+    # Lazy keys serialize the same as the original key
+    assert dumps(lazy_pk, wire_format) == data
+
+    # Lazy keys work with the scheme
+    msgs = [os.urandom(16) for _ in attributes]
+    assert PSScheme.verify(lazy_pk, PSScheme.sign(sk, msgs), msgs)
+
+    # Memory mapped key file
+    path = tmp_path / "key.pub"
+    path.write_bytes(data)
+    assert encode(open_public_key(str(path))) == encode(pk)
+
+    # Other objects are decoded as usual
+    assert isinstance(decode_public_key(dumps(sk, wire_format)), SecretKey)
+
+
+def test_lazy_public_key_invalid_element():
+    """Test that an invalid element of a lazily decoded key raises once it is used
+    """
+    sk, pk = PSScheme.generate_keys(["bar", "username"])
+    data = bytearray(dumps(pk, BINARY))
+
+    # Overwrite the last element of Y2 with a point which is not on the curve
+    element = pk.Y2["username"].to_binary()
+    offset = bytes(data).rindex(element)
+    data[offset + 1:offset + len(element)] = b"\xff" * (len(element) - 1)
+
+    lazy_pk = decode_public_key(bytes(data))
+    assert lazy_pk.Y2["bar"] == pk.Y2["bar"]
+    with pytest.raises(ValueError):
+        lazy_pk.Y2["username"]
+    with pytest.raises(ValueError):
+        decode(bytes(data))
@@ -0,0 +1,551 @@
+"""
+Compact binary wire format for the classes of the credential module
+
+jsonpickle stores every group element as base64 inside JSON, together with
+class paths and handler metadata. The binary format instead writes:
+
+    MAGIC | version | type tag | fields
+
+where group elements use their compressed point encoding, and all variable
+sized fields (big numbers, byte strings, lists and maps) are prefixed with
+their length as an unsigned LEB128 varint.
+
+The binary format is negotiable with jsonpickle: `dumps` encodes in the
+requested format, and `loads` recognizes the format from the MAGIC prefix,
+which can never start a JSON document.
+"""
+
+from collections.abc import Mapping
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from petrelic.multiplicative.pairing import G1Element, G2Element, GTElement
+from petrelic.bn import Bn
+from serialization import jsonpickle
+from credential import *
+import base64
+import json
+import mmap
+
+
+JSONPICKLE = "jsonpickle"
+BINARY = "binary"
+WIRE_FORMATS = (JSONPICKLE, BINARY)
+
+MAGIC = b"\x00PS"
+VERSION = 1
+
+# Tags of the group elements
+ELEMENT_TAGS = {G1Element: 1, G2Element: 2, GTElement: 3}
+ELEMENT_TYPES = {tag: element_type for element_type, tag in ELEMENT_TAGS.items()}
+
+# Anything supporting the buffer protocol, e.g. bytes, memoryview or mmap
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def is_binary(data: bytes) -> bool:
+    """Whether data is in the binary wire format"""
+    return data[:len(MAGIC)] == MAGIC
+
+
+def dumps(obj, wire_format: str = JSONPICKLE) -> bytes:
+    """Serialize an object of the credential module
+
+    Args:
+        obj: The object to serialize
+        wire_format (str, optional): One of WIRE_FORMATS. Defaults to JSONPICKLE.
+
+    Returns:
+        bytes: The serialized object
+    """
+    if wire_format == JSONPICKLE:
+        return jsonpickle.encode(obj).encode()
+    if wire_format == BINARY:
+        return encode(obj)
+    raise ValueError(f"Unknown wire format {wire_format}")
+
+
+def loads(data: bytes):
+    """Deserialize an object serialized in any of the wire formats
+
+    Args:
+        data (bytes): The serialized object
+
+    Raises:
+        ValueError: If data is not valid in any of the wire formats
+
+    Returns:
+        The deserialized object
+    """
+    if is_binary(data):
+        return decode(data)
+    try:
+        return jsonpickle.decode(data)
+    except Exception as e:
+        # The error depends on the JSON backends jsonpickle falls back to
+        raise ValueError("Invalid jsonpickle data") from e
+
+
+def wire_format_of(data: bytes) -> str:
+    """The wire format data is serialized in"""
+    return BINARY if is_binary(data) else JSONPICKLE
+
+
+def element_from_binary(element_type, data: bytes):
+    """Decode and validate a group element of the given type
+
+    Raises:
+        ValueError: If data is not the encoding of an element of the group
+    """
+    data = bytes(data)
+    e = element_type.from_binary(data)
+    # RELIC only logs decoding errors, leaving the element undefined. Valid
+    # encodings are canonical, and unity is valid even though RELIC says otherwise.
+    if e.to_binary() != data or not (e.is_valid() or e == e.group.unity()):
+        raise ValueError("Invalid group element")
+    return e
+
+
+#
+# Encoding
+#
+
+
+class Writer:
+    def __init__(self):
+        """Accumulates the fields of an encoded object"""
+        self.parts: List[bytes] = []
+
+    def varint(self, n: int):
+        assert n >= 0, "Only unsigned integers can be encoded"
+        out = bytearray()
+        while True:
+            byte = n & 0x7f
+            n >>= 7
+            if n:
+                out.append(byte | 0x80)
+            else:
+                out.append(byte)
+                break
+        self.parts.append(bytes(out))
+
+    def bytes(self, b: bytes):
+        self.varint(len(b))
+        self.parts.append(b)
+
+    def str(self, s: str):
+        self.bytes(s.encode())
+
+    def bn(self, n: Bn):
+        # Big numbers are written as sign and magnitude
+        self.varint(1 if n < 0 else 0)
+        self.bytes(abs(n).binary())
+
+    def element(self, e):
+        self.varint(ELEMENT_TAGS[type(e)])
+        self.bytes(e.to_binary())
+
+    def list(self, items: list, write: Callable):
+        self.varint(len(items))
+        for item in items:
+            write(item)
+
+    def attribute_map(self, attributes: AttributeMap):
+        self.varint(len(attributes))
+        for name, value in attributes.items():
+            self.str(name)
+            self.bytes(value)
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.parts)
+
+
+def _write_secret_key(w: Writer, sk: SecretKey):
+    w.bn(sk.x)
+    w.element(sk.X1)
+    w.list(list(sk.y.keys()), w.str)
+    w.list(list(sk.y.values()), w.bn)
+
+
+def _write_public_key(w: Writer, pk: PublicKey):
+    # Y1 and Y2 are stored in the order of the attributes
+    w.list(pk.attributes, w.str)
+    w.element(pk.g1)
+    w.list([pk.Y1[a] for a in pk.attributes], w.element)
+    w.element(pk.g2)
+    w.element(pk.X2)
+    w.list([pk.Y2[a] for a in pk.attributes], w.element)
+
+
+def _write_signature(w: Writer, signature: Signature):
+    w.element(signature.gen)
+    w.element(signature.sig)
+
+
+def _write_anonymous_credential(w: Writer, credential: AnonymousCredential):
+    _write_signature(w, credential.signature)
+    w.attribute_map(credential.attributes)
+
+
+def _write_blind_signature(w: Writer, blind_signature: BlindSignature):
+    _write_signature(w, blind_signature.signature)
+    w.attribute_map(blind_signature.issuer_attributes)
+
+
+def _write_proof(w: Writer, proof: FiatShamirProof):
+    w.element(proof.commitment)
+    w.bn(proof.challenge)
+    w.list(proof.response, w.bn)
+
+
+def _write_issue_request(w: Writer, request: IssueRequest):
+    w.element(request.C)
+    _write_proof(w, request.proof)
+
+
+def _write_disclosure_proof(w: Writer, disclosure_proof: DisclosureProof):
+    _write_signature(w, disclosure_proof.signature)
+    w.attribute_map(disclosure_proof.disclosed_attributes)
+    _write_proof(w, disclosure_proof.proof)
+
+
+#
+# Decoding
+#
+
+
+class Reader:
+    def __init__(self, data: bytes, offset: int = 0):
+        """Reads the fields of an encoded object
+
+        Raises:
+            ValueError: If the data is truncated or malformed
+        """
+        self.data = memoryview(data)
+        self.offset = offset
+
+    def varint(self) -> int:
+        n = shift = 0
+        while True:
+            if self.offset >= len(self.data):
+                raise ValueError("Truncated data")
+            byte = self.data[self.offset]
+            self.offset += 1
+            n |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return n
+
+    def bytes(self) -> bytes:
+        length = self.varint()
+        if self.offset + length > len(self.data):
+            raise ValueError("Truncated data")
+        b = bytes(self.data[self.offset:self.offset + length])
+        self.offset += length
+        return b
+
+    def str(self) -> str:
+        return self.bytes().decode()
+
+    def bn(self) -> Bn:
+        negative = self.varint()
+        n = Bn.from_binary(self.bytes())
+        return -n if negative else n
+
+    def element(self):
+        element_type = ELEMENT_TYPES.get(self.varint())
+        if element_type is None:
+            raise ValueError("Unknown group element")
+        return self._element(element_type)
+
+    def element_of(self, element_type):
+        if self.varint() != ELEMENT_TAGS[element_type]:
+            raise ValueError(f"Expected an element of type {element_type.__name__}")
+        return self._element(element_type)
+
+    def _element(self, element_type):
+        return element_from_binary(element_type, self.bytes())
+
+    def span_of(self, element_type) -> memoryview:
+        """Skip an element of the given type, returning its encoding without decoding or copying it"""
+        if self.varint() != ELEMENT_TAGS[element_type]:
+            raise ValueError(f"Expected an element of type {element_type.__name__}")
+        length = self.varint()
+        if self.offset + length > len(self.data):
+            raise ValueError("Truncated data")
+        span = self.data[self.offset:self.offset + length]
+        self.offset += length
+        return span
+
+    def list(self, read: Callable) -> list:
+        return [read() for _ in range(self.varint())]
+
+    def attribute_map(self) -> AttributeMap:
+        attributes = dict()
+        for _ in range(self.varint()):
+            name = self.str()
+            attributes[name] = self.bytes()
+        return attributes
+
+
+def _read_secret_key(r: Reader) -> SecretKey:
+    x = r.bn()
+    X1 = r.element_of(G1Element)
+    names = r.list(r.str)
+    y = dict(zip(names, r.list(r.bn)))
+    return SecretKey(x, X1, y)
+
+
+def _read_public_key(r: Reader) -> PublicKey:
+    attributes = r.list(r.str)
+    g1 = r.element_of(G1Element)
+    Y1 = r.list(lambda: r.element_of(G1Element))
+    g2 = r.element_of(G2Element)
+    X2 = r.element_of(G2Element)
+    Y2 = r.list(lambda: r.element_of(G2Element))
+    if not len(attributes) == len(Y1) == len(Y2):
+        raise ValueError("Malformed public key")
+    return PublicKey(attributes, g1, dict(zip(attributes, Y1)), g2, X2, dict(zip(attributes, Y2)))
+
+
+def _read_signature(r: Reader) -> Signature:
+    return Signature(r.element_of(G1Element), r.element_of(G1Element))
+
+
+def _read_anonymous_credential(r: Reader) -> AnonymousCredential:
+    return AnonymousCredential(_read_signature(r), r.attribute_map())
+
+
+def _read_blind_signature(r: Reader) -> BlindSignature:
+    return BlindSignature(_read_signature(r), r.attribute_map())
+
+
+def _read_proof(r: Reader) -> FiatShamirProof:
+    # Decoded proofs are not created again, only their fields are restored
+    proof = FiatShamirProof.__new__(FiatShamirProof)
+    proof.commitment = r.element()
+    proof.challenge = r.bn()
+    proof.response = r.list(r.bn)
+    return proof
+
+
+def _read_issue_request(r: Reader) -> IssueRequest:
+    return IssueRequest(r.element_of(G1Element), _read_proof(r))
+
+
+def _read_disclosure_proof(r: Reader) -> DisclosureProof:
+    return DisclosureProof(_read_signature(r), r.attribute_map(), _read_proof(r))
+
+
+# Type tag, writer and reader of every class
+CODECS: Dict[type, Tuple[int, Callable, Callable]] = {
+    SecretKey: (1, _write_secret_key, _read_secret_key),
+    PublicKey: (2, _write_public_key, _read_public_key),
+    Signature: (3, _write_signature, _read_signature),
+    AnonymousCredential: (4, _write_anonymous_credential, _read_anonymous_credential),
+    BlindSignature: (5, _write_blind_signature, _read_blind_signature),
+    FiatShamirProof: (6, _write_proof, _read_proof),
+    IssueRequest: (7, _write_issue_request, _read_issue_request),
+    DisclosureProof: (8, _write_disclosure_proof, _read_disclosure_proof),
+}
+READERS = {tag: read for tag, _, read in CODECS.values()}
+
+
+def encode(obj) -> bytes:
+    """Encode an object of the credential module in the binary wire format
+
+    Args:
+        obj: The object to encode
+
+    Returns:
+        bytes: The encoded object
+    """
+    if type(obj) not in CODECS:
+        raise TypeError(f"Cannot encode objects of type {type(obj).__name__}")
+    tag, write, _ = CODECS[type(obj)]
+
+    w = Writer()
+    w.parts.append(MAGIC)
+    w.varint(VERSION)
+    w.varint(tag)
+    write(w, obj)
+    return w.getvalue()
+
+
+def decode(data: bytes):
+    """Decode an object of the credential module from the binary wire format
+
+    Args:
+        data (bytes): The encoded object
+
+    Raises:
+        ValueError: If data is not a valid encoding
+
+    Returns:
+        The decoded object
+    """
+    if not is_binary(data):
+        raise ValueError("Not in binary wire format")
+
+    r = Reader(data, len(MAGIC))
+    version = r.varint()
+    if version != VERSION:
+        raise ValueError(f"Unsupported wire format version {version}")
+
+    read = READERS.get(r.varint())
+    if read is None:
+        raise ValueError("Unknown type")
+
+    obj = read(r)
+    if r.offset != len(r.data):
+        raise ValueError("Trailing data")
+    return obj
+
+
+#
+# Lazy decoding of public keys
+#
+
+
+class LazyElements(Mapping):
+    def __init__(self, sources: Dict[AttributeName, Any], restore: Callable[[Any], Any], raw: Callable[[Any], bytes]):
+        """Read-only map from attributes to group elements, which are only decoded
+        the first time they are accessed
+
+        Args:
+            sources (Dict[AttributeName, Any]): The encoding of the element of every attribute
+            restore (Callable[[Any], Any]): Decodes the encoding of an element
+            raw (Callable[[Any], bytes]): Extracts the binary encoding of an element from its encoding
+        """
+        self.sources = sources
+        self.restore = restore
+        self.raw = raw
+        self.elements: Dict[AttributeName, Any] = dict()
+
+    def __getitem__(self, attribute: AttributeName):
+        element = self.elements.get(attribute)
+        if element is None:
+            element = self.elements[attribute] = self.restore(self.sources[attribute])
+        return element
+
+    def encoding(self, attribute: AttributeName) -> bytes:
+        """The binary encoding of the element of an attribute, without decoding it"""
+        return self.raw(self.sources[attribute])
+
+    def __iter__(self):
+        return iter(self.sources)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def __contains__(self, attribute) -> bool:
+        return attribute in self.sources
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def decode_public_key(data: Buffer) -> PublicKey:
+    """Decode a public key in any of the wire formats, without decoding its
+    elements Y1 and Y2 until an attribute is used
+
+    In the binary wire format, Y1 and Y2 are only skipped over and keep
+    pointing into data, which is never copied. data must hence stay valid,
+    e.g. a memory map must stay open, as long as the key is used. jsonpickle
+    keys are parsed as JSON, and their elements are restored with the
+    jsonpickle handlers when used.
+
+    Objects which are not public keys are decoded like with `loads`.
+
+    Args:
+        data (Buffer): The serialized key, e.g. bytes, a memoryview or a memory map
+
+    Raises:
+        ValueError: If data is not valid in any of the wire formats. Invalid
+            elements of Y1 and Y2 only raise once they are used.
+
+    Returns:
+        PublicKey: The decoded key
+    """
+    view = memoryview(data)
+    if is_binary(view):
+        r = Reader(view, len(MAGIC))
+        if r.varint() == VERSION and r.varint() == CODECS[PublicKey][0]:
+            return _read_lazy_public_key(r)
+        return decode(view)
+
+    try:
+        document = json.loads(bytes(view))
+    except ValueError:
+        document = None
+    pk = _restore_lazy_public_key(document)
+    return pk if pk is not None else loads(bytes(view))
+
+
+def open_public_key(path: str) -> PublicKey:
+    """Decode a public key from a file, which is memory mapped rather than read
+
+    Args:
+        path (str): Path of the key file
+
+    Returns:
+        PublicKey: The decoded key
+    """
+    with open(path, "rb") as f:
+        # The map stays open as long as the key refers to it
+        return decode_public_key(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def _read_lazy_public_key(r: Reader) -> PublicKey:
+    attributes = r.list(r.str)
+    g1 = r.element_of(G1Element)
+    Y1 = r.list(lambda: r.span_of(G1Element))
+    g2 = r.element_of(G2Element)
+    X2 = r.element_of(G2Element)
+    Y2 = r.list(lambda: r.span_of(G2Element))
+    if not len(attributes) == len(Y1) == len(Y2):
+        raise ValueError("Malformed public key")
+    if r.offset != len(r.data):
+        raise ValueError("Trailing data")
+
+    return PublicKey(
+        attributes, g1, LazyElements(dict(zip(attributes, Y1)), partial(element_from_binary, G1Element), bytes),  # type:ignore
+        g2, X2, LazyElements(dict(zip(attributes, Y2)), partial(element_from_binary, G2Element), bytes))  # type:ignore
+
+
+def _restore_lazy_public_key(document) -> Optional[PublicKey]:
+    # Only the plain layouts written by jsonpickle.encode(pk) are decoded lazily
+    if not isinstance(document, dict) or document.get("py/object") != _class_path(PublicKey):
+        return None
+    # Keys serialized before PublicKey had __getstate__ have their fields next to py/object
+    state = document.get("py/state", {k: v for k, v in document.items() if k != "py/object"})
+    if not isinstance(state, dict) or set(state) != {"attributes", "g1", "Y1", "g2", "X2", "Y2"}:
+        return None
+    attributes = state["attributes"]
+    if not isinstance(attributes, list) or not all(isinstance(a, str) for a in attributes):
+        return None
+
+    def is_element(source, element_type) -> bool:
+        return isinstance(source, dict) and source.get("py/object") == _class_path(element_type)
+
+    if not (is_element(state["g1"], G1Element) and is_element(state["g2"], G2Element)
+            and is_element(state["X2"], G2Element)):
+        return None
+    for name, element_type in (("Y1", G1Element), ("Y2", G2Element)):
+        if not isinstance(state[name], dict) or not all(is_element(source, element_type) for source in state[name].values()):
+            return None
+
+    # The handlers registered by the serialization module restore the elements
+    restore_G1 = jsonpickle.handlers.get(G1Element)(None).restore
+    restore_G2 = jsonpickle.handlers.get(G2Element)(None).restore
+    return PublicKey(
+        attributes, restore_G1(state["g1"]), LazyElements(state["Y1"], restore_G1, _b64repr),  # type:ignore
+        restore_G2(state["g2"]), restore_G2(state["X2"]), LazyElements(state["Y2"], restore_G2, _b64repr))  # type:ignore
+
+
+def _b64repr(source: dict) -> bytes:
+    # Encoding of the element handlers of the serialization module
+    return base64.b64decode(source["b64repr"])
+
+
+def _class_path(cls: type) -> str:
+    return f"{cls.__module__}.{cls.__name__}"